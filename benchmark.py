@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark of the LinkKora search engines on a synthetic catalogue.
+
+Generates a products workbook (one sheet per brand, shaped like NNRZ Products.xlsx) and a brands
+workbook (like NNRZ Database.xlsx) of a chosen size, then replays one seeded query mix (empty
+query, single term, multi-term, price range, brand filter) against each target:
+
+    engine    multi_sheet_loader.search_products (with the filters of search_products_frame)
+    flask     flask_app's /search view, through the Flask test client
+    postgres  flask_app_postgres.search_products_postgres on a local PostgreSQL
+
+Every target runs in its own process, so load time and peak RSS are its own. Results are one
+JSON document (load seconds, p50/p95/p99 latency, throughput and peak RSS per target and per
+query kind), meant to be kept and compared across runs:
+
+    python benchmark.py --products 100000 --brands 100 --output bench.json
+    python benchmark.py --targets postgres --database-url postgresql://localhost/linkkora_bench
+
+The postgres target migrates the synthetic catalogue into --database-url, replacing its tables,
+so point it at a scratch database.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PRODUCTS_WORKBOOK = 'NNRZ Products.xlsx'
+BRANDS_WORKBOOK = 'NNRZ Database.xlsx'
+TARGETS = ('engine', 'flask', 'postgres')
+
+# Query kinds replayed and their share of the mix
+QUERY_MIX = {'empty': 0.10, 'single': 0.35, 'multi': 0.25, 'price': 0.15, 'brand': 0.15}
+
+# Vocabulary of the synthetic catalogue: product type -> category, plus words that vary the names
+PRODUCT_TYPES = {
+    'Shirt': 'Shirts', 'T-Shirt': 'T-shirts', 'Polo': 'T-shirts', 'Pants': 'Pants', 'Cargos': 'Pants',
+    'Jeans': 'Pants', 'Panjabi': 'Panjabi', 'Kurta': 'Panjabi', 'Kameez': 'Kameez', 'Kurti': 'Kameez',
+    'Hoodie': 'Hoodies', 'Sweater': 'Hoodies', 'Saree': 'Saree', 'Dress': 'Dresses', 'Abaya': 'Abaya',
+    'Blazer': 'Blazers', 'Jacket': 'Jackets', 'Scarf': 'Accessories', 'Tote Bag': 'Accessories',
+}
+NAME_WORDS = ['Classic', 'Slim Fit', 'Oversized', 'Cotton', 'Linen', 'Denim', 'Silk', 'Printed', 'Embroidered',
+              'Striped', 'Checked', 'Solid', 'Vintage', 'Arctic', 'Summer', 'Eid', 'Festive', 'Urban', 'Relaxed']
+COLOURS = ['Black', 'White', 'Navy', 'Olive', 'Maroon', 'Beige', 'Grey', 'Mustard', 'Teal', 'Rust', 'Cream']
+BRAND_SYLLABLES = ['ve', 'lo', 'ra', 'mo', 'ire', 'sa', 'vat', 'ta', 'kor', 'na', 'bli', 'ss', 'dac', 'ca', 'wr']
+DESCRIPTIONS = ['Mens clothing', 'Womens clothing', 'Mens clothing (traditional)', 'Womens clothing (western)',
+                'Streetwear', 'Formal wear', 'Accessories']
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+# Synthetic catalogue
+
+def brand_names(count: int, rng: random.Random) -> List[str]:
+    """Distinct brand names; also used as sheet names, so they stay within Excel's 31 characters."""
+    names = []
+    for number in range(count):
+        stem = "".join(rng.choice(BRAND_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        names.append(f"{stem} {number + 1}")
+    return names
+
+
+def format_price(amount: int, rng: random.Random):
+    """A price in one of the spellings found in the real sheets (or missing); dollar prices load as unpriced."""
+    style = rng.random()
+    if style < 0.05:
+        return None
+    if style < 0.35:
+        return f"Tk {amount:,}.00"
+    if style < 0.55:
+        return f"BDT{amount:,}.00"
+    if style < 0.75:
+        return f"৳{amount:,}"
+    if style < 0.85:
+        return f"${max(1, amount // 110)}"
+    return amount
+
+
+def generate_workbooks(data_dir: str, products: int, brands: int, seed: int) -> Dict:
+    """Write the synthetic products and brands workbooks into data_dir and describe what was written."""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    names = brand_names(brands, rng)
+
+    brands_book = Workbook(write_only=True)
+    sheet = brands_book.create_sheet('Sheet1')
+    sheet.append(['brand', 'social media type', 'social media', 'website link', 'followerstotal', 'description', 'tags'])
+    for name in names:
+        slug = name.lower().replace(' ', '')
+        sheet.append([
+            name, 'IG', f"https://www.instagram.com/{slug}/", f"https://{slug}.example/" if rng.random() < 0.8 else None,
+            rng.randint(500, 200000), rng.choice(DESCRIPTIONS), ", ".join(rng.sample(sorted(PRODUCT_TYPES), 3)).lower(),
+        ])
+    brands_book.save(os.path.join(data_dir, BRANDS_WORKBOOK))
+
+    # Brand sizes are skewed like the real catalogue: a few large sheets and many small ones
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(brands)]
+    counts = np.random.default_rng(seed).multinomial(products, np.array(weights) / sum(weights))
+
+    products_book = Workbook(write_only=True)
+    for name, count in zip(names, counts.tolist()):
+        slug = name.lower().replace(' ', '')
+        sheet = products_book.create_sheet(name)
+        sheet.append(['product_name', 'category', 'product_link', 'product_image', 'product_price'])
+        for number in range(count):
+            product_type = rng.choice(list(PRODUCT_TYPES))
+            words = [rng.choice(COLOURS)] if rng.random() < 0.5 else []
+            words += rng.sample(NAME_WORDS, rng.randint(0, 2)) + [product_type]
+            product_name = " ".join(words)
+            path = f"{product_name.lower().replace(' ', '-')}-{number}"
+            sheet.append([
+                product_name, PRODUCT_TYPES[product_type], f"https://{slug}.example/products/{path}",
+                f"https://{slug}.example/cdn/{path}.jpg", format_price(rng.randrange(300, 15000, 10), rng),
+            ])
+    products_book.save(os.path.join(data_dir, PRODUCTS_WORKBOOK))
+    return {"products": products, "brands": brands, "seed": seed, "brand_names": names}
+
+
+def query_mix(count: int, brand_list: List[str], seed: int) -> List[Dict]:
+    """A seeded list of queries: {"kind", "q", "brand", "min_price", "max_price"}."""
+    rng = random.Random(seed + 1)
+    terms = [word.lower() for word in list(PRODUCT_TYPES) + NAME_WORDS + COLOURS]
+    kinds, shares = zip(*QUERY_MIX.items())
+    queries = []
+    for kind in rng.choices(kinds, weights=shares, k=count):
+        query = {"kind": kind, "q": "", "brand": None, "min_price": None, "max_price": None}
+        if kind == 'single':
+            query["q"] = rng.choice(terms)
+        elif kind == 'multi':
+            query["q"] = " ".join(rng.sample(terms, 2))
+        elif kind == 'price':
+            low = rng.randrange(300, 10000, 100)
+            query.update(q=rng.choice(terms) if rng.random() < 0.5 else "", min_price=low, max_price=low + rng.randrange(500, 5000, 100))
+        elif kind == 'brand':
+            query.update(q=rng.choice(terms) if rng.random() < 0.5 else "", brand=rng.choice(brand_list).lower())
+        queries.append(query)
+    return queries
+
+
+# Targets, each run in a process of its own
+
+def load_engine(data_dir: str):
+    from multi_sheet_loader import load_brands, load_products_from_multisheet, search_products_frame
+
+    # No snapshots: the load time is that of parsing the workbooks
+    brands_df = load_brands(os.path.join(data_dir, BRANDS_WORKBOOK), snapshot_dir=None)
+    products_df = load_products_from_multisheet(os.path.join(data_dir, PRODUCTS_WORKBOOK), brands_df, snapshot_dir=None)
+
+    def run(query):
+        return search_products_frame(query["q"], brands_df, products_df, brand=query["brand"],
+                                     min_price=query["min_price"], max_price=query["max_price"]).to_dict(orient="records")
+    return run
+
+
+def load_flask(data_dir: str):
+    # flask_app reads the workbooks and writes its image relative to the working directory; start cold
+    os.chdir(data_dir)
+    for cache in ('catalogue_image', 'catalogue_snapshot'):
+        shutil.rmtree(cache, ignore_errors=True)
+    os.environ['CATALOGUE_RELOAD_SECONDS'] = '0'
+    import flask_app
+
+    client = flask_app.app.test_client()
+
+    def run(query):
+        params = {name: query[name] for name in ('q', 'brand', 'min_price', 'max_price') if query[name]}
+        response = client.get('/search', query_string=params)
+        return response.get_data()
+    return run
+
+
+def load_postgres(data_dir: str, database_url: str):
+    os.environ['DATABASE_URL'] = database_url
+    import migrate_to_postgres
+
+    migrate_to_postgres.BRANDS_EXCEL_PATH = os.path.join(data_dir, BRANDS_WORKBOOK)
+    migrate_to_postgres.PRODUCTS_EXCEL_PATH = os.path.join(data_dir, PRODUCTS_WORKBOOK)
+    migrator = migrate_to_postgres.DatabaseMigrator()
+    try:
+        migrator.create_tables()
+        migrator.migrate_catalogue()
+        migrator.refresh_summaries()
+    finally:
+        migrator.close_connection()
+
+    import flask_app_postgres
+
+    def run(query):
+        # An app context per query, so each one checks a pooled connection out and back in
+        with flask_app_postgres.app.app_context():
+            return flask_app_postgres.search_products_postgres(
+                query["q"], query["brand"] or "", "", query["min_price"], query["max_price"])
+    return run
+
+
+def percentiles(latencies: List[float]) -> Dict:
+    milliseconds = np.asarray(latencies) * 1000
+    return {f"p{p}": round(float(np.percentile(milliseconds, p)), 3) for p in (50, 95, 99)}
+
+
+def run_target(target: str, data_dir: str, queries: List[Dict], warmup: int, database_url: str = None) -> Dict:
+    """Load one target, replay the queries against it and measure; runs inside the worker process."""
+    sys.path.insert(0, REPO_DIR)
+    started = time.perf_counter()
+    if target == 'engine':
+        run = load_engine(data_dir)
+    elif target == 'flask':
+        run = load_flask(data_dir)
+    else:
+        run = load_postgres(data_dir, database_url)
+    load_seconds = time.perf_counter() - started
+
+    for query in queries[:warmup]:
+        run(query)
+
+    latencies, by_kind = [], {}
+    started = time.perf_counter()
+    for query in queries:
+        query_started = time.perf_counter()
+        run(query)
+        elapsed = time.perf_counter() - query_started
+        latencies.append(elapsed)
+        by_kind.setdefault(query["kind"], []).append(elapsed)
+    total_seconds = time.perf_counter() - started
+
+    return {
+        "target": target,
+        "load_seconds": round(load_seconds, 3),
+        "queries": len(queries),
+        "throughput_qps": round(len(queries) / total_seconds, 2),
+        "latency_ms": percentiles(latencies),
+        "by_kind": {kind: dict(percentiles(values), queries=len(values)) for kind, values in sorted(by_kind.items())},
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LinkKora search engines on a synthetic catalogue")
+    parser.add_argument('--products', type=int, default=10000, help="products to generate (1k to 1M)")
+    parser.add_argument('--brands', type=int, default=20, help="brand sheets to generate (10 to 500)")
+    parser.add_argument('--queries', type=int, default=500, help="queries replayed against each target")
+    parser.add_argument('--warmup', type=int, default=20, help="queries run untimed before measuring")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--targets', default='engine,flask', help=f"comma-separated, from {', '.join(TARGETS)}")
+    parser.add_argument('--database-url', help="scratch PostgreSQL database for the postgres target (its tables are replaced)")
+    parser.add_argument('--data-dir', default='benchmark_data', help="where the synthetic workbooks are written")
+    parser.add_argument('--reuse-data', action='store_true', help="keep workbooks already in --data-dir from an earlier run")
+    parser.add_argument('--output', help="write the JSON results to this file instead of stdout")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(os.path.join(args.data_dir, f"{args.products}-{args.brands}-{args.seed}"))
+    manifest_path = os.path.join(data_dir, 'benchmark.json')
+
+    if args.worker:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        result = run_target(args.worker, data_dir, manifest["queries"], args.warmup, args.database_url)
+        print(json.dumps(result))
+        return
+
+    targets = [target.strip() for target in args.targets.split(',') if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    if args.reuse_data and os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        log(f"📂 Reusing {data_dir}")
+    else:
+        log(f"📊 Generating {args.products} products across {args.brands} brand sheets in {data_dir}...")
+        started = time.perf_counter()
+        manifest = generate_workbooks(data_dir, args.products, args.brands, args.seed)
+        manifest["generate_seconds"] = round(time.perf_counter() - started, 3)
+        manifest["queries"] = query_mix(args.queries, manifest["brand_names"], args.seed)
+        with open(manifest_path, 'w') as file:
+            json.dump(manifest, file)
+
+    results = []
+    for target in targets:
+        if target == 'postgres' and not args.database_url:
+            log("⏭️  Skipping postgres: pass --database-url of a scratch database")
+            results.append({"target": target, "skipped": "no --database-url"})
+            continue
+        log(f"⏱️  Running {target}...")
+        command = [sys.executable, os.path.abspath(__file__), '--worker', target, '--products', str(args.products),
+                   '--brands', str(args.brands), '--seed', str(args.seed), '--data-dir', args.data_dir,
+                   '--warmup', str(args.warmup)]
+        if args.database_url:
+            command += ['--database-url', args.database_url]
+        completed = subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            log(f"❌ {target} failed with exit code {completed.returncode}")
+            results.append({"target": target, "error": f"exit code {completed.returncode}"})
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        log(f"✅ {target}: load {result['load_seconds']}s, {result['throughput_qps']} q/s, "
+            f"p50 {result['latency_ms']['p50']}ms, p99 {result['latency_ms']['p99']}ms, peak RSS {result['peak_rss_mb']}MB")
+        results.append(result)
+
+    report = {
+        "config": {
+            "products": args.products,
+            "brands": args.brands,
+            "queries": len(manifest["queries"]),
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "query_mix": QUERY_MIX,
+            "generate_seconds": manifest.get("generate_seconds"),
+        },
+        "environment": {
+            "python": sys.version.split()[0],
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + "\n")
+        log(f"📝 Wrote {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Columnar snapshots of the LinkKora Excel workbooks.
+
+Parsing the workbooks through openpyxl takes seconds, and every gunicorn worker pays it again.
+A snapshot stores the already normalized catalogue as plain NumPy files (one per column, strings
+as a UTF-8 blob plus offsets) together with the SHA-256 of the workbook it was built from.
+The loaders in multi_sheet_loader use a snapshot whenever that hash still matches the workbook.
+
+Build (or refresh) the snapshots with:
+    python catalogue_snapshot.py
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FORMAT = 2
+DEFAULT_SNAPSHOT_DIR = os.getenv('LINKKORA_SNAPSHOT_DIR', 'catalogue_snapshot')
+
+
+def file_sha256(path: str) -> str:
+    """Content hash of a source workbook."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(source_path: str, source_hash: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    """Directory holding the snapshot of one version of a workbook."""
+    stem = os.path.splitext(os.path.basename(source_path))[0].replace(' ', '_')
+    return os.path.join(snapshot_dir, f"{stem}-{source_hash[:16]}")
+
+
+def _write_string_column(values: pd.Series, directory: str, name: str) -> None:
+    """Store a text column as one UTF-8 blob, character offsets and a null mask."""
+    nulls = values.isna().to_numpy()
+    texts = ["" if null else str(value) for value, null in zip(values.tolist(), nulls)]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}.data.npy"), np.frombuffer("".join(texts).encode('utf-8'), dtype=np.uint8))
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}.nulls.npy"), nulls)
+
+
+def _read_string_column(directory: str, name: str) -> np.ndarray:
+    """Rebuild a text column as an object array; missing values come back as None."""
+    text = np.load(os.path.join(directory, f"{name}.data.npy"), mmap_mode='r').tobytes().decode('utf-8')
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy")).tolist()
+    nulls = np.load(os.path.join(directory, f"{name}.nulls.npy")).tolist()
+    values = np.empty(len(nulls), dtype=object)
+    values[:] = [None if null else text[start:end] for start, end, null in zip(offsets, offsets[1:], nulls)]
+    return values
+
+
+def write_snapshot(df: pd.DataFrame, source_path: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> str:
+    """
+    Write a DataFrame as the snapshot of source_path and return its directory.
+    The snapshot is assembled in a temporary directory and renamed into place, so readers
+    never see a half-written one; snapshots of older workbook versions are removed.
+    """
+    source_hash = file_sha256(source_path)
+    target = snapshot_path(source_path, source_hash, snapshot_dir)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=snapshot_dir)
+
+    columns = []
+    for position, column in enumerate(df.columns):
+        name = f"col_{position:03d}"
+        values = df[column]
+        if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            _write_string_column(values, staging, name)
+            kind = 'string'
+        else:
+            np.save(os.path.join(staging, f"{name}.npy"), values.to_numpy())
+            kind = 'array'
+        columns.append({"name": str(column), "file": name, "kind": kind})
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "source": os.path.basename(source_path),
+        "source_sha256": source_hash,
+        "rows": len(df),
+        "columns": columns,
+    }
+    with open(os.path.join(staging, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    os.rename(staging, target)
+
+    # Drop snapshots of earlier versions of the same workbook
+    prefix = os.path.basename(target).rsplit('-', 1)[0] + '-'
+    for entry in os.listdir(snapshot_dir):
+        if entry.startswith(prefix) and entry != os.path.basename(target):
+            shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+    return target
+
+
+def read_snapshot(source_path: str, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR) -> Optional[pd.DataFrame]:
+    """Load the snapshot of source_path if one exists for its current content, else None."""
+    if not os.path.exists(source_path):
+        return None
+    directory = snapshot_path(source_path, file_sha256(source_path), snapshot_dir)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None
+
+    data = {}
+    for column in manifest["columns"]:
+        if column["kind"] == 'string':
+            data[column["name"]] = _read_string_column(directory, column["file"])
+        else:
+            data[column["name"]] = np.load(os.path.join(directory, f"{column['file']}.npy"))
+    return pd.DataFrame(data, columns=[column["name"] for column in manifest["columns"]])
+
+
+def main():
+    from multi_sheet_loader import catalogue_memory_report, compact_catalogue, load_product_sheets, read_brands_workbook
+
+    brands_path = "NNRZ Database.xlsx"
+    products_path = "NNRZ Products.xlsx"
+
+    print(f"📊 Snapshotting {brands_path}...")
+    print(f"✅ Wrote {write_snapshot(read_brands_workbook(brands_path), brands_path)}")
+
+    print(f"📊 Snapshotting {products_path}...")
+    products_df, report = load_product_sheets(products_path)
+    for entry in report:
+        status = f"❌ {entry['error']}" if entry["error"] else f"{entry['rows']} rows"
+        print(f"   {entry['sheet']}: {status} ({entry['seconds']:.3f}s)")
+    print(f"✅ Wrote {write_snapshot(products_df, products_path)}")
+
+    # Snapshots keep the plain columns; the servers compact them after loading
+    print("📦 In-memory size per column (loaded / compacted):")
+    loaded = {entry["column"]: entry["bytes"] for entry in catalogue_memory_report(products_df)}
+    compacted = catalogue_memory_report(compact_catalogue(products_df))
+    for entry in compacted:
+        print(f"   {entry['column']}: {loaded[entry['column']]:,} / {entry['bytes']:,} bytes ({entry['dtype']})")
+    print(f"   total: {sum(loaded.values()):,} / {sum(entry['bytes'] for entry in compacted):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
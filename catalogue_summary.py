@@ -0,0 +1,52 @@
+# Per-brand and per-category catalogue summaries for /brands and /categories in both LinkKora backends
+# Built once per catalogue version (at load time in the pandas engine, as the catalogue_summary
+# materialized view in PostgreSQL), so serving the lists costs a lookup, not a scan
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+# Kinds of summary rows, as stored in the kind column
+SUMMARY_KINDS = ('brand', 'category')
+
+
+def price_stat(value) -> Optional[float]:
+    """A price statistic rounded to 2 decimals, or None when there is none (NULL or NaN)."""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else round(value, 2)
+
+
+class CatalogueSummary:
+    """
+    One row per brand and per category: (kind, value, product_count, min_price, max_price, median_price).
+    Prices only count priced products; a brand without products has a count of 0 and no prices.
+    Values are listed in code point order, which is PostgreSQL's ORDER BY under the C collation.
+    """
+
+    def __init__(self, rows: Sequence[Sequence]):
+        self.rows = sorted(
+            (str(kind), str(value), int(count), price_stat(min_price), price_stat(max_price), price_stat(median_price))
+            for kind, value, count, min_price, max_price, median_price in rows
+        )
+        self._entries: Dict[str, List[Dict]] = {kind: [] for kind in SUMMARY_KINDS}
+        for kind, value, count, min_price, max_price, median_price in self.rows:
+            self._entries.setdefault(kind, []).append({
+                "value": value,
+                "count": count,
+                "min_price": min_price,
+                "max_price": max_price,
+                "median_price": median_price,
+            })
+
+    def names(self, kind: str) -> List[str]:
+        """Every value of a kind, e.g. all brand names."""
+        return [entry["value"] for entry in self._entries.get(kind, [])]
+
+    def entries(self, kind: str) -> List[Dict]:
+        """Every value of a kind with its product count and min/max/median price."""
+        return self._entries.get(kind, [])
+
+    def listing(self, kind: str, stats: bool = False) -> List:
+        """The /brands or /categories response: names, or full entries with stats=1."""
+        return self.entries(kind) if stats else self.names(kind)
@@ -0,0 +1,191 @@
+# Shared pytest fixtures: small synthetic workbooks and a scratch PostgreSQL database
+# Database tests run against a throwaway database on the server of TEST_DATABASE_URL (or DATABASE_URL)
+# and are skipped when neither is set or the server can't be reached
+
+import os
+import uuid
+
+import pytest
+
+PRODUCTS_WORKBOOK = 'NNRZ Products.xlsx'
+BRANDS_WORKBOOK = 'NNRZ Database.xlsx'
+
+# A few sheets shaped like NNRZ Products.xlsx: (product_name, category, product_link, product_price)
+CATALOGUE = {
+    'Bliss': [
+        ('Linen Shirt', 'Shirts', 'https://bliss.example/linen-shirt', 'Tk 1,250.00'),
+        ('Cotton Shirt', 'Shirts', 'https://bliss.example/cotton-shirt', 'BDT990.00'),
+        ('Slim Fit Pants', 'Pants', 'https://bliss.example/slim-pants', '৳1,590'),
+        ('Printed T-Shirt', 'T-shirts', 'https://bliss.example/printed-tee', 690),
+    ],
+    'Wrclo': [
+        ('Denim Shirt', 'Shirts', 'https://wrclo.example/denim-shirt', 'Tk 2,100.00'),
+        ('Cargo Pants', 'Pants', 'https://wrclo.example/cargo-pants', 'Tk 1,899.00'),
+        ('Oversized Hoodie', 'Hoodies', 'https://wrclo.example/hoodie', None),
+        ('Black Shirt', 'Shirts', 'https://wrclo.example/black-shirt', 'Tk 1,500.00'),
+    ],
+}
+
+
+def write_workbooks(directory, catalogue=None):
+    """Write a products workbook (one sheet per brand) and a brands workbook for it into directory."""
+    from openpyxl import Workbook
+
+    catalogue = CATALOGUE if catalogue is None else catalogue
+    os.makedirs(directory, exist_ok=True)
+    brands_book = Workbook(write_only=True)
+    sheet = brands_book.create_sheet('Sheet1')
+    sheet.append(['brand', 'social media type', 'social media', 'website link', 'followerstotal', 'description'])
+    for brand in catalogue:
+        slug = brand.lower()
+        sheet.append([brand, 'IG', f"https://www.instagram.com/{slug}/", f"https://{slug}.example/", 1000, 'Clothing'])
+    brands_book.save(os.path.join(directory, BRANDS_WORKBOOK))
+
+    products_book = Workbook(write_only=True)
+    for brand, rows in catalogue.items():
+        sheet = products_book.create_sheet(brand)
+        sheet.append(['product_name', 'category', 'product_link', 'product_price'])
+        for row in rows:
+            sheet.append(list(row))
+    products_book.save(os.path.join(directory, PRODUCTS_WORKBOOK))
+    return os.path.join(directory, PRODUCTS_WORKBOOK), os.path.join(directory, BRANDS_WORKBOOK)
+
+
+def collect_pages(get_json, path, limit):
+    """Every result of a paged /search, following next_cursor from page to page; get_json(url) fetches one page."""
+    separator = '&' if '?' in path else '?'
+    page = get_json(f"{path}{separator}limit={limit}")
+    results = list(page["results"])
+    while page["next_cursor"] is not None:
+        assert len(page["results"]) == limit
+        page = get_json(f"{path}{separator}limit={limit}&cursor={page['next_cursor']}")
+        results.extend(page["results"])
+    return results
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    """Paths of the synthetic (products, brands) workbooks."""
+    return write_workbooks(str(tmp_path / 'workbooks'))
+
+
+@pytest.fixture
+def pandas_client(workbooks, tmp_path, monkeypatch):
+    """Test client of flask_app (the pandas backend) serving the synthetic workbooks from a fresh image."""
+    from shared_catalogue import SharedCatalogue
+
+    monkeypatch.setenv('CATALOGUE_RELOAD_SECONDS', '0')
+    # flask_app maps the workbooks of the working directory on import; these are the synthetic ones
+    monkeypatch.chdir(os.path.dirname(workbooks[0]))
+    import flask_app
+
+    monkeypatch.setattr(flask_app, 'catalogue', SharedCatalogue(*workbooks, image_dir=str(tmp_path / 'image')))
+    flask_app.result_cache.clear()
+    return flask_app.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def scratch_database_url():
+    """URL of an empty database created for this test session and dropped afterwards."""
+    psycopg2 = pytest.importorskip('psycopg2')
+    from psycopg2.extensions import make_dsn, parse_dsn
+
+    server_url = os.getenv('TEST_DATABASE_URL') or os.getenv('DATABASE_URL')
+    if not server_url:
+        pytest.skip("TEST_DATABASE_URL / DATABASE_URL not set")
+    try:
+        admin = psycopg2.connect(server_url)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}")
+    admin.autocommit = True
+    name = f"linkkora_test_{uuid.uuid4().hex[:8]}"
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE {name}")
+    try:
+        yield make_dsn(**dict(parse_dsn(server_url), dbname=name))
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        admin.close()
+
+
+@pytest.fixture
+def migrate(scratch_database_url, tmp_path, monkeypatch):
+    """
+    Run migrate_to_postgres against the scratch database for the given workbooks:
+    migrate(products_path, brands_path, sync=False) returns the changed row count of a sync
+    (None for a full migration). Runs in tmp_path so no snapshot lands in the repository.
+    """
+    import migrate_to_postgres
+
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    monkeypatch.setenv('DATABASE_URL', scratch_database_url)
+    monkeypatch.chdir(tmp_path)
+    os.symlink(os.path.join(repo_dir, 'database_schema.sql'), tmp_path / 'database_schema.sql')
+
+    def run(products_path, brands_path, sync=False):
+        monkeypatch.setattr(migrate_to_postgres, 'PRODUCTS_EXCEL_PATH', products_path)
+        monkeypatch.setattr(migrate_to_postgres, 'BRANDS_EXCEL_PATH', brands_path)
+        migrator = migrate_to_postgres.DatabaseMigrator()
+        try:
+            migrator.create_tables()
+            if sync:
+                changed_rows = migrator.sync_catalogue()
+            else:
+                migrator.migrate_catalogue()
+                changed_rows = None
+            if changed_rows != 0:
+                migrator.refresh_summaries()
+            return changed_rows
+        finally:
+            migrator.close_connection()
+    return run
+
+
+@pytest.fixture
+def migrated_workbooks(migrate, workbooks):
+    """The synthetic workbooks, freshly migrated into the scratch database."""
+    migrate(*workbooks)
+    return workbooks
+
+
+def _forget_catalogue(module, monkeypatch):
+    """Drop what a PostgreSQL app module remembers of an earlier catalogue: its version, summaries and cached responses."""
+    monkeypatch.setattr(module.catalogue_version, '_version', None)
+    monkeypatch.setattr(module.catalogue_version, 'check_interval', 0)
+    monkeypatch.setattr(module, 'fuzzy_vocabulary', module.FuzzyVocabulary())
+    monkeypatch.setattr(module, 'summary_tables', module.SummaryTables())
+    module.result_cache.clear()
+
+
+@pytest.fixture
+def postgres_client(migrated_workbooks, monkeypatch):
+    """Test client of flask_app_postgres serving the migrated workbooks; it re-reads the catalogue version per request."""
+    import flask_app_postgres
+
+    manager = flask_app_postgres.DatabaseManager()
+    monkeypatch.setattr(flask_app_postgres, 'db_manager', manager)
+    _forget_catalogue(flask_app_postgres, monkeypatch)
+    yield flask_app_postgres.app.test_client()
+    manager.pool.closeall()
+
+
+@pytest.fixture
+def quart_app(migrated_workbooks, monkeypatch):
+    """quart_app_postgres serving the migrated workbooks; run it with `async with quart_app.test_app()`."""
+    import quart_app_postgres
+
+    _forget_catalogue(quart_app_postgres, monkeypatch)
+    return quart_app_postgres.app
+
+
+@pytest.fixture
+def scratch_query(scratch_database_url):
+    """Run one query against the scratch database and return its rows."""
+    import psycopg2
+
+    def query(sql, params=None):
+        with psycopg2.connect(scratch_database_url) as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+    return query
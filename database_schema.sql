@@ -9,6 +9,7 @@ CREATE TABLE IF NOT EXISTS brands (
     description TEXT,
     website_link VARCHAR(500),
     social_media VARCHAR(500),
+    content_hash CHAR(32),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -16,6 +17,7 @@ CREATE TABLE IF NOT EXISTS brands (
 -- Create products table
 CREATE TABLE IF NOT EXISTS products (
     id SERIAL PRIMARY KEY,
+    product_key VARCHAR(1000),
     product_name VARCHAR(500) NOT NULL,
     product_url VARCHAR(1000),
     category VARCHAR(255),
@@ -25,15 +27,29 @@ CREATE TABLE IF NOT EXISTS products (
     price_currency VARCHAR(10) DEFAULT 'BDT',
     image_url VARCHAR(1000),
     description TEXT,
+    content_hash CHAR(32),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Sync columns for databases created before incremental sync existed
+ALTER TABLE brands ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS product_key VARCHAR(1000);
+ALTER TABLE products ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_products_brand ON products(brand);
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
 CREATE INDEX IF NOT EXISTS idx_products_name ON products(product_name);
+-- Keyset pagination of /search orders and seeks on (product_name, id)
+CREATE INDEX IF NOT EXISTS idx_products_name_id ON products(product_name, id);
 CREATE INDEX IF NOT EXISTS idx_brands_brand ON brands(brand);
+-- Stable row keys used by `migrate_to_postgres.py --sync` (INSERT ... ON CONFLICT)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_product_key ON products(product_key);
+-- Brands migrated before sync existed all carry brand_clean = '', which would break the unique index;
+-- like unkeyed products they are left without a key and replaced by the next sync
+UPDATE brands SET brand_clean = NULL WHERE brand_clean = '';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_brands_brand_clean ON brands(brand_clean);
 
 -- Create a function to update the updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -45,8 +61,141 @@ END;
 $$ language 'plpgsql';
 
 -- Create triggers to automatically update updated_at
+DROP TRIGGER IF EXISTS update_brands_updated_at ON brands;
 CREATE TRIGGER update_brands_updated_at BEFORE UPDATE ON brands
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+DROP TRIGGER IF EXISTS update_products_updated_at ON products;
 CREATE TRIGGER update_products_updated_at BEFORE UPDATE ON products
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Full-text search: weighted tsvector over name (A) and category (B), kept current by a trigger.
+-- The 'simple' configuration does no stemming, so brand-specific words are indexed as written.
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+-- Text as it is indexed: the text itself plus every hyphenated compound written solid, so "T-Shirt"
+-- is also found by "tshirt" (like index_tokens in search_index.py)
+CREATE OR REPLACE FUNCTION search_text(value TEXT)
+RETURNS TEXT AS $$
+    SELECT COALESCE(value, '') || ' ' || array_to_string(ARRAY(
+        SELECT replace(compound[1], '-', '') FROM regexp_matches(LOWER(value), '(\w+(?:-\w+)+)', 'g') AS compound
+    ), ' ')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION products_search_vector(product_name TEXT, category TEXT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('simple', search_text(product_name)), 'A') ||
+           setweight(to_tsvector('simple', search_text(category)), 'B')
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION products_search_vector_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector = products_search_vector(NEW.product_name, NEW.category);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_products_search_vector ON products;
+CREATE TRIGGER update_products_search_vector BEFORE INSERT OR UPDATE OF product_name, category ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_update();
+
+-- Backfill rows loaded before the trigger existed, or indexed by an earlier version of it
+UPDATE products SET search_vector = products_search_vector(product_name, category)
+WHERE search_vector IS DISTINCT FROM products_search_vector(product_name, category);
+
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING GIN (search_vector);
+
+-- Lower-case expression indexes for the case-insensitive brand and category filters
+CREATE INDEX IF NOT EXISTS idx_products_brand_lower ON products (LOWER(brand));
+CREATE INDEX IF NOT EXISTS idx_products_category_lower ON products (LOWER(category));
+
+-- Trigram indexes serve LOWER(...) LIKE '%term%' substring matches (and similarity() for fuzzy matching).
+-- Skipped with a notice where the pg_trgm extension is not available.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN (LOWER(product_name) gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_products_category_trgm ON products USING GIN (LOWER(category) gin_trgm_ops);
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm unavailable (%), substring search will not use trigram indexes', SQLERRM;
+END
+$$;
+
+-- Facet counts over the whole catalogue for /facets without a query or filters.
+-- Refreshed by migrate_to_postgres.py after every load; price bucket edges match facets.PRICE_BUCKET_EDGES.
+CREATE MATERIALIZED VIEW IF NOT EXISTS product_facet_counts AS
+    SELECT 'brand' AS facet, brand AS value, COUNT(*) AS product_count
+    FROM products WHERE brand IS NOT NULL AND brand != '' GROUP BY brand
+    UNION ALL
+    SELECT 'category' AS facet, category AS value, COUNT(*) AS product_count
+    FROM products WHERE category IS NOT NULL AND category != '' GROUP BY category
+    UNION ALL
+    SELECT 'price_bucket' AS facet,
+           (width_bucket(price, ARRAY[0, 1000, 2000, 3000, 5000, 10000]::numeric[]) - 1)::text AS value,
+           COUNT(*) AS product_count
+    FROM products WHERE price IS NOT NULL AND price >= 0 GROUP BY 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_product_facet_counts ON product_facet_counts(facet, value);
+
+-- One row per brand and per category with its product count and min/max/median price, served by
+-- /brands and /categories. Every row of brands is listed, including brands without products.
+-- Refreshed together with product_facet_counts.
+CREATE MATERIALIZED VIEW IF NOT EXISTS catalogue_summary AS
+    SELECT 'brand' AS kind, brand AS value,
+           COUNT(*) FILTER (WHERE listed) AS product_count,
+           MIN(price) AS min_price, MAX(price) AS max_price,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median_price
+    FROM (
+        SELECT brand, price, TRUE AS listed FROM products WHERE brand IS NOT NULL AND brand != ''
+        UNION ALL
+        SELECT brand, NULL, FALSE FROM brands WHERE brand IS NOT NULL AND brand != ''
+    ) brand_products
+    GROUP BY brand
+    UNION ALL
+    SELECT 'category' AS kind, category AS value, COUNT(*) AS product_count,
+           MIN(price) AS min_price, MAX(price) AS max_price,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median_price
+    FROM products WHERE category IS NOT NULL AND category != '' GROUP BY category;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_catalogue_summary ON catalogue_summary(kind, value);
+
+-- Completion phrases for /suggest: distinct product names, categories and brands, each weighted by
+-- its number of products. Refreshed together with product_facet_counts.
+CREATE MATERIALIZED VIEW IF NOT EXISTS search_suggestions AS
+    SELECT 'product' AS kind, MIN(product_name) AS phrase, COUNT(*) AS weight
+    FROM products WHERE product_name IS NOT NULL AND product_name != '' GROUP BY LOWER(product_name)
+    UNION ALL
+    SELECT 'category' AS kind, MIN(category) AS phrase, COUNT(*) AS weight
+    FROM products WHERE category IS NOT NULL AND category != '' GROUP BY LOWER(category)
+    UNION ALL
+    SELECT 'brand' AS kind, MIN(brand) AS phrase, COUNT(*) AS weight
+    FROM products WHERE brand IS NOT NULL AND brand != '' GROUP BY LOWER(brand);
+
+-- Unique per kind (phrases are grouped case-insensitively), which REFRESH ... CONCURRENTLY requires
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_suggestions_phrase ON search_suggestions(kind, phrase);
+
+-- Word-prefix lookups ('sh:*') go through the GIN index; whole-phrase prefixes (LIKE 'sh%') through the btree
+CREATE INDEX IF NOT EXISTS idx_search_suggestions_words ON search_suggestions USING GIN (to_tsvector('simple', phrase));
+CREATE INDEX IF NOT EXISTS idx_search_suggestions_prefix ON search_suggestions(LOWER(phrase) text_pattern_ops);
+
+-- Vocabulary of the search index with the number of products containing each word, which the API
+-- turns into a trigram index for correcting misspelled query words (fuzzy=1). Refreshed with the views above.
+CREATE MATERIALIZED VIEW IF NOT EXISTS search_terms AS
+    SELECT word, ndoc FROM ts_stat('SELECT search_vector FROM products');
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_terms_word ON search_terms(word);
+
+-- Data version of the catalogue. migrate_to_postgres.py bumps it whenever products or brands change,
+-- and the API drops its cached /search and /facets responses when it sees a new version.
+CREATE TABLE IF NOT EXISTS catalogue_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalogue_version (id, version) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;
+
+-- Seconds each step of the migration that produced this version took (load, copy or sync, refresh),
+-- reported by the API on /metrics
+ALTER TABLE catalogue_version ADD COLUMN IF NOT EXISTS migration_timings JSONB;
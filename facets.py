@@ -0,0 +1,28 @@
+# Shared facet definitions for the /facets endpoint in both LinkKora backends
+# Keeps price buckets and the response layout identical whichever engine computes the counts
+
+from typing import Dict, List, Sequence
+
+# Lower edges of the price buckets in BDT; the last bucket is open-ended
+PRICE_BUCKET_EDGES = [0, 1000, 2000, 3000, 5000, 10000]
+
+
+def facet_entries(labels: Sequence[str], counts: Sequence[int]) -> List[Dict]:
+    """Pair facet values with their counts, most common first, dropping values with no matches."""
+    entries = [
+        {"value": label, "count": int(count)}
+        for label, count in zip(labels, counts)
+        if count > 0
+    ]
+    entries.sort(key=lambda entry: (-entry["count"], str(entry["value"]).lower()))
+    return entries
+
+
+def price_bucket_entries(counts: Sequence[int]) -> List[Dict]:
+    """Describe every price bucket with its bounds and count, in price order."""
+    entries = []
+    for bucket, lower in enumerate(PRICE_BUCKET_EDGES):
+        upper = PRICE_BUCKET_EDGES[bucket + 1] if bucket + 1 < len(PRICE_BUCKET_EDGES) else None
+        count = int(counts[bucket]) if bucket < len(counts) else 0
+        entries.append({"min": lower, "max": upper, "count": count})
+    return entries
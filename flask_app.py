@@ -1,56 +1,197 @@
 # Flask API for LinkKora: serves product search results using your existing engine
 
-from flask import Flask, request, jsonify
+from urllib.parse import quote
+
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
-from multi_sheet_loader import load_brands, load_products_from_multisheet, search_products
-import pandas as pd
+from multi_sheet_loader import (
+    search_result_rows, iter_results_json, search_products_page, search_products_batch,
+    product_facets, suggest_completions, correct_keyword, results_to_json, parse_price_bound,
+    get_catalogue_summary
+)
+from fuzzy_match import is_enabled
+from ranking import parse_sort
+from json_stream import STREAM_CHUNK_ROWS, stream_response, wants_ndjson
+from pagination import parse_limit, page_envelope_json
+from search_batch import parse_batch
+from search_cache import ResultCache, cached_endpoint
+from request_metrics import cache_samples, instrument, registry, span
+from shared_catalogue import SharedCatalogue
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag", "X-Corrected-Query"])
+instrument(app)
+
+# Completions returned by /suggest unless the client asks for more (up to the maximum)
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+
+
 
+# Brand and product data, built once into a memory-mapped image that every worker shares
+# (run gunicorn with --preload to build and map it once, in the master)
+catalogue = SharedCatalogue("NNRZ Products.xlsx", "NNRZ Database.xlsx")
+result_cache = ResultCache()
+registry.add_collector(lambda: cache_samples(result_cache))
+registry.add_collector(lambda: [
+    ('linkkora_catalogue_generation', 'gauge', "Catalogue images this worker has served", (), catalogue.current()[2])
+])
+
+def request_catalogue():
+    """(brands_df, products_df, generation) serving this request; a newly published image never changes it mid-request."""
+    if "catalogue" not in g:
+        g.catalogue = catalogue.current()
+    return g.catalogue
+
+def current_catalogue_version():
+    # The generation is bumped whenever a new image is mapped, which invalidates every cached response
+    return request_catalogue()[2]
+
+def search_keyword():
+    """The request's `q`; with fuzzy=1, misspelled words are replaced by their closest catalogue terms."""
+    query = request.args.get("q", "").lower()
+    if is_enabled(request.args.get("fuzzy")):
+        brands_df, products_df, _ = request_catalogue()
+        return correct_keyword(query, brands_df, products_df), query
+    return query, query
 
+def filter_args(name):
+    """All values of a repeatable filter parameter (brand=a&brand=b), lower-cased, empty ones dropped."""
+    return [value.lower() for value in request.args.getlist(name) if value.strip()]
 
-# Load brand and product data once at startup
-brands_df = load_brands("NNRZ Database.xlsx")
-products_df = load_products_from_multisheet("NNRZ Products.xlsx")
+def with_correction(response, query, typed_query):
+    """Report a fuzzy correction of the query in the X-Corrected-Query header (URL-encoded)."""
+    if query != typed_query:
+        response.headers["X-Corrected-Query"] = quote(query)
+    return response
 
 @app.route("/search", methods=["GET"])
+@cached_endpoint(result_cache, current_catalogue_version)
 def search():
-    query = request.args.get("q", "").lower()
-    brand_filter = request.args.get("brand", "").lower()
-    category_filter = request.args.get("category", "").lower()
-    min_price = request.args.get("min_price")
-    max_price = request.args.get("max_price")
+    """
+    Search products. Without `limit`/`cursor` the full result list is streamed as a JSON array
+    (or as NDJSON with `format=ndjson`); with either of them the response is one page:
+    {"total", "limit", "next_cursor", "results"}.
+    `brand` and `category` may be repeated to match any of several values.
+    `sort` is relevance (default with `q`), price_asc, price_desc or name (default without `q`).
+    `fuzzy=1` tolerates typos in `q`.
+    """
+    brands_df, products_df, _ = request_catalogue()
+    query, typed_query = search_keyword()
+    with span("parse"):
+        brand_filter = filter_args("brand")
+        category_filter = filter_args("category")
+        paged = "limit" in request.args or "cursor" in request.args
+        try:
+            min_price = parse_price_bound(request.args.get("min_price"))
+            max_price = parse_price_bound(request.args.get("max_price"))
+            limit = parse_limit(request.args.get("limit")) if paged else None
+            sort = parse_sort(request.args.get("sort"), query)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-    results = search_products(query, brands_df, products_df)
+    filters = dict(brand=brand_filter, category=category_filter, min_price=min_price, max_price=max_price, sort=sort)
 
-    # Convert to DataFrame for easier filtering
-    df = pd.DataFrame(results)
+    if not paged:
+        rows = search_result_rows(query, brands_df, products_df, **filters)
+        ndjson = wants_ndjson()
+        response = stream_response(iter_results_json(products_df, rows, STREAM_CHUNK_ROWS, ndjson), ndjson)
+        return with_correction(response, query, typed_query)
 
-    if brand_filter:
-        df = df[df['brand'].str.lower() == brand_filter]
+    try:
+        df, total, next_cursor = search_products_page(
+            query, brands_df, products_df, limit, request.args.get("cursor"), **filters
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if category_filter:
-        df = df[df['category'].str.lower() == category_filter]
+    results = results_to_json(df)
+    with span("serialize"):
+        body = page_envelope_json(results, total, next_cursor, limit)
+    return with_correction(Response(body, mimetype="application/json"), query, typed_query)
 
-    if min_price:
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """
+    Several paged searches in one request, e.g. all the carousels of a page.
+    Body: {"queries": [{"q", "brand", "category", "min_price", "max_price", "sort", "limit", "cursor"}, ...]},
+    each entry taking the /search parameters (brand and category as a string or a list).
+    Responds with {"results": [...]}, one /search page object per query, in order.
+    """
+    with span("parse"):
         try:
-            min_price_val = float(min_price.replace(",", "").replace("Tk", "").strip())
-            df = df[df['price'].str.replace(",", "").replace("Tk", "", regex=True).astype(float) >= min_price_val]
-        except:
-            pass
+            specs = parse_batch(request.get_json(silent=True), parse_price_bound)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    brands_df, products_df, _ = request_catalogue()
+    try:
+        pages = search_products_batch(specs, brands_df, products_df)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with span("serialize"):
+        body = '{"results":[%s]}' % ",".join(
+            page_envelope_json(results, total, next_cursor, spec["limit"])
+            for spec, (results, total, next_cursor) in zip(specs, pages)
+        )
+    return Response(body, mimetype="application/json")
 
-    if max_price:
+@app.route("/facets", methods=["GET"])
+@cached_endpoint(result_cache, current_catalogue_version)
+def facets():
+    """Brand, category and price-bucket counts for the same query and filters (and `fuzzy`) as /search."""
+    brands_df, products_df, _ = request_catalogue()
+    query, typed_query = search_keyword()
+    with span("parse"):
         try:
-            max_price_val = float(max_price.replace(",", "").replace("Tk", "").strip())
-            df = df[df['price'].str.replace(",", "").replace("Tk", "", regex=True).astype(float) <= max_price_val]
-        except:
-            pass
+            min_price = parse_price_bound(request.args.get("min_price"))
+            max_price = parse_price_bound(request.args.get("max_price"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    facet_counts = product_facets(
+        query, brands_df, products_df,
+        brand=filter_args("brand"),
+        category=filter_args("category"),
+        min_price=min_price,
+        max_price=max_price
+    )
+    with span("serialize"):
+        response = jsonify(facet_counts)
+    return with_correction(response, query, typed_query)
+
+@app.route("/suggest", methods=["GET"])
+def suggest():
+    """Completions for a partially typed query: product names, categories and brands, most popular first."""
+    try:
+        limit = parse_limit(request.args.get("limit"), SUGGEST_LIMIT, MAX_SUGGEST_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    brands_df, products_df, _ = request_catalogue()
+    query = request.args.get("q", "")
+    suggestions = suggest_completions(query, brands_df, products_df, limit)
+    with span("serialize"):
+        return jsonify({"query": query, "suggestions": suggestions})
 
-    # Replace NaN with empty strings before converting to JSON
-    df = df.fillna("")
+@app.route("/brands", methods=["GET"])
+@cached_endpoint(result_cache, current_catalogue_version)
+def brands():
+    """All brand names; with stats=1, each with its product count and min/max/median price."""
+    brands_df, products_df, _ = request_catalogue()
+    listing = get_catalogue_summary(brands_df, products_df).listing('brand', is_enabled(request.args.get("stats")))
+    with span("serialize"):
+        return jsonify(listing)
 
-    return jsonify(df.to_dict(orient="records"))
+@app.route("/categories", methods=["GET"])
+@cached_endpoint(result_cache, current_catalogue_version)
+def categories():
+    """All category names; with stats=1, each with its product count and min/max/median price."""
+    brands_df, products_df, _ = request_catalogue()
+    listing = get_catalogue_summary(brands_df, products_df).listing('category', is_enabled(request.args.get("stats")))
+    with span("serialize"):
+        return jsonify(listing)
 
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5050)
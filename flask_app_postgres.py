@@ -1,220 +1,733 @@
 # Flask API for LinkKora: serves product search results using PostgreSQL database
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, cursor as BaseCursor
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import os
+from urllib.parse import quote
+import threading
+import time
 from dotenv import load_dotenv
 import logging
 
+from catalogue_summary import CatalogueSummary
+from facets import price_bucket_entries
+from pagination import parse_limit
+from search_cache import ResultCache, cached_endpoint, mark_uncacheable
+from json_stream import STREAM_CHUNK_ROWS, encode_rows, stream_response, wants_ndjson
+from request_metrics import cache_samples, instrument, pool_samples, registry, span
+from fuzzy_match import FuzzyMatcher, is_enabled
+from multi_sheet_loader import parse_price_bound
+from ranking import parse_sort
+from search_batch import parse_batch
+from postgres_queries import (
+    CATALOGUE_STATUS_SQL, CATALOGUE_SUMMARY_SQL, FACET_SUMMARY_SQL, PRODUCT_TOTAL_SQL, build_batch_sql, build_count_sql,
+    build_facet_sql, build_search_sql, build_suggestion_sql, catalogue_status_samples, decode_page_cursor, facets_from_counts,
+    facets_from_summary, has_filters, row_to_product, split_batch, split_page
+)
+
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["ETag", "X-Corrected-Query"])
+instrument(app)
+
+# Completions returned by /suggest unless the client asks for more (up to the maximum)
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection frees up within the checkout timeout"""
+
+class TimedCursor(BaseCursor):
+    """Cursor whose statements and fetches count towards the request's db_execute and db_fetch spans"""
+    
+    def execute(self, query, vars=None):
+        with span('db_execute'):
+            return super().execute(query, vars)
+    
+    def fetchone(self):
+        with span('db_fetch'):
+            return super().fetchone()
+    
+    def fetchmany(self, *args, **kwargs):
+        with span('db_fetch'):
+            return super().fetchmany(*args, **kwargs)
+    
+    def fetchall(self):
+        with span('db_fetch'):
+            return super().fetchall()
+
+class TimedRealDictCursor(TimedCursor, RealDictCursor):
+    """RealDictCursor with the timing of TimedCursor"""
+
 class DatabaseManager:
+    """
+    Bounded pool of PostgreSQL connections. Each request checks one connection out
+    (get_connection) and the app returns it when the request ends.
+    """
+    
     def __init__(self):
-        self.connection = None
+        self.pool = None
+        self.max_connections = int(os.getenv('DB_POOL_MAX', '10'))
+        # psycopg2 closes a returned connection once minconn are idle rather than keeping it,
+        # so by default the pool keeps all of them open instead of reconnecting under load
+        self.min_connections = min(int(os.getenv('DB_POOL_MIN', self.max_connections)), self.max_connections)
+        self.checkout_timeout = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+        self.statement_timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))
+        # Connections idle for longer than this are pinged before being handed out
+        self.validate_after = float(os.getenv('DB_POOL_VALIDATE_AFTER', '30'))
+        
+        # ThreadedConnectionPool raises instead of waiting when it is exhausted,
+        # so callers queue on this semaphore first
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._in_use = 0
+        self.stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+            "discarded": 0
+        }
         self.connect_to_database()
     
     def connect_to_database(self):
-        """Connect to PostgreSQL database"""
+        """Create the connection pool"""
         try:
+            options = f"-c statement_timeout={self.statement_timeout_ms}"
+            
             # Get database connection details from environment variables
             db_url = os.getenv('DATABASE_URL')
             
             if db_url:
                 # For Render/Heroku deployment
-                self.connection = psycopg2.connect(db_url)
+                self.pool = ThreadedConnectionPool(
+                    self.min_connections, self.max_connections, db_url, options=options,
+                    cursor_factory=TimedCursor
+                )
             else:
                 # For local development
-                self.connection = psycopg2.connect(
+                self.pool = ThreadedConnectionPool(
+                    self.min_connections,
+                    self.max_connections,
                     host=os.getenv('DB_HOST', 'localhost'),
                     database=os.getenv('DB_NAME', 'linkkora'),
                     user=os.getenv('DB_USER', 'postgres'),
                     password=os.getenv('DB_PASSWORD', ''),
-                    port=os.getenv('DB_PORT', '5432')
+                    port=os.getenv('DB_PORT', '5432'),
+                    options=options,
+                    cursor_factory=TimedCursor
                 )
             
-            logger.info("Connected to PostgreSQL database successfully!")
+            logger.info(f"Connected to PostgreSQL database successfully! (pool of up to {self.max_connections})")
             
         except Exception as e:
             logger.error(f"Error connecting to database: {e}")
             raise
     
+    def _is_healthy(self, conn):
+        """Check a pooled connection before reuse; long-idle ones get a round trip"""
+        if conn.closed:
+            return False
+        # Read-only queries: autocommit means a failed statement never leaves
+        # the connection stuck in an aborted transaction
+        if not conn.autocommit:
+            conn.autocommit = True
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.validate_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def checkout(self):
+        """Take a connection from the pool, waiting up to checkout_timeout for one to free up"""
+        if not self._slots.acquire(blocking=False):
+            started = time.perf_counter()
+            acquired = self._slots.acquire(timeout=self.checkout_timeout)
+            waited = time.perf_counter() - started
+            with self._lock:
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += waited
+                self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+                if not acquired:
+                    self.stats["timeouts"] += 1
+            if not acquired:
+                raise PoolTimeoutError(f"No database connection available after {self.checkout_timeout}s")
+        
+        try:
+            conn = self.pool.getconn()
+            while not self._is_healthy(conn):
+                with self._lock:
+                    self.stats["discarded"] += 1
+                self._last_used.pop(id(conn), None)
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        
+        with self._lock:
+            self._in_use += 1
+            self.stats["checkouts"] += 1
+        return conn
+    
+    def release(self, conn):
+        """Return a connection to the pool, closing it if it is broken or mid-transaction"""
+        try:
+            broken = conn.closed or conn.info.transaction_status != TRANSACTION_STATUS_IDLE
+            if broken:
+                with self._lock:
+                    self.stats["discarded"] += 1
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            self.pool.putconn(conn, close=bool(broken))
+            # With DB_POOL_MIN below DB_POOL_MAX, psycopg2 closes returned connections beyond minconn
+            if conn.closed:
+                self._last_used.pop(id(conn), None)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+    
     def get_connection(self):
-        """Get database connection"""
-        if not self.connection or self.connection.closed:
-            self.connect_to_database()
-        return self.connection
+        """Get the database connection checked out for the current request"""
+        if 'db_connection' not in g:
+            with span('db_checkout'):
+                g.db_connection = self.checkout()
+        return g.db_connection
+    
+    def pool_metrics(self):
+        """Pool usage counters for /health"""
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics["in_use"] = self._in_use
+        metrics["max_connections"] = self.max_connections
+        metrics["idle"] = len(self.pool._pool) if self.pool else 0
+        metrics["wait_seconds"] = round(metrics["wait_seconds"], 4)
+        metrics["max_wait_seconds"] = round(metrics["max_wait_seconds"], 4)
+        return metrics
 
 # Initialize database manager
 db_manager = DatabaseManager()
 
-def search_products_postgres(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+class CatalogueVersion:
+    """
+    Data version of the catalogue, read from the catalogue_version table that every migration
+    bumps. It is re-read at most every DB_VERSION_CHECK_SECONDS, so cached responses outlive
+    a migration by that long at most.
+    """
+    
+    def __init__(self):
+        self.check_interval = float(os.getenv('DB_VERSION_CHECK_SECONDS', '5'))
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+    
+    def current(self):
+        """Current data version, or None when it can't be read"""
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._version
+        
+        try:
+            cursor = db_manager.get_connection().cursor()
+            cursor.execute("SELECT version FROM catalogue_version")
+            row = cursor.fetchone()
+            cursor.close()
+        except Exception as e:
+            logger.error(f"Error reading catalogue version: {e}")
+            return None
+        
+        with self._lock:
+            self._version = row[0] if row else 0
+            self._checked_at = time.monotonic()
+            return self._version
+
+catalogue_version = CatalogueVersion()
+result_cache = ResultCache()
+
+def catalogue_samples():
+    """Catalogue version and migration timings for /metrics"""
+    cursor = db_manager.get_connection().cursor()
+    cursor.execute(CATALOGUE_STATUS_SQL)
+    row = cursor.fetchone()
+    cursor.close()
+    return catalogue_status_samples(row)
+
+registry.add_collector(lambda: cache_samples(result_cache))
+registry.add_collector(lambda: pool_samples(db_manager.pool_metrics()))
+registry.add_collector(catalogue_samples)
+
+class FuzzyVocabulary:
+    """
+    Trigram index over the search_terms view for fuzzy searches, loaded on first use and
+    rebuilt whenever the catalogue version changes
+    """
+    
+    def __init__(self):
+        self._matcher = None
+        self._version = None
+        self._lock = threading.Lock()
+    
+    def matcher(self):
+        """FuzzyMatcher for the current catalogue, or None when the vocabulary can't be loaded"""
+        version = catalogue_version.current()
+        with self._lock:
+            if self._matcher is not None and version == self._version:
+                return self._matcher
+        
+        try:
+            cursor = db_manager.get_connection().cursor()
+            cursor.execute("SELECT word, ndoc FROM search_terms ORDER BY word")
+            rows = cursor.fetchall()
+            cursor.close()
+        except Exception as e:
+            logger.error(f"Error loading search terms: {e}")
+            mark_uncacheable()
+            return None
+        
+        matcher = FuzzyMatcher([row[0] for row in rows], [row[1] for row in rows])
+        with self._lock:
+            self._matcher, self._version = matcher, version
+        return matcher
+
+fuzzy_vocabulary = FuzzyVocabulary()
+
+class SummaryTables:
+    """
+    Brand and category summary from the catalogue_summary view, held in memory: loaded on first
+    use and reloaded whenever the catalogue version changes
+    """
+    
+    def __init__(self):
+        self._summary = None
+        self._version = None
+        self._lock = threading.Lock()
+    
+    def current(self):
+        """CatalogueSummary of the current catalogue, or None when it can't be loaded"""
+        version = catalogue_version.current()
+        with self._lock:
+            if self._summary is not None and version == self._version:
+                return self._summary
+        
+        try:
+            cursor = db_manager.get_connection().cursor()
+            cursor.execute(CATALOGUE_SUMMARY_SQL)
+            rows = cursor.fetchall()
+            cursor.close()
+        except Exception as e:
+            logger.error(f"Error loading catalogue summary: {e}")
+            mark_uncacheable()
+            return None
+        
+        summary = CatalogueSummary(rows)
+        with self._lock:
+            self._summary, self._version = summary, version
+        return summary
+
+summary_tables = SummaryTables()
+
+def summary_listing(kind):
+    """/brands or /categories response for the current catalogue: names, or stats with stats=1"""
+    summary = summary_tables.current()
+    if summary is None:
+        return []
+    return summary.listing(kind, is_enabled(request.args.get("stats")))
+
+def search_keyword():
     """
-    Search products in PostgreSQL database with filters
+    The request's `q` and the query as typed; with fuzzy=1, misspelled words
+    are replaced by their closest catalogue terms
+    """
+    query = request.args.get("q", "").lower()
+    if query and is_enabled(request.args.get("fuzzy")):
+        matcher = fuzzy_vocabulary.matcher()
+        if matcher is not None:
+            with span('fuzzy'):
+                return matcher.correct_query(query), query
+    return query, query
+
+def with_correction(response, query, typed_query):
+    """Report a fuzzy correction of the query in the X-Corrected-Query header (URL-encoded)"""
+    if query != typed_query:
+        response.headers["X-Corrected-Query"] = quote(query)
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Return the request's connection to the pool once the request is done"""
+    cleanup = g.pop('stream_cleanup', None)
+    if cleanup is not None:
+        cleanup()
+    conn = g.pop('db_connection', None)
+    if conn is not None:
+        db_manager.release(conn)
+
+def filter_args(name):
+    """All values of a repeatable filter parameter (brand=a&brand=b), lower-cased, empty ones dropped"""
+    return [value.lower() for value in request.args.getlist(name) if value.strip()]
+
+def search_products_postgres(query="", brand_filter="", category_filter="", min_price=None, max_price=None,
+                             sort=None):
+    """
+    Search products in PostgreSQL database with filters, in the given sort order
     """
     try:
         conn = db_manager.get_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Build the SQL query
-        sql = """
-            SELECT 
-                p.product_name,
-                p.product_url,
-                p.category,
-                p.brand,
-                p.price,
-                p.image_url,
-                p.description,
-                b.website_link as brand_website,
-                b.description as brand_description
-            FROM products p
-            LEFT JOIN brands b ON p.brand = b.brand
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        # Add search query filter
-        if query:
-            sql += " AND (LOWER(p.product_name) LIKE LOWER(%s) OR LOWER(p.category) LIKE LOWER(%s))"
-            search_term = f"%{query}%"
-            params.extend([search_term, search_term])
-        
-        # Add brand filter
-        if brand_filter:
-            sql += " AND LOWER(p.brand) = LOWER(%s)"
-            params.append(brand_filter)
-        
-        # Add category filter
-        if category_filter:
-            sql += " AND LOWER(p.category) = LOWER(%s)"
-            params.append(category_filter)
-        
-        # Add price filters
-        if min_price is not None:
-            sql += " AND p.price >= %s"
-            params.append(float(min_price))
-        
-        if max_price is not None:
-            sql += " AND p.price <= %s"
-            params.append(float(max_price))
-        
-        # Add ordering
-        sql += " ORDER BY p.product_name"
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        
+        sql, params, _ = build_search_sql(query, brand_filter, category_filter, min_price, max_price, sort)
         
         # Execute query
         cursor.execute(sql, params)
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        products = []
-        for row in results:
-            product = {
-                "product_name": row['product_name'] or "",
-                "product_url": row['product_url'] or "",
-                "category": row['category'] or "",
-                "brand": row['brand'] or "",
-                "price": str(row['price']) if row['price'] else "",
-                "image_url": row['image_url'] or "",
-                "description": row['description'] or "",
-                "brand_website": row['brand_website'] or "",
-                "brand_description": row['brand_description'] or ""
-            }
-            products.append(product)
+        rows = cursor.fetchall()
+        with span('rows'):
+            products = [row_to_product(row) for row in rows]
         
         cursor.close()
         return products
         
     except Exception as e:
         logger.error(f"Error searching products: {e}")
+        mark_uncacheable()
         return []
 
-def get_all_brands():
-    """Get all unique brands from the database"""
+def stream_products_postgres(query="", brand_filter="", category_filter="", min_price=None, max_price=None,
+                             sort=None, ndjson=False):
+    """
+    Search products like search_products_postgres, but return a generator of encoded result
+    chunks read STREAM_CHUNK_ROWS at a time through a server-side cursor. The query starts
+    before the generator is returned, so failures still end up as an empty result.
+    """
+    sql, params, _ = build_search_sql(query, brand_filter, category_filter, min_price, max_price, sort)
+    
+    conn = None
+    try:
+        conn = db_manager.get_connection()
+        # Server-side cursors live inside a transaction, so autocommit is off while the rows stream
+        conn.autocommit = False
+        cursor = conn.cursor(name="search_stream", cursor_factory=TimedRealDictCursor)
+        cursor.execute(sql, params)
+    except Exception as e:
+        logger.error(f"Error searching products: {e}")
+        mark_uncacheable()
+        if conn is not None and not conn.closed:
+            conn.rollback()
+            conn.autocommit = True
+        return iter([])
+    
+    def finish():
+        """End the cursor's transaction; runs once, from the stream or from the request teardown"""
+        if not (conn.closed or cursor.closed):
+            cursor.close()
+            conn.rollback()
+            conn.autocommit = True
+    
+    # The teardown calls finish too, so an abandoned stream never hands a busy connection back to the pool
+    g.stream_cleanup = finish
+    
+    def chunks():
+        try:
+            while True:
+                rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+                if not rows:
+                    break
+                with span('rows'):
+                    products = [row_to_product(row) for row in rows]
+                with span('serialize'):
+                    chunk = encode_rows(products, ndjson)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming products: {e}")
+            # A truncated body must not be cached
+            mark_uncacheable()
+        finally:
+            finish()
+    
+    return chunks()
+
+def search_products_page_postgres(limit, page_cursor=None, query="", brand_filter="", category_filter="",
+                                  min_price=None, max_price=None, sort=None):
+    """
+    Fetch one page of search results, in the order of search_products_postgres.
+    Pages with a keyset condition on the last row sent instead of OFFSET, so deep pages
+    cost the same as the first one. Returns (products, total, next_cursor).
+    """
+    filters = (query, brand_filter, category_filter, min_price, max_price)
+    count_sql, count_params = build_count_sql(*filters)
+    sort = parse_sort(sort, query)
+    keyset = decode_page_cursor(page_cursor, sort)
+    
+    # Fetch one extra row to find out whether there is a next page
+    sql, params, _ = build_search_sql(*filters, sort=sort, keyset=keyset, limit=limit + 1)
+    
+    try:
+        conn = db_manager.get_connection()
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        
+        cursor.execute(count_sql, count_params)
+        total = cursor.fetchone()['total']
+        
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        
+    except Exception as e:
+        logger.error(f"Error searching products: {e}")
+        mark_uncacheable()
+        return [], 0, None
+    
+    rows, next_cursor = split_page(rows, limit, sort)
+    with span('rows'):
+        products = [row_to_product(row) for row in rows]
+    return products, total, next_cursor
+
+def search_products_batch_postgres(specs):
+    """
+    Fetch the pages of several searches (search_batch.parse_batch specs) in one round trip.
+    Returns (products, total, next_cursor) per spec, as search_products_page_postgres would.
+    """
+    sql, params = build_batch_sql(specs)
+    
+    try:
+        conn = db_manager.get_connection()
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        
+    except Exception as e:
+        logger.error(f"Error searching products in a batch: {e}")
+        return [([], 0, None) for _ in specs]
+    
+    pages = split_batch(rows, specs)
+    with span('rows'):
+        return [([row_to_product(row) for row in page_rows], total, next_cursor)
+                for page_rows, total, next_cursor in pages]
+
+def get_facets_postgres(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+    """
+    Brand, category and price-bucket counts for a query and filters.
+    Each facet ignores its own filter. Without any query or filter the counts come straight
+    from the product_facet_counts materialized view.
+    """
     try:
         conn = db_manager.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT DISTINCT brand FROM brands ORDER BY brand")
-        brands = [row[0] for row in cursor.fetchall()]
+        filters = (query, brand_filter, category_filter, min_price, max_price)
+        if not has_filters(*filters):
+            cursor.execute(FACET_SUMMARY_SQL)
+            summary_rows = cursor.fetchall()
+            cursor.execute(PRODUCT_TOTAL_SQL)
+            total = cursor.fetchone()[0]
+            cursor.close()
+            return facets_from_summary(summary_rows, total)
         
+        results = []
+        for sql, params in build_facet_sql(*filters):
+            cursor.execute(sql, params)
+            results.append(cursor.fetchall())
         cursor.close()
-        return brands
+        
+        (total,), = results[0]
+        return facets_from_counts(total, *results[1:])
         
     except Exception as e:
-        logger.error(f"Error getting brands: {e}")
-        return []
+        logger.error(f"Error getting facets: {e}")
+        mark_uncacheable()
+        return {"total": 0, "brands": [], "categories": [], "price_buckets": price_bucket_entries([])}
 
-def get_all_categories():
-    """Get all unique categories from the database"""
+def get_suggestions_postgres(query, limit):
+    """
+    Top completions for a partially typed query from the search_suggestions view.
+    Phrases starting with the query rank first, then the most popular.
+    """
+    suggestion_sql = build_suggestion_sql(query, limit)
+    if suggestion_sql is None:
+        return []
+    
     try:
         conn = db_manager.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != '' ORDER BY category")
-        categories = [row[0] for row in cursor.fetchall()]
+        cursor.execute(*suggestion_sql)
+        suggestions = [{"text": row[0], "type": row[1], "count": row[2]} for row in cursor.fetchall()]
         
         cursor.close()
-        return categories
+        return suggestions
         
     except Exception as e:
-        logger.error(f"Error getting categories: {e}")
+        logger.error(f"Error getting suggestions: {e}")
         return []
 
 @app.route("/search", methods=["GET"])
+@cached_endpoint(result_cache, catalogue_version.current)
 def search():
-    """Search products endpoint"""
+    """
+    Search products endpoint.
+    Without `limit`/`cursor` the full result list is streamed as a JSON array
+    (or as NDJSON with `format=ndjson`);
+    with either of them the response is one page: {"total", "limit", "next_cursor", "results"}.
+    `brand` and `category` may be repeated to match any of several values.
+    `sort` is relevance (default with `q`), price_asc, price_desc or name (default without `q`).
+    `fuzzy=1` tolerates typos in `q`.
+    """
     try:
-        query = request.args.get("q", "").lower()
-        brand_filter = request.args.get("brand", "").lower()
-        category_filter = request.args.get("category", "").lower()
-        min_price = request.args.get("min_price")
-        max_price = request.args.get("max_price")
+        query, typed_query = search_keyword()
+        with span('parse'):
+            brand_filter = filter_args("brand")
+            category_filter = filter_args("category")
+            
+            try:
+                # Price bounds are read like the pandas app reads them: "1500", "Tk 1,500", ...
+                min_price_val = parse_price_bound(request.args.get("min_price"))
+                max_price_val = parse_price_bound(request.args.get("max_price"))
+                sort = parse_sort(request.args.get("sort"), query)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
         
-        # Convert price strings to numbers
-        min_price_val = float(min_price) if min_price else None
-        max_price_val = float(max_price) if max_price else None
+        if "limit" in request.args or "cursor" in request.args:
+            try:
+                limit = parse_limit(request.args.get("limit"))
+                results, total, next_cursor = search_products_page_postgres(
+                    limit,
+                    request.args.get("cursor"),
+                    query=query,
+                    brand_filter=brand_filter,
+                    category_filter=category_filter,
+                    min_price=min_price_val,
+                    max_price=max_price_val,
+                    sort=sort
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            with span('serialize'):
+                response = jsonify({
+                    "total": total,
+                    "limit": limit,
+                    "next_cursor": next_cursor,
+                    "results": results
+                })
+            return with_correction(response, query, typed_query)
         
-        results = search_products_postgres(
+        ndjson = wants_ndjson()
+        chunks = stream_products_postgres(
             query=query,
             brand_filter=brand_filter,
             category_filter=category_filter,
             min_price=min_price_val,
-            max_price=max_price_val
+            max_price=max_price_val,
+            sort=sort,
+            ndjson=ndjson
         )
         
-        return jsonify(results)
+        return with_correction(stream_response(chunks, ndjson), query, typed_query)
         
     except Exception as e:
         logger.error(f"Error in search endpoint: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """
+    Several paged searches in one request and one database round trip.
+    Body: {"queries": [{"q", "brand", "category", "min_price", "max_price", "sort", "limit", "cursor"}, ...]};
+    responds with {"results": [...]}, one /search page object per query, in order.
+    """
+    try:
+        with span('parse'):
+            specs = parse_batch(request.get_json(silent=True))
+        pages = search_products_batch_postgres(specs)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with span('serialize'):
+            return jsonify({"results": [
+                {"total": total, "limit": spec["limit"], "next_cursor": next_cursor, "results": results}
+                for spec, (results, total, next_cursor) in zip(specs, pages)
+            ]})
+    except Exception as e:
+        logger.error(f"Error in batch search endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/facets", methods=["GET"])
+@cached_endpoint(result_cache, catalogue_version.current)
+def get_facets():
+    """Facet counts endpoint, taking the same query and filters (and `fuzzy`) as /search"""
+    try:
+        query, typed_query = search_keyword()
+        try:
+            min_price = parse_price_bound(request.args.get("min_price"))
+            max_price = parse_price_bound(request.args.get("max_price"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        facets = get_facets_postgres(
+            query=query,
+            brand_filter=filter_args("brand"),
+            category_filter=filter_args("category"),
+            min_price=min_price,
+            max_price=max_price
+        )
+        with span('serialize'):
+            response = jsonify(facets)
+        return with_correction(response, query, typed_query)
+    except Exception as e:
+        logger.error(f"Error in facets endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/suggest", methods=["GET"])
+def suggest():
+    """Completions for a partially typed query: product names, categories and brands"""
+    try:
+        limit = parse_limit(request.args.get("limit"), SUGGEST_LIMIT, MAX_SUGGEST_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    query = request.args.get("q", "")
+    suggestions = get_suggestions_postgres(query, limit)
+    with span('serialize'):
+        return jsonify({"query": query, "suggestions": suggestions})
+
 @app.route("/brands", methods=["GET"])
+@cached_endpoint(result_cache, catalogue_version.current)
 def get_brands():
-    """Get all brands endpoint"""
+    """All brand names; with stats=1, each with its product count and min/max/median price"""
     try:
-        brands = get_all_brands()
-        return jsonify(brands)
+        brands = summary_listing('brand')
+        with span('serialize'):
+            return jsonify(brands)
     except Exception as e:
         logger.error(f"Error in brands endpoint: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/categories", methods=["GET"])
+@cached_endpoint(result_cache, catalogue_version.current)
 def get_categories():
-    """Get all categories endpoint"""
+    """All category names; with stats=1, each with its product count and min/max/median price"""
     try:
-        categories = get_all_categories()
-        return jsonify(categories)
+        categories = summary_listing('category')
+        with span('serialize'):
+            return jsonify(categories)
     except Exception as e:
         logger.error(f"Error in categories endpoint: {e}")
         return jsonify({"error": "Internal server error"}), 500
@@ -232,14 +745,18 @@ def health_check():
         return jsonify({
             "status": "healthy",
             "database": "connected",
-            "message": "LinkKora API is running"
+            "message": "LinkKora API is running",
+            "pool": db_manager.pool_metrics(),
+            "cache": result_cache.metrics()
         })
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return jsonify({
             "status": "unhealthy",
             "database": "disconnected",
-            "error": str(e)
+            "error": str(e),
+            "pool": db_manager.pool_metrics(),
+            "cache": result_cache.metrics()
         }), 500
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+# Typo-tolerant query correction shared by both LinkKora backends
+# A character-trigram index over the catalogue vocabulary narrows each misspelled term down to a
+# few candidate tokens, which are then ranked by a bounded edit distance
+
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Time a query may spend verifying candidates before settling for the best one found so far
+FUZZY_BUDGET_SECONDS = float(os.getenv('FUZZY_BUDGET_MS', '20')) / 1000
+
+
+def is_enabled(value) -> bool:
+    """Interpret the `fuzzy` request parameter."""
+    return str(value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def max_edits(term: str) -> int:
+    """Edits tolerated for a term: none for very short terms, where almost anything would match."""
+    if len(term) <= 3:
+        return 0
+    return 1 if len(term) <= 7 else 2
+
+
+def trigrams(token: str) -> List[str]:
+    """Character trigrams of a token padded like pg_trgm, so word starts and ends count too."""
+    padded = f"  {token} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (insertions, deletions, substitutions and adjacent
+    transpositions), giving up with limit + 1 as soon as it must exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyMatcher:
+    """
+    Trigram candidate index over a vocabulary of normalized tokens.
+    frequencies[token id] (e.g. the number of products containing the token) breaks ties
+    between equally close corrections.
+    """
+
+    def __init__(self, tokens: Sequence[str], frequencies: Sequence[int], grams: Dict[str, np.ndarray] = None):
+        self.tokens = list(tokens)
+        self.frequencies = np.asarray(frequencies, dtype=np.int64)
+        self.lengths = np.array([len(token) for token in self.tokens], dtype=np.int32)
+        # Same newline-joined layout as SearchIndex, for the "does any token contain this term" check
+        self._blob = "\n".join(self.tokens)
+
+        if grams is None:
+            gram_tokens: Dict[str, List[int]] = {}
+            for token_id, token in enumerate(self.tokens):
+                for gram in trigrams(token):
+                    gram_tokens.setdefault(gram, []).append(token_id)
+            grams = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in gram_tokens.items()}
+        # Trigram -> ids of the tokens containing it; passed in when restoring a saved index
+        self.grams = grams
+
+    def contains(self, term: str) -> bool:
+        """Whether some vocabulary token contains the term, i.e. it needs no correction."""
+        return term in self._blob
+
+    def candidates(self, term: str, edits: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Token ids sharing enough trigrams with term to possibly lie within `edits`, most shared first.
+        Every edit destroys at most four trigrams (a transposition touches four), so closer
+        tokens keep at least len(grams) - 4 * edits; at least one shared trigram is always required.
+        """
+        grams = trigrams(term)
+        postings = [self.grams[gram] for gram in grams if gram in self.grams]
+        if not postings:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        token_ids, shared = np.unique(np.concatenate(postings), return_counts=True)
+        keep = (shared >= max(1, len(grams) - 4 * edits)) & (np.abs(self.lengths[token_ids] - len(term)) <= edits)
+        token_ids, shared = token_ids[keep], shared[keep]
+        order = np.lexsort((-self.frequencies[token_ids], -shared))
+        return token_ids[order], shared[order]
+
+    def correct(self, term: str, deadline: float) -> Optional[str]:
+        """
+        Closest vocabulary token within the edit bound (most frequent among equally close ones),
+        or None. Stops verifying candidates once the deadline passes.
+        """
+        edits = max_edits(term)
+        if edits == 0:
+            return None
+        best, best_key = None, None
+        token_ids, _ = self.candidates(term, edits)
+        for token_id in token_ids.tolist():
+            distance = edit_distance(term, self.tokens[token_id], edits)
+            if distance <= edits:
+                key = (distance, -int(self.frequencies[token_id]))
+                if best_key is None or key < best_key:
+                    best, best_key = self.tokens[token_id], key
+            if time.perf_counter() > deadline:
+                break
+        return best
+
+    def correct_query(self, query: str, budget_seconds: float = FUZZY_BUDGET_SECONDS) -> str:
+        """
+        Rewrite a query, replacing every term that matches nothing with its closest token.
+        Terms that already match, or have no close enough token, are kept as typed.
+        """
+        deadline = time.perf_counter() + budget_seconds
+        terms = TOKEN_PATTERN.findall(query.lower())
+        if not terms:
+            return query
+        corrected = []
+        for term in terms:
+            replacement = None if self.contains(term) else self.correct(term, deadline)
+            corrected.append(replacement or term)
+        return " ".join(corrected) if corrected != terms else query
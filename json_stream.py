@@ -0,0 +1,83 @@
+# Streaming JSON responses for large /search results in both LinkKora backends
+# Rows are encoded and sent in chunks, so memory per request is bounded by the chunk size
+# instead of the size of the result, and the first bytes go out before the last rows are read
+
+import json
+import os
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library encoder produces the same output, only slower
+    orjson = None
+
+from flask import Response, request, stream_with_context
+
+# Rows encoded per chunk
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '1000'))
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def _dumps(value) -> str:
+    """Compact JSON with sorted keys, like Flask's jsonify."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def encode_rows(rows: List[dict], ndjson: bool = False) -> str:
+    """Encode one chunk of result dicts as a JSON array, or as NDJSON lines."""
+    if ndjson:
+        return "".join(_dumps(row) + "\n" for row in rows)
+    return _dumps(rows)
+
+
+def wants_ndjson(args=None) -> bool:
+    """Whether the client asked for one JSON object per line (format=ndjson); args default to Flask's request.args."""
+    return (request.args if args is None else args).get("format", "").lower() == "ndjson"
+
+
+def json_array_chunks(chunks: Iterable[str]) -> Iterator[str]:
+    """Join encoded JSON arrays (one per chunk) into the pieces of a single JSON array."""
+    yield "["
+    first = True
+    try:
+        for chunk in chunks:
+            body = chunk.strip()[1:-1]
+            if not body:
+                continue
+            yield body if first else "," + body
+            first = False
+    finally:
+        # Pass an early close (client gone) on, so the producer can release its cursor right away
+        if hasattr(chunks, "close"):
+            chunks.close()
+    yield "]"
+
+
+async def json_array_chunks_async(chunks: AsyncIterable[str]) -> AsyncIterator[str]:
+    """json_array_chunks for an async iterable of encoded chunks (the Quart app)."""
+    yield "["
+    first = True
+    try:
+        async for chunk in chunks:
+            body = chunk.strip()[1:-1]
+            if not body:
+                continue
+            yield body if first else "," + body
+            first = False
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+    yield "]"
+
+
+def stream_response(chunks: Iterable[str], ndjson: bool = False) -> Response:
+    """
+    Stream encoded chunks (see encode_rows) as one JSON array, or as NDJSON. The request context,
+    and with it any pooled database connection, stays open until the last chunk is sent.
+    """
+    if ndjson:
+        return Response(stream_with_context(chunks), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(json_array_chunks(chunks)), mimetype="application/json")
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import Header from './components/Header';
 import FilterSidebar from './components/FilterSidebar';
 import ProductGrid from './components/ProductGrid';
@@ -6,19 +6,14 @@ import FavouritesPage from './components/FavouritesPage';
 import LandingPage from './components/LandingPage';
 import { api } from './services/api';
 
+// Products fetched per page of results; further pages are fetched on demand
+const PAGE_SIZE = 48;
+
 // Brand Slideshow Hero Section Component
-const BrandSlideshow = ({ products }) => {
+const BrandSlideshow = ({ brands: allBrands }) => {
   const [currentBrandIndex, setCurrentBrandIndex] = useState(0);
   
-  // Get unique brands from products
-  const getBrands = () => {
-    if (!products || products.length === 0) return [];
-    
-    const uniqueBrands = [...new Set(products.map(p => p.brand).filter(Boolean))];
-    return uniqueBrands.slice(0, 12); // Limit to 12 brands for slideshow
-  };
-
-  const brands = getBrands();
+  const brands = (allBrands || []).slice(0, 12); // Limit to 12 brands for slideshow
 
   // Curated background images for Bangladeshi fashion with warm luxury theme
   const backgroundImages = [
@@ -100,7 +95,14 @@ function App() {
   // Always show landing page for the full experience (like Dior.com)
   const [showLanding, setShowLanding] = useState(true);
   const [products, setProducts] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [brands, setBrands] = useState([]);
+  const [categories, setCategories] = useState([]);
+  // Bumped by every new search, so pages of an outdated search are dropped
+  const searchId = useRef(0);
   const [searchQuery, setSearchQuery] = useState('');
 
   const [currentPage, setCurrentPage] = useState('home');
@@ -115,60 +117,57 @@ function App() {
     selectedBrands: []
   });
 
-  // Load initial products
+  // Brand and category lists for the slideshow and the filters, from the server's summaries
   useEffect(() => {
-    loadProducts();
+    api.getBrands().then(setBrands);
+    api.getCategories().then(setCategories);
   }, []);
 
   // Handle search and filter changes
   useEffect(() => {
-    // Always call handleSearch when filters change, even if empty (to load all products)
+    // Always call handleSearch when filters change, even if empty (first page of all products)
     handleSearch();
   }, [searchQuery, filters]);
 
-  const loadProducts = async () => {
+  // Selected brands are filtered on the server (repeated brand= parameters)
+  const apiFilters = () => ({
+    min_price: filters.minPrice,
+    max_price: filters.maxPrice,
+    brand: filters.selectedBrands && filters.selectedBrands.length > 0
+      ? filters.selectedBrands
+      : filters.brand
+  });
+
+  const handleSearch = async () => {
+    const id = ++searchId.current;
     setLoading(true);
     try {
-      const data = await api.getAllProducts();
-      setProducts(data);
+      // Only the first page is fetched; the rest follow on demand through loadMore
+      const page = await api.searchProductsPage(searchQuery, apiFilters(), PAGE_SIZE);
+      if (id !== searchId.current) return;
+      setProducts(page.results);
+      setTotal(page.total);
+      setNextCursor(page.next_cursor);
     } catch (error) {
-      console.error('Error loading products:', error);
+      console.error('Error searching products:', error);
     } finally {
-      setLoading(false);
+      if (id === searchId.current) setLoading(false);
     }
   };
 
-  const handleSearch = async () => {
-    setLoading(true);
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    const id = searchId.current;
+    setLoadingMore(true);
     try {
-      // For API call, don't send brand filter if multiple brands are selected
-      // We'll filter client-side for multiple brands
-      const apiFilters = {
-        q: searchQuery,
-        min_price: filters.minPrice,
-        max_price: filters.maxPrice
-      };
-      
-      // Only send single brand to API if no multiple brands selected
-      if (!filters.selectedBrands || filters.selectedBrands.length <= 1) {
-        apiFilters.brand = filters.brand;
-      }
-      
-      const data = await api.searchProducts(searchQuery, apiFilters);
-      
-      // Client-side filtering for multiple brands
-      let filteredData = data;
-      if (filters.selectedBrands && filters.selectedBrands.length > 0) {
-        filteredData = data.filter(product => 
-          filters.selectedBrands.includes(product.brand)
-        );
-      }
-      
-      setProducts(filteredData);
+      const page = await api.searchProductsPage(searchQuery, apiFilters(), PAGE_SIZE, nextCursor);
+      if (id !== searchId.current) return;
+      setProducts(prev => [...prev, ...page.results]);
+      setNextCursor(page.next_cursor);
     } catch (error) {
-      console.error('Error searching products:', error);
+      console.error('Error loading more products:', error);
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -217,7 +216,7 @@ function App() {
       {currentPage === 'home' ? (
         <>
           {!searchQuery && !filters.selectedBrands?.length && !filters.minPrice && !filters.maxPrice && (
-            <BrandSlideshow products={products} />
+            <BrandSlideshow brands={brands} />
           )}
           
           <div className="container">
@@ -225,12 +224,18 @@ function App() {
               <FilterSidebar 
                 filters={filters}
                 onFilterChange={handleFilterChange}
-                products={products}
+                brands={brands}
+                categories={categories}
+                total={total}
               />
               
               <ProductGrid 
                 products={products}
+                total={total}
                 loading={loading}
+                loadingMore={loadingMore}
+                hasMore={Boolean(nextCursor)}
+                onLoadMore={loadMore}
                 favorites={favorites}
                 onToggleFavorite={handleToggleFavorite}
               />
@@ -1,16 +1,9 @@
-import React, { useState, useEffect } from 'react';
-import { getUniqueBrands, getUniqueCategories } from '../services/api';
+import React from 'react';
 
-const FilterSidebar = ({ filters, onFilterChange, products }) => {
-  const [availableBrands, setAvailableBrands] = useState([]);
-  const [availableCategories, setAvailableCategories] = useState([]);
-
-  useEffect(() => {
-    if (products.length > 0) {
-      setAvailableBrands(getUniqueBrands(products));
-      setAvailableCategories(getUniqueCategories(products));
-    }
-  }, [products]);
+// brands and categories come from /brands and /categories: the products on screen are only a page of the results
+const FilterSidebar = ({ filters, onFilterChange, brands = [], categories = [], total = 0 }) => {
+  const availableBrands = brands;
+  const availableCategories = categories;
 
   const handlePriceChange = (field, value) => {
     onFilterChange({
@@ -117,7 +110,7 @@ const FilterSidebar = ({ filters, onFilterChange, products }) => {
       {/* Filter Summary */}
       <div className="filter-summary">
         <small>
-          {products.length} item{products.length !== 1 ? 's' : ''}
+          {total} item{total !== 1 ? 's' : ''}
         </small>
       </div>
     </div>
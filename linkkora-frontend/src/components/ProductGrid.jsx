@@ -2,7 +2,7 @@ import React from 'react';
 import ProductCard from './ProductCard';
 import LoadingSkeleton from './LoadingSkeleton';
 
-const ProductGrid = ({ products, loading, favorites, onToggleFavorite }) => {
+const ProductGrid = ({ products, total, loading, loadingMore, hasMore, onLoadMore, favorites, onToggleFavorite }) => {
   if (loading) {
     return (
       <div className="product-grid">
@@ -27,7 +27,7 @@ const ProductGrid = ({ products, loading, favorites, onToggleFavorite }) => {
     <div className="product-grid-container">
       <div className="product-grid-header">
         <h2>All Products</h2>
-        <p>{products.length} products found</p>
+        <p>{total ?? products.length} products found</p>
       </div>
       
       <div className="product-grid">
@@ -40,6 +40,15 @@ const ProductGrid = ({ products, loading, favorites, onToggleFavorite }) => {
           />
         ))}
       </div>
+
+      {/* Further pages are fetched only when asked for */}
+      {hasMore && (
+        <div className="load-more">
+          <button className="btn btn-secondary" onClick={onLoadMore} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : `Show more (${products.length} of ${total})`}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
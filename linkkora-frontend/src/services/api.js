@@ -2,16 +2,20 @@
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5050';
 
 export const api = {
-  // Search products with optional filters
+  // Every product matching a search, streamed by the server in one response; for exports and
+  // the like, while the shop pages through searchProductsPage
   searchProducts: async (query = '', filters = {}) => {
     try {
       const params = new URLSearchParams();
       
       if (query) params.append('q', query);
-      if (filters.brand) params.append('brand', filters.brand);
-      if (filters.category) params.append('category', filters.category);
+      // brand and category may be arrays; each value becomes its own repeated parameter
+      [].concat(filters.brand || []).forEach(brand => params.append('brand', brand));
+      [].concat(filters.category || []).forEach(category => params.append('category', category));
       if (filters.min_price) params.append('min_price', filters.min_price);
       if (filters.max_price) params.append('max_price', filters.max_price);
+      if (filters.fuzzy) params.append('fuzzy', '1');
+      if (filters.sort) params.append('sort', filters.sort);
 
       const response = await fetch(`${API_BASE_URL}/search?${params.toString()}`);
       
@@ -26,10 +30,74 @@ export const api = {
     }
   },
 
-  // Get all products (for initial load)
-  getAllProducts: async () => {
+  // Fetch one page of products in the server's ranking (filters.sort: relevance, price_asc, price_desc or name).
+  // Resolves to { total, limit, next_cursor, results }; pass next_cursor back to get the following page.
+  searchProductsPage: async (query = '', filters = {}, limit = 48, cursor = null) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/search`);
+      const params = new URLSearchParams();
+      
+      if (query) params.append('q', query);
+      // brand and category may be arrays; each value becomes its own repeated parameter
+      [].concat(filters.brand || []).forEach(brand => params.append('brand', brand));
+      [].concat(filters.category || []).forEach(category => params.append('category', category));
+      if (filters.min_price) params.append('min_price', filters.min_price);
+      if (filters.max_price) params.append('max_price', filters.max_price);
+      if (filters.fuzzy) params.append('fuzzy', '1');
+      if (filters.sort) params.append('sort', filters.sort);
+      params.append('limit', limit);
+      if (cursor) params.append('cursor', cursor);
+
+      const response = await fetch(`${API_BASE_URL}/search?${params.toString()}`);
+      
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching products page:', error);
+      return { total: 0, limit, next_cursor: null, results: [] };
+    }
+  },
+
+  // Fetch the first page of several searches in one request (e.g. every carousel of a page).
+  // Each query is { q, brand, category, min_price, max_price, sort, limit, cursor };
+  // resolves to one { total, limit, next_cursor, results } per query, in order.
+  searchProductsBatch: async (queries = []) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/search/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ queries }),
+      });
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const data = await response.json();
+      return data.results;
+    } catch (error) {
+      console.error('Error fetching product batch:', error);
+      return queries.map(query => ({ total: 0, limit: query.limit || 48, next_cursor: null, results: [] }));
+    }
+  },
+
+  // Brand, category and price-bucket counts for a query and filters,
+  // so the filter sidebar does not need the whole catalogue
+  getFacets: async (query = '', filters = {}) => {
+    try {
+      const params = new URLSearchParams();
+      
+      if (query) params.append('q', query);
+      // brand and category may be arrays; each value becomes its own repeated parameter
+      [].concat(filters.brand || []).forEach(brand => params.append('brand', brand));
+      [].concat(filters.category || []).forEach(category => params.append('category', category));
+      if (filters.min_price) params.append('min_price', filters.min_price);
+      if (filters.max_price) params.append('max_price', filters.max_price);
+      if (filters.fuzzy) params.append('fuzzy', '1');
+
+      const response = await fetch(`${API_BASE_URL}/facets?${params.toString()}`);
       
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -37,7 +105,57 @@ export const api = {
       
       return await response.json();
     } catch (error) {
-      console.error('Error fetching all products:', error);
+      console.error('Error fetching facets:', error);
+      return { total: 0, brands: [], categories: [], price_buckets: [] };
+    }
+  },
+
+  // Completions for the search box; cheap enough to call on every keystroke
+  getSuggestions: async (query = '', limit = 8) => {
+    try {
+      const params = new URLSearchParams({ q: query, limit });
+      const response = await fetch(`${API_BASE_URL}/suggest?${params.toString()}`);
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const data = await response.json();
+      return data.suggestions;
+    } catch (error) {
+      console.error('Error fetching suggestions:', error);
+      return [];
+    }
+  },
+
+  // Every brand or category name from the server's precomputed summary; with stats, each entry is
+  // { value, count, min_price, max_price, median_price }
+  getBrands: async (stats = false) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/brands${stats ? '?stats=1' : ''}`);
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching brands:', error);
+      return [];
+    }
+  },
+
+  getCategories: async (stats = false) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/categories${stats ? '?stats=1' : ''}`);
+
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Error fetching categories:', error);
       return [];
     }
   }
@@ -4,6 +4,11 @@ LinkKora Excel to PostgreSQL Migration Script
 This script migrates data from Excel files to PostgreSQL database
 """
 
+import argparse
+import hashlib
+import io
+import json
+import time
 import pandas as pd
 import psycopg2
 from psycopg2.extras import RealDictCursor
@@ -11,12 +16,49 @@ import os
 from dotenv import load_dotenv
 import sys
 
+from multi_sheet_loader import load_brands, load_products_from_multisheet
+
 # Load environment variables
 load_dotenv()
 
+BRANDS_EXCEL_PATH = 'NNRZ Database.xlsx'
+PRODUCTS_EXCEL_PATH = 'NNRZ Products.xlsx'
+
+# Columns written to each table, in COPY order
+BRAND_COLUMNS = ['brand', 'brand_clean', 'description', 'website_link', 'social_media', 'content_hash']
+PRODUCT_COLUMNS = ['product_key', 'product_name', 'product_url', 'category', 'brand', 'brand_clean', 'price',
+                   'image_url', 'description', 'content_hash']
+
+# Stable identity of a row in each table, used by --sync to match rows across runs
+BRAND_KEY = 'brand_clean'
+PRODUCT_KEY = 'product_key'
+
+# Rows sent per COPY statement
+COPY_BATCH_SIZE = 50000
+
+# Materialized views derived from the products table, refreshed after every change; each has a
+# unique index on plain columns so it can be refreshed CONCURRENTLY
+SUMMARY_VIEWS = ('product_facet_counts', 'catalogue_summary', 'search_suggestions', 'search_terms')
+
+# How COPY spells NULL; in CSV an unquoted empty field would otherwise be NULL too
+COPY_NULL = r'\N'
+
+def add_content_hash(df, key_column):
+    """
+    Fingerprint every row's content (all columns except the key) with MD5, so a sync can
+    tell changed rows apart without comparing them column by column.
+    Rows sharing a key are collapsed to the first one, since the key must be unique.
+    """
+    df = df.drop_duplicates(key_column, keep='first').copy()
+    content = df.drop(columns=[key_column]).astype(str).agg('\x1f'.join, axis=1)
+    df['content_hash'] = [hashlib.md5(text.encode('utf-8')).hexdigest() for text in content]
+    return df
+
 class DatabaseMigrator:
     def __init__(self):
         self.connection = None
+        # Seconds taken by each step of this run, stored with the catalogue version it produces
+        self.timings = {}
         self.connect_to_database()
     
     def connect_to_database(self):
@@ -61,90 +103,201 @@ class DatabaseMigrator:
             print(f"❌ Error creating tables: {e}")
             sys.exit(1)
     
-    def migrate_brands(self):
-        """Migrate brands data from Excel to PostgreSQL"""
+    def copy_into_staging(self, cursor, table, columns, df):
+        """
+        Stream a DataFrame into a temporary staging copy of `table` with COPY ... FROM STDIN,
+        in batches of COPY_BATCH_SIZE rows. Returns the staging table name.
+        Missing values are written as an explicit \\N marker, so an empty string (e.g. a blank
+        product name) stays an empty string instead of becoming NULL.
+        """
+        staging = f"{table}_staging"
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+        
+        copy_sql = f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        started = time.perf_counter()
+        for start in range(0, len(df), COPY_BATCH_SIZE):
+            buffer = io.StringIO()
+            df.iloc[start:start + COPY_BATCH_SIZE].to_csv(buffer, header=False, index=False, na_rep=COPY_NULL)
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+        elapsed = time.perf_counter() - started
+        
+        rate = len(df) / elapsed if elapsed > 0 else float('inf')
+        print(f"   Copied {len(df)} rows into {staging} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return staging
+    
+    def replace_from_staging(self, cursor, table, columns, staging):
+        """
+        Replace the live table's rows with the staging rows. Runs inside the caller's
+        transaction, so readers keep seeing the old rows until it commits and never an empty table.
+        """
+        column_list = ', '.join(columns)
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging}")
+        cursor.execute(f"DROP TABLE {staging}")
+    
+    def load_catalogue(self):
+        """Load brands and the full multi-sheet product catalogue through the shared loader"""
+        print("📊 Loading brands and products from Excel...")
+        started = time.perf_counter()
+        brands_df = load_brands(BRANDS_EXCEL_PATH)
+        products_df = load_products_from_multisheet(PRODUCTS_EXCEL_PATH, brands_df, compact=False)
+        
+        brands = pd.DataFrame({
+            'brand': brands_df['brand'],
+            'brand_clean': brands_df['brand_clean'],
+            'description': brands_df.get('description'),
+            'website_link': brands_df.get('website link'),
+            'social_media': brands_df.get('social media'),
+        })
+        brands = add_content_hash(brands[brands['brand'].notna()], BRAND_KEY)
+        
+        products = pd.DataFrame({
+            # The product page URL identifies a product across scrapes; fall back to brand + name
+            'product_key': products_df['Product URL'].fillna(
+                products_df['brand_clean'].astype(str) + ':' + products_df['Product Name'].astype(str)
+            ),
+            'product_name': products_df['Product Name'].fillna(''),
+            'product_url': products_df['Product URL'],
+            'category': products_df['Category'],
+            # Products whose sheet has no row in the brands workbook keep their sheet's brand tag
+            'brand': products_df['brand'].fillna(products_df['brand_clean']),
+            'brand_clean': products_df['brand_clean'],
+            'price': products_df['price_value'],
+            'image_url': products_df['Image URL'],
+            'description': products_df.get('Description'),
+        })
+        products = add_content_hash(products, PRODUCT_KEY)
+        self.timings['load'] = time.perf_counter() - started
+        return brands, products
+    
+    def migrate_catalogue(self):
+        """
+        Migrate brands and products from Excel to PostgreSQL: COPY both into staging tables,
+        then replace the live tables from them in a single transaction
+        """
         try:
-            print("📊 Loading brands from Excel...")
-            
-            # Load brands from Excel
-            brands_df = pd.read_excel('NNRZ Database.xlsx')
-            
-            # Clean and prepare data
-            brands_df = brands_df.fillna('')
+            brands, products = self.load_catalogue()
+            started = time.perf_counter()
             
             cursor = self.connection.cursor()
+            brands_staging = self.copy_into_staging(cursor, 'brands', BRAND_COLUMNS, brands[BRAND_COLUMNS])
+            products_staging = self.copy_into_staging(cursor, 'products', PRODUCT_COLUMNS, products[PRODUCT_COLUMNS])
             
-            # Clear existing brands data
-            cursor.execute("DELETE FROM brands")
-            
-            # Insert brands data
-            for _, row in brands_df.iterrows():
-                cursor.execute("""
-                    INSERT INTO brands (brand, brand_clean, description, website_link, social_media)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    row.get('brand', ''),
-                    row.get('brand_clean', ''),
-                    row.get('description', ''),
-                    row.get('website link', ''),
-                    row.get('social media', '')
-                ))
-            
+            self.replace_from_staging(cursor, 'brands', BRAND_COLUMNS, brands_staging)
+            self.replace_from_staging(cursor, 'products', PRODUCT_COLUMNS, products_staging)
             self.connection.commit()
             cursor.close()
             
-            print(f"✅ Migrated {len(brands_df)} brands to PostgreSQL!")
+            elapsed = time.perf_counter() - started
+            self.timings['copy'] = elapsed
+            total_rows = len(brands) + len(products)
+            print(f"✅ Migrated {len(brands)} brands and {len(products)} products to PostgreSQL "
+                  f"in {elapsed:.2f}s ({total_rows / elapsed if elapsed > 0 else 0:,.0f} rows/s)!")
             
         except Exception as e:
-            print(f"❌ Error migrating brands: {e}")
+            self.connection.rollback()
+            print(f"❌ Error migrating catalogue: {e}")
             sys.exit(1)
     
-    def migrate_products(self):
-        """Migrate products data from Excel to PostgreSQL"""
+    def sync_from_staging(self, cursor, table, key_column, columns, df):
+        """
+        Bring the live table in line with df by touching only what changed: rows whose key is
+        new are inserted, rows whose content hash differs are updated with INSERT ... ON CONFLICT,
+        and rows whose key disappeared are deleted. Runs inside the caller's transaction.
+        Returns (inserted, updated, deleted).
+        """
+        cursor.execute(f"SELECT {key_column}, content_hash FROM {table}")
+        existing = pd.DataFrame(cursor.fetchall(), columns=[key_column, 'existing_hash'])
+        
+        diff = df.merge(existing, on=key_column, how='left')
+        is_new = diff['existing_hash'].isna()
+        is_changed = ~is_new & (diff['existing_hash'] != diff['content_hash'])
+        changed = diff.loc[is_new | is_changed, columns]
+        deleted_keys = existing.loc[~existing[key_column].isin(df[key_column]) & existing[key_column].notna(), key_column].tolist()
+        
+        if len(changed):
+            staging = self.copy_into_staging(cursor, table, columns, changed)
+            column_list = ', '.join(columns)
+            updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns if column != key_column)
+            cursor.execute(f"""
+                INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging}
+                ON CONFLICT ({key_column}) DO UPDATE SET {updates}
+                WHERE {table}.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            """)
+            cursor.execute(f"DROP TABLE {staging}")
+        
+        if deleted_keys:
+            cursor.execute(f"DELETE FROM {table} WHERE {key_column} = ANY(%s)", (deleted_keys,))
+        
+        # Rows loaded before keys existed cannot be matched, so the keyed rows above replace them
+        cursor.execute(f"DELETE FROM {table} WHERE {key_column} IS NULL")
+        deleted_keys += [None] * cursor.rowcount
+        
+        return int(is_new.sum()), int(is_changed.sum()), len(deleted_keys)
+    
+    def sync_catalogue(self):
+        """
+        Incrementally sync brands and products from Excel to PostgreSQL in a single transaction,
+        writing only inserted, changed and removed rows
+        """
         try:
-            print("📊 Loading products from Excel...")
-            
-            # Load products from Excel
-            products_df = pd.read_excel('NNRZ Products.xlsx')
-            
-            # Clean and prepare data
-            products_df = products_df.fillna('')
+            brands, products = self.load_catalogue()
+            started = time.perf_counter()
             
             cursor = self.connection.cursor()
+            brand_counts = self.sync_from_staging(cursor, 'brands', BRAND_KEY, BRAND_COLUMNS, brands)
+            product_counts = self.sync_from_staging(cursor, 'products', PRODUCT_KEY, PRODUCT_COLUMNS, products)
+            self.connection.commit()
+            cursor.close()
             
-            # Clear existing products data
-            cursor.execute("DELETE FROM products")
-            
-            # Insert products data
-            for _, row in products_df.iterrows():
-                # Extract price and convert to decimal
-                price_str = str(row.get('Price', '0')).replace(',', '').replace('Tk', '').strip()
-                try:
-                    price = float(price_str) if price_str else 0.0
-                except:
-                    price = 0.0
-                
-                cursor.execute("""
-                    INSERT INTO products (product_name, product_url, category, brand, brand_clean, price, image_url, description)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    row.get('Product Name', ''),
-                    row.get('Product URL', ''),
-                    row.get('Category', ''),
-                    row.get('brand', ''),
-                    row.get('brand_clean', ''),
-                    price,
-                    row.get('Image URL', ''),
-                    row.get('Description', '')
-                ))
+            elapsed = time.perf_counter() - started
+            self.timings['sync'] = elapsed
+            for table, (inserted, updated, deleted) in (('brands', brand_counts), ('products', product_counts)):
+                print(f"   {table}: {inserted} inserted, {updated} updated, {deleted} deleted")
+            print(f"✅ Synced catalogue to PostgreSQL in {elapsed:.2f}s!")
+            return sum(brand_counts) + sum(product_counts)
             
+        except Exception as e:
+            self.connection.rollback()
+            print(f"❌ Error syncing catalogue: {e}")
+            sys.exit(1)
+    
+    def refresh_summaries(self):
+        """
+        Refresh the materialized views derived from the products table and bump the catalogue
+        version, which tells the API to drop its cached responses. The step timings of this run
+        are stored with the new version.
+        Each view is refreshed CONCURRENTLY in a transaction of its own, after the data change has
+        been committed: readers of /facets, /suggest, /brands and /categories keep being served from
+        the previous contents meanwhile instead of waiting for an exclusive lock.
+        """
+        try:
+            started = time.perf_counter()
+            self.connection.autocommit = True
+            cursor = self.connection.cursor()
+            for view in SUMMARY_VIEWS:
+                cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+            self.connection.autocommit = False
+            self.timings['refresh'] = time.perf_counter() - started
+            timings = {step: round(seconds, 4) for step, seconds in self.timings.items()}
+            cursor.execute("""
+                UPDATE catalogue_version
+                SET version = version + 1, updated_at = CURRENT_TIMESTAMP, migration_timings = %s
+                RETURNING version
+            """, (json.dumps(timings),))
+            version = cursor.fetchone()[0]
             self.connection.commit()
             cursor.close()
             
-            print(f"✅ Migrated {len(products_df)} products to PostgreSQL!")
+            print(f"✅ Refreshed facet counts, brand and category summaries, suggestions and search terms (catalogue version {version})!")
+            print("⏱️  " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
             
         except Exception as e:
-            print(f"❌ Error migrating products: {e}")
+            self.connection.rollback()
+            self.connection.autocommit = False
+            print(f"❌ Error refreshing summaries: {e}")
             sys.exit(1)
     
     def verify_migration(self):
@@ -181,6 +334,11 @@ class DatabaseMigrator:
             print("🔌 Database connection closed")
 
 def main():
+    parser = argparse.ArgumentParser(description="Migrate the LinkKora Excel catalogue to PostgreSQL")
+    parser.add_argument('--sync', action='store_true',
+                        help="only insert, update and delete the rows that changed instead of reloading everything")
+    args = parser.parse_args()
+    
     print("🚀 Starting LinkKora Excel to PostgreSQL Migration")
     print("=" * 50)
     
@@ -191,8 +349,14 @@ def main():
         migrator.create_tables()
         
         # Migrate data
-        migrator.migrate_brands()
-        migrator.migrate_products()
+        if args.sync:
+            changed_rows = migrator.sync_catalogue()
+        else:
+            migrator.migrate_catalogue()
+            changed_rows = None
+        
+        if changed_rows != 0:
+            migrator.refresh_summaries()
         
         # Verify migration
         migrator.verify_migration()
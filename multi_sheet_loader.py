@@ -1,94 +1,719 @@
 # Multi-sheet loader integrated with your search engine for live deployment
 # Skips irrelevant sheets, cleans brand names, merges with brands_df for seamless LinkKora deployment
 
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import sys
+import time
+import weakref
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from catalogue_snapshot import DEFAULT_SNAPSHOT_DIR, read_snapshot
+from catalogue_summary import CatalogueSummary
+from facets import facet_entries, price_bucket_entries
+from pagination import decode_cursor, encode_cursor
+from ranking import BRAND_BOOSTS, parse_sort
+from request_metrics import record_load, span
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Optional: without pyarrow the text columns stay object arrays of interned strings
+TEXT_DTYPE = pd.StringDtype("pyarrow") if importlib.util.find_spec("pyarrow") else None
+
+SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIP_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+# Below this many sheets the loader parses in-process instead of starting a pool
+PARALLEL_SHEET_THRESHOLD = 4
+
+# A brand or category filter: one value, or a list of values any of which may match
+FilterValue = Union[str, Sequence[str], None]
+
+# Search indexes keyed by id() of the products DataFrame they were built from.
+# Entries are dropped automatically when that DataFrame is garbage collected.
+_search_indexes: Dict[int, SearchIndex] = {}
+# Brand and category summaries (see catalogue_summary.py), keyed the same way
+_catalogue_summaries: Dict[int, CatalogueSummary] = {}
 
-def load_brands(brands_excel_path: str) -> pd.DataFrame:
-    """Load the NNRZ Database with brand details."""
+# First number in a price string such as "Tk 1,599.00 BDT", "BDT35,100.00", "৳1,349" or "1,200 - 1,500"
+PRICE_NUMBER_PATTERN = r'(\d+(?:\.\d+)?)'
+
+# Markers of a currency other than BDT ("$65", "USD 40", "€30"). Prices are compared and filtered as
+# BDT and there is no exchange rate to convert with, so such prices are treated as missing
+FOREIGN_CURRENCY_PATTERN = r'[$€£₹]|(?<![a-z])(?:usd|eur|gbp|inr)(?![a-z])'
+
+# Low-cardinality columns stored as categorical codes; brand_website and brand_description are
+# per-brand values, so their categories act as a brand-details table looked up by code
+CATEGORICAL_COLUMNS = ('brand_clean', 'brand', 'Category', 'brand_website', 'brand_description', 'product_status')
+
+# Free-text columns with (nearly) one value per product
+TEXT_COLUMNS = ('Product Name', 'Product URL', 'Image URL', 'Price', 'Secondary Image Link')
+
+# Output field name -> catalogue column, in the order results are returned
+RESULT_COLUMNS = {
+    "product_name": "Product Name",
+    "product_url": "Product URL",
+    "product_image": "Image URL",
+    "price": "Price",
+    "category": "Category",
+    "brand": "brand",
+    "brand_website": "brand_website",
+    "brand_description": "brand_description",
+}
+
+def read_brands_workbook(brands_excel_path: str) -> pd.DataFrame:
+    """Parse the NNRZ Database workbook and add the brand_clean join key."""
     brands_df = pd.read_excel(brands_excel_path)
     brands_df['brand_clean'] = brands_df['brand'].str.strip().str.lower().str.replace('+', 'plus').str.replace(' ', '')
     return brands_df
 
-def load_products_from_multisheet(products_excel_path: str) -> pd.DataFrame:
+def load_brands(brands_excel_path: str, snapshot_dir: Optional[str] = DEFAULT_SNAPSHOT_DIR) -> pd.DataFrame:
     """
-    Load all product sheets from the multi-sheet Excel, skipping irrelevant sheets,
-    cleaning and tagging with brand names automatically.
+    Load the NNRZ Database with brand details.
+    Uses the columnar snapshot when one matches the workbook (pass snapshot_dir=None to always parse it).
     """
-    xls = pd.ExcelFile(products_excel_path)
-    clean_products_list = []
+    brands_df = read_snapshot(brands_excel_path, snapshot_dir) if snapshot_dir else None
+    if brands_df is None:
+        brands_df = read_brands_workbook(brands_excel_path)
+    return brands_df
 
-    skip_sheets = {'brand name', 'brand name 2', 'Sheet7'}
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """
+    Normalize raw price cells into BDT floats, once for the whole column.
+    BDT markers (Tk, BDT, ৳) and thousands separators are dropped; for a range the lower bound is used.
+    Cells without a number, or priced in another currency (see FOREIGN_CURRENCY_PATTERN), become NaN.
+    """
+    numeric = pd.to_numeric(prices, errors='coerce')
+    text = prices[numeric.isna() & prices.notna()].astype(str)
+    foreign = text.str.contains(FOREIGN_CURRENCY_PATTERN, case=False, regex=True)
+    if foreign.any():
+        logger.warning("Ignoring %d prices in a currency other than BDT, e.g. %r", int(foreign.sum()), text[foreign].iloc[0])
+    text = text[~foreign].str.replace(',', '', regex=False)
+    parsed = text.str.extract(PRICE_NUMBER_PATTERN, expand=False).astype(float)
+    return numeric.astype(float).fillna(parsed)
+
+def parse_price_bound(value):
+    """Parse a single user-supplied price bound like "1500" or "Tk 1,500"; None if empty."""
+    if value is None or str(value).strip() == "":
+        return None
+    parsed = parse_prices(pd.Series([value], dtype=object)).iloc[0]
+    if np.isnan(parsed):
+        raise ValueError(f"Invalid price: {value!r}")
+    return float(parsed)
+
+def attach_brand_details(products_df: pd.DataFrame, brands_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join the brand details onto the catalogue once, as plain columns looked up by brand_clean,
+    so searches never have to merge with brands_df again.
+    """
+    brands = brands_df.drop_duplicates('brand_clean').set_index('brand_clean')
+    brand_clean = products_df['brand_clean'] if 'brand_clean' in products_df.columns else pd.Series(index=products_df.index, dtype=object)
+
+    website = brands['website link'] if 'website link' in brands.columns else pd.Series(index=brands.index, dtype=object)
+    if 'social media' in brands.columns:
+        website = website.fillna(brands['social media'])
 
-    for sheet in xls.sheet_names:
-        if sheet.strip() in skip_sheets:
+    products_df['brand'] = brand_clean.map(brands['brand']) if 'brand' in brands.columns else None
+    products_df['brand_website'] = brand_clean.map(website)
+    products_df['brand_description'] = brand_clean.map(brands['description']) if 'description' in brands.columns else None
+
+    # Sheets without e.g. an image column still need every result column to exist
+    for column in RESULT_COLUMNS.values():
+        if column not in products_df.columns:
+            products_df[column] = None
+    return products_df
+
+def compact_catalogue(products_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrink the in-memory catalogue in place: repeated values become categorical codes, free text
+    becomes Arrow-backed strings (interned Python strings without pyarrow) and prices float32.
+    """
+    for column in CATEGORICAL_COLUMNS:
+        if column in products_df.columns:
+            products_df[column] = products_df[column].astype('category')
+    for column in TEXT_COLUMNS:
+        if column not in products_df.columns:
             continue
+        values = products_df[column].where(products_df[column].isna(), products_df[column].astype(str))
+        if TEXT_DTYPE is not None:
+            products_df[column] = values.astype(TEXT_DTYPE)
+        else:
+            products_df[column] = values.map(sys.intern, na_action='ignore').astype(object)
+    if 'price_value' in products_df.columns:
+        products_df['price_value'] = products_df['price_value'].astype(np.float32)
+    return products_df
+
+def catalogue_memory_report(products_df: pd.DataFrame) -> List[Dict]:
+    """Bytes held by each catalogue column (strings included), largest first."""
+    usage = products_df.memory_usage(index=False, deep=True)
+    report = [{"column": column, "dtype": str(products_df[column].dtype), "bytes": int(usage[column])}
+              for column in products_df.columns]
+    return sorted(report, key=lambda entry: entry["bytes"], reverse=True)
+
+def list_workbook_sheets(workbook_bytes: bytes) -> List[Tuple[str, str]]:
+    """
+    Read the sheet names and their worksheet parts straight from the workbook XML,
+    without loading any cell data. Returns (sheet name, part path) in workbook order.
+    """
+    with zipfile.ZipFile(io.BytesIO(workbook_bytes)) as archive:
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        relationships = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+
+    targets = {rel.get('Id'): rel.get('Target') for rel in relationships}
+    sheets = []
+    for sheet in workbook.iter(f'{{{SPREADSHEET_NS}}}sheet'):
+        target = targets.get(sheet.get(f'{{{RELATIONSHIP_NS}}}id'), '')
+        part = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+        sheets.append((sheet.get('name'), part))
+    return sheets
+
+def sheet_fingerprints(workbook_bytes: bytes, sheets: List[Tuple[str, str]]) -> Dict[str, str]:
+    """
+    Content hash of each (sheet name, part path) in sheets, over what pandas reads from its
+    cells: resolved text, numbers and their number formats (which decide e.g. whether a number
+    is a date). Re-saving the workbook renumbers shared strings and styles, or switches to
+    inline strings, without changing the fingerprints of sheets whose cells stayed the same.
+    """
+    cell_tag, value_tag, text_tag = (f'{{{SPREADSHEET_NS}}}{tag}' for tag in ('c', 'v', 't'))
+    with zipfile.ZipFile(io.BytesIO(workbook_bytes)) as archive:
+        parts = set(archive.namelist())
+        shared = []
+        if 'xl/sharedStrings.xml' in parts:
+            strings = ElementTree.fromstring(archive.read('xl/sharedStrings.xml'))
+            shared = ["".join(text.text or "" for text in item.iter(text_tag)) for item in strings]
+        number_formats = []
+        if 'xl/styles.xml' in parts:
+            styles = ElementTree.fromstring(archive.read('xl/styles.xml'))
+            codes = {fmt.get('numFmtId'): fmt.get('formatCode') for fmt in styles.iter(f'{{{SPREADSHEET_NS}}}numFmt')}
+            cell_formats = styles.find(f'{{{SPREADSHEET_NS}}}cellXfs')
+            for xf in (cell_formats if cell_formats is not None else []):
+                number_formats.append(codes.get(xf.get('numFmtId'), xf.get('numFmtId')))
+
+        fingerprints = {}
+        for name, part in sheets:
+            digest = hashlib.sha256(f"{name}\x1e".encode('utf-8'))
+            for cell in ElementTree.fromstring(archive.read(part)).iter(cell_tag):
+                kind = cell.get('t', 'n')
+                value = cell.find(value_tag)
+                value = value.text if value is not None else None
+                if kind in ('s', 'inlineStr', 'str'):
+                    if kind == 's' and value is not None:
+                        value = shared[int(value)]
+                    elif kind == 'inlineStr':
+                        value = "".join(text.text or "" for text in cell.iter(text_tag))
+                    kind, number_format = 'str', None
+                else:
+                    style = int(cell.get('s', 0))
+                    number_format = number_formats[style] if style < len(number_formats) else None
+                digest.update(f"{cell.get('r')}\x1f{kind}\x1f{number_format}\x1f{value}\x1e".encode('utf-8'))
+            fingerprints[name] = digest.hexdigest()
+    return fingerprints
+
+def clean_product_sheet(df: pd.DataFrame, sheet: str) -> pd.DataFrame:
+    """Standardize one sheet's column names and tag its rows with the brand taken from the sheet name."""
+    # Standardize column names across all sheets
+    df.rename(columns={
+        'product_name': 'Product Name',
+        'category': 'Category',
+        'product_link': 'Product URL',
+        'product_image': 'Image URL',
+        'product_price': 'Price',
+        'product_price (bdt)': 'Price'
+    }, inplace=True)
+
+    # Clean brand name from sheet name
+    df['brand_clean'] = sheet.strip().lower().replace('+', 'plus').replace(' ', '')
+    return df
+
+# Workbook bytes held by each loader process, set once by the pool initializer
+_worker_workbook: Optional[bytes] = None
+
+def _init_sheet_worker(workbook_bytes: bytes) -> None:
+    global _worker_workbook
+    _worker_workbook = workbook_bytes
+
+def _parse_sheets(sheets: List[str], workbook_bytes: bytes = None) -> List[Tuple[Optional[pd.DataFrame], Dict]]:
+    """
+    Parse and clean a group of sheets with one open of the workbook.
+    Returns (DataFrame or None, report entry) per sheet; errors are reported, never raised.
+    """
+    xls = pd.ExcelFile(io.BytesIO(workbook_bytes if workbook_bytes is not None else _worker_workbook))
+    parsed = []
+    for sheet in sheets:
+        started = time.perf_counter()
+        entry = {"sheet": sheet, "rows": 0, "seconds": 0.0, "error": None}
+        df = None
         try:
-            df = pd.read_excel(products_excel_path, sheet_name=sheet)
+            df = xls.parse(sheet)
             if df.empty:
-                continue
-
-            # Standardize column names across all sheets
-            df.rename(columns={
-                'product_name': 'Product Name',
-                'category': 'Category',
-                'product_link': 'Product URL',
-                'product_image': 'Image URL',
-                'product_price': 'Price'
-            }, inplace=True)
-            
-            # Clean brand name from sheet name
-            brand_clean = sheet.strip().lower().replace('+', 'plus').replace(' ', '')
-            df['brand_clean'] = brand_clean
-
-            clean_products_list.append(df)
+                df = None
+            else:
+                df = clean_product_sheet(df, sheet)
+                entry["rows"] = len(df)
         except Exception as e:
-            print(f"Error loading sheet {sheet}: {e}")
+            entry["error"] = f"{type(e).__name__}: {e}"
+        entry["seconds"] = round(time.perf_counter() - started, 4)
+        parsed.append((df, entry))
+    return parsed
+
+def _read_cached_sheet(sheet_cache_dir: str, fingerprint: str) -> Optional[Tuple[Optional[pd.DataFrame], Dict]]:
+    """The cleaned sheet stored under a fingerprint by _cache_sheet, with its report entry; None when absent."""
+    try:
+        df, entry = pd.read_pickle(os.path.join(sheet_cache_dir, f"{fingerprint}.pkl"))
+    except (OSError, EOFError, ValueError):
+        return None
+    return df, dict(entry, seconds=0.0, cached=True)
 
+def _cache_sheet(sheet_cache_dir: str, fingerprint: str, df: Optional[pd.DataFrame], entry: Dict) -> None:
+    """
+    Store a cleaned sheet as written by pandas (a pickle, so the cached copy parses back identically).
+    Best effort: when the cache can't be written the sheet is simply parsed again next time.
+    """
+    path = os.path.join(sheet_cache_dir, f"{fingerprint}.pkl")
+    staging = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(sheet_cache_dir, exist_ok=True)
+        pd.to_pickle((df, entry), staging)
+        os.replace(staging, path)
+    except OSError as e:
+        logger.warning("Could not cache sheet %s in %s: %s", entry["sheet"], sheet_cache_dir, e)
+
+def _prune_sheet_cache(sheet_cache_dir: str, keep: Sequence[str]) -> None:
+    """Drop cached sheets that no longer occur in the workbook."""
+    keep = {f"{fingerprint}.pkl" for fingerprint in keep}
+    try:
+        names = os.listdir(sheet_cache_dir)
+    except OSError as e:
+        logger.warning("Could not prune the sheet cache in %s: %s", sheet_cache_dir, e)
+        return
+    for name in names:
+        if name.endswith('.pkl') and name not in keep:
+            try:
+                os.remove(os.path.join(sheet_cache_dir, name))
+            except OSError:
+                pass
+
+def load_product_sheets(products_excel_path: str, workers: int = None,
+                        sheet_cache_dir: Optional[str] = None) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Parse all product sheets from the multi-sheet Excel, skipping irrelevant sheets,
+    cleaning and tagging with brand names automatically, and normalize their prices.
+
+    The workbook file is read once. With more than one worker the sheets are split
+    round-robin across a process pool and parsed concurrently.
+    With sheet_cache_dir, every cleaned sheet is kept there under its sheet_fingerprints hash
+    and only sheets whose cells changed since an earlier load are parsed again.
+    Returns the catalogue and a per-sheet report: {"sheet", "rows", "seconds", "error", "cached"}.
+    """
+    with open(products_excel_path, 'rb') as file:
+        workbook_bytes = file.read()
+
+    skip_sheets = {'brand name', 'brand name 2', 'Sheet7'}
+    sheet_parts = [(name, part) for name, part in list_workbook_sheets(workbook_bytes) if name.strip() not in skip_sheets]
+    sheets = [name for name, _ in sheet_parts]
+
+    cached = {}
+    fingerprints = sheet_fingerprints(workbook_bytes, sheet_parts) if sheet_cache_dir else {}
+    for sheet, fingerprint in fingerprints.items():
+        hit = _read_cached_sheet(sheet_cache_dir, fingerprint)
+        if hit is not None:
+            cached[sheet] = hit
+    pending = [sheet for sheet in sheets if sheet not in cached]
+
+    if workers is None:
+        workers = int(os.getenv('LINKKORA_LOADER_WORKERS', '0')) or min(os.cpu_count() or 1, len(pending))
+    workers = max(1, min(workers, len(pending)))
+
+    # A process pool costs more to start than a handful of small sheets take to parse
+    if not pending:
+        parsed = []
+    elif workers == 1 or len(pending) < PARALLEL_SHEET_THRESHOLD:
+        parsed = _parse_sheets(pending, workbook_bytes)
+    else:
+        groups = [pending[offset::workers] for offset in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_sheet_worker,
+                                 initargs=(workbook_bytes,)) as pool:
+            results = list(pool.map(_parse_sheets, groups))
+        by_sheet = {entry["sheet"]: (df, entry) for group in results for df, entry in group}
+        parsed = [by_sheet[sheet] for sheet in pending]
+
+    for df, entry in parsed:
+        entry["cached"] = False
+        if fingerprints and not entry["error"]:
+            _cache_sheet(sheet_cache_dir, fingerprints[entry["sheet"]], df, entry)
+    if fingerprints:
+        _prune_sheet_cache(sheet_cache_dir, fingerprints.values())
+    by_sheet = dict(cached, **{entry["sheet"]: (df, entry) for df, entry in parsed})
+    parsed = [by_sheet[sheet] for sheet in sheets]
+
+    report = [entry for _, entry in parsed]
+    for entry in report:
+        if entry["error"]:
+            logger.warning("Error loading sheet %s: %s", entry["sheet"], entry["error"])
+
+    clean_products_list = [df for df, _ in parsed if df is not None]
     if clean_products_list:
         products_df = pd.concat(clean_products_list, ignore_index=True)
     else:
         products_df = pd.DataFrame()
 
+    # Parse prices once so range filters are plain comparisons against a float column
+    products_df['price_value'] = parse_prices(products_df['Price']) if 'Price' in products_df.columns else np.nan
+    products_df['price_valid'] = products_df['price_value'].notna()
+
+    return products_df, report
+
+def read_product_sheets(products_excel_path: str, workers: int = None,
+                        sheet_cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """Parse the product workbook (see load_product_sheets) and log the per-sheet report."""
+    started = time.perf_counter()
+    products_df, report = load_product_sheets(products_excel_path, workers, sheet_cache_dir)
+    elapsed = time.perf_counter() - started
+    record_load('parse_sheets', elapsed)
+    logger.info("Loaded %d products from %d sheets in %.3fs: %s", len(products_df), len(report),
+                elapsed, json.dumps(report))
     return products_df
 
-def search_products(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame) -> List[Dict]:
+def load_products_from_multisheet(products_excel_path: str, brands_df: pd.DataFrame = None,
+                                  snapshot_dir: Optional[str] = DEFAULT_SNAPSHOT_DIR, compact: bool = True) -> pd.DataFrame:
     """
-    Unified search engine across brands and products.
+    Load the product catalogue, from its columnar snapshot when one matches the workbook
+    and otherwise by parsing the sheets that changed since the last load, the others coming
+    from the sheet cache in snapshot_dir (pass snapshot_dir=None to always parse every sheet).
+    When brands_df is given, the brand details are joined onto the catalogue at load time.
+    With compact (the default) the columns are stored in the compact dtypes of compact_catalogue;
+    pass compact=False for plain object columns and float64 prices, e.g. to export them.
     """
-    keyword_lower = keyword.lower()
-    filtered_products = products_df[
-        products_df['Product Name'].str.lower().str.contains(keyword_lower, na=False) |
-        products_df['Category'].str.lower().str.contains(keyword_lower, na=False)
-    ].copy()
-
-    merged_df = pd.merge(
-        filtered_products,
-        brands_df,
-        on='brand_clean',
-        how='left'
-    )
-
-    results = []
-    for _, row in merged_df.iterrows():
-       
-
-        result_entry = {
-            "product_name": row.get("Product Name", ""),
-            "product_url": row.get("Product URL", ""),
-            "product_image": row.get("Image URL", ""),
-            "price": row.get("Price", ""),
-            "category": row.get("Category", ""),
-            "brand": row.get("brand", "Unknown"),
-            "brand_website": row.get("website link", row.get("social media", "")),
-            "brand_description": row.get("description", "")
-        }
-        results.append(result_entry)
+    products_df = read_snapshot(products_excel_path, snapshot_dir) if snapshot_dir else None
+    if products_df is None:
+        # Sheets unchanged since an earlier load (e.g. before a reload) come from the sheet cache
+        products_df = read_product_sheets(products_excel_path,
+                                          sheet_cache_dir=os.path.join(snapshot_dir, 'sheets') if snapshot_dir else None)
+
+    if brands_df is not None:
+        attach_brand_details(products_df, brands_df)
+
+    if compact:
+        started = time.perf_counter()
+        before = int(products_df.memory_usage(index=False, deep=True).sum())
+        compact_catalogue(products_df)
+        report = catalogue_memory_report(products_df)
+        elapsed = time.perf_counter() - started
+        record_load('compact', elapsed)
+        logger.info("Compacted catalogue from %d to %d bytes in %.3fs: %s", before,
+                    sum(entry["bytes"] for entry in report), elapsed, json.dumps(report))
+
+    # Build the token, completion and fuzzy indexes once here instead of scanning the catalogue on every query
+    started = time.perf_counter()
+    index = get_search_index(products_df)
+    index.suggestions()
+    index.fuzzy_matcher()
+    record_load('index', time.perf_counter() - started)
+
+    if brands_df is not None:
+        started = time.perf_counter()
+        register_catalogue_summary(products_df, build_catalogue_summary(brands_df, products_df))
+        record_load('summary', time.perf_counter() - started)
 
+    return products_df
+
+def get_search_index(products_df: pd.DataFrame) -> SearchIndex:
+    """
+    Return the search index for a products DataFrame, building it on first use.
+    The catalogue is treated as read-only once it has been indexed.
+    """
+    index = _search_indexes.get(id(products_df))
+    if index is None or index.num_rows != len(products_df):
+        index = register_search_index(products_df, SearchIndex(products_df))
+    return index
+
+def register_search_index(products_df: pd.DataFrame, index: SearchIndex) -> SearchIndex:
+    """Use an already built index (e.g. one restored with SearchIndex.from_state) for a catalogue."""
+    key = id(products_df)
+    _search_indexes[key] = index
+    weakref.finalize(products_df, _search_indexes.pop, key, None)
+    return index
+
+def build_catalogue_summary(brands_df: pd.DataFrame, products_df: pd.DataFrame) -> CatalogueSummary:
+    """
+    Count the products and their min/max/median price per brand and per category, in one groupby each.
+    Every brand of brands_df is listed, including brands without products.
+    """
+    prepare_catalogue(products_df, brands_df)
+    prices = products_df['price_value'].astype(float).where(products_df['price_valid'])
+    rows = []
+    for kind, column in (('brand', 'brand'), ('category', 'Category')):
+        values = products_df[column].astype(object)
+        listed = values.map(lambda value: isinstance(value, str) and value.strip() != "").to_numpy(dtype=bool)
+        stats = prices[listed].groupby(values[listed].to_numpy()).agg(['size', 'min', 'max', 'median'])
+        rows.extend((kind, value, *stat) for value, stat in zip(stats.index, stats.itertuples(index=False)))
+        if kind == 'brand' and 'brand' in brands_df.columns:
+            unlisted = set(brands_df['brand'].dropna().astype(str)) - set(stats.index) - {""}
+            rows.extend((kind, value, 0, None, None, None) for value in unlisted if value.strip())
+    return CatalogueSummary(rows)
+
+def get_catalogue_summary(brands_df: pd.DataFrame, products_df: pd.DataFrame) -> CatalogueSummary:
+    """Return the brand and category summary of a catalogue, building it on first use."""
+    summary = _catalogue_summaries.get(id(products_df))
+    if summary is None:
+        summary = register_catalogue_summary(products_df, build_catalogue_summary(brands_df, products_df))
+    return summary
+
+def register_catalogue_summary(products_df: pd.DataFrame, summary: CatalogueSummary) -> CatalogueSummary:
+    """Use an already built summary (e.g. one read from a catalogue image) for a catalogue."""
+    key = id(products_df)
+    _catalogue_summaries[key] = summary
+    weakref.finalize(products_df, _catalogue_summaries.pop, key, None)
+    return summary
+
+def filter_price_range(products_df: pd.DataFrame, rows: np.ndarray, min_price: float = None, max_price: float = None) -> np.ndarray:
+    """Keep the row positions whose parsed price lies within the given bounds."""
+    if min_price is None and max_price is None:
+        return rows
+    prices = products_df['price_value'].to_numpy()[rows]
+    mask = products_df['price_valid'].to_numpy()[rows]
+    if min_price is not None:
+        mask &= prices >= min_price
+    if max_price is not None:
+        mask &= prices <= max_price
+    return rows[mask]
+
+def filter_values(value: FilterValue) -> List[str]:
+    """Normalize a filter given as one value or a list of values (e.g. repeated brand= parameters)."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [item for item in value if item]
+
+def filter_exact(products_df: pd.DataFrame, rows: np.ndarray, column: str,
+                 value: FilterValue = None) -> np.ndarray:
+    """
+    Keep the row positions whose column equals value (or any of a list of values), ignoring case.
+    The row-id sets of the selected values are OR-ed together and then AND-ed with rows.
+    """
+    values = filter_values(value)
+    if not values:
+        return rows
+    value_rows = get_search_index(products_df).facet(column).rows_for_any(values)
+    return np.intersect1d(rows, value_rows, assume_unique=True)
+
+def prepare_catalogue(products_df: pd.DataFrame, brands_df: pd.DataFrame) -> None:
+    """Add the load-time derived columns to a catalogue that was not built by load_products_from_multisheet."""
+    if 'brand_website' not in products_df.columns:
+        # Catalogue was loaded without brands_df; join once now and keep it for later searches
+        attach_brand_details(products_df, brands_df)
+    if 'price_value' not in products_df.columns:
+        products_df['price_value'] = parse_prices(products_df['Price'])
+        products_df['price_valid'] = products_df['price_value'].notna()
+
+def find_product_rows(keyword: str, products_df: pd.DataFrame,
+                      brand: FilterValue = None, category: FilterValue = None, min_price: float = None, max_price: float = None) -> np.ndarray:
+    """
+    Return the sorted row positions matching the keyword and all filters.
+    brand and category may each be a list of values, any of which matches.
+    Products without a valid price are left out whenever a price bound is given.
+    """
+    with span('filter'):
+        matching_rows = get_search_index(products_df).lookup(keyword)
+        matching_rows = filter_exact(products_df, matching_rows, 'brand', brand)
+        matching_rows = filter_exact(products_df, matching_rows, 'Category', category)
+        return filter_price_range(products_df, matching_rows, min_price, max_price)
+
+def build_results_frame(products_df: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+    """Select the result columns of the given rows from the catalogue in a single step."""
+    with span('rows'):
+        column_positions = [products_df.columns.get_loc(column) for column in RESULT_COLUMNS.values()]
+        results_df = products_df.iloc[rows, column_positions]
+        results_df.columns = list(RESULT_COLUMNS)
+        # Back to plain objects, so categorical and Arrow-backed columns serialize like the others
+        return results_df.reset_index(drop=True).astype(object).fillna("")
+
+def search_result_rows(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame,
+                       brand: FilterValue = None, category: FilterValue = None,
+                       min_price: float = None, max_price: float = None, sort: str = None) -> np.ndarray:
+    """
+    Run a search and return the matching row positions in the given ranking.SORT_OPTIONS
+    order (relevance when there is a keyword, name otherwise).
+    """
+    prepare_catalogue(products_df, brands_df)
+    sort = parse_sort(sort, keyword)
+    index = get_search_index(products_df)
+    rows = find_product_rows(keyword, products_df, brand, category, min_price, max_price)
+    with span('rank'):
+        return index.order(rows, index.sort_key(rows, sort, keyword, BRAND_BOOSTS))
+
+def search_products_frame(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame,
+                          brand: FilterValue = None, category: FilterValue = None,
+                          min_price: float = None, max_price: float = None, sort: str = None) -> pd.DataFrame:
+    """Run a search and return all matching rows as a DataFrame of result columns, in search_result_rows order."""
+    rows = search_result_rows(keyword, brands_df, products_df, brand, category, min_price, max_price, sort)
+    return build_results_frame(products_df, rows)
+
+def iter_results_json(products_df: pd.DataFrame, rows: np.ndarray, chunk_rows: int,
+                      ndjson: bool = False) -> Iterator[str]:
+    """
+    Serialize the results for the given rows a slice of chunk_rows at a time: one JSON array
+    per slice, or NDJSON lines. Only one slice of result columns is materialized at once.
+    """
+    for start in range(0, len(rows), chunk_rows):
+        frame = build_results_frame(products_df, rows[start:start + chunk_rows])
+        if ndjson:
+            with span('serialize'):
+                lines = frame.to_json(orient="records", lines=True, force_ascii=False)
+            yield lines if lines.endswith("\n") else lines + "\n"
+        else:
+            yield results_to_json(frame)
+
+def page_position(cursor: Optional[str], sort: str) -> Optional[Tuple[float, int]]:
+    """The (sort key, name rank) of the last row sent, from a page cursor; None without a cursor."""
+    if not cursor:
+        return None
+    keyset = decode_cursor(cursor)
+    if not (isinstance(keyset, list) and len(keyset) == 3 and keyset[0] == sort
+            and isinstance(keyset[1], (int, float)) and isinstance(keyset[2], int)):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return float(keyset[1]), keyset[2]
+
+def search_products_page(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame,
+                         limit: int, cursor: str = None, brand: FilterValue = None, category: FilterValue = None,
+                         min_price: float = None, max_price: float = None,
+                         sort: str = None) -> Tuple[pd.DataFrame, int, Optional[str]]:
+    """
+    Run a search and return one page of results in the order of search_products_frame,
+    together with the total number of matches and the cursor for the next page.
+    """
+    prepare_catalogue(products_df, brands_df)
+    sort = parse_sort(sort, keyword)
+    after = page_position(cursor, sort)
+
+    index = get_search_index(products_df)
+    rows = find_product_rows(keyword, products_df, brand, category, min_price, max_price)
+    with span('rank'):
+        keys = index.sort_key(rows, sort, keyword, BRAND_BOOSTS)
+        page_rows, last = index.page(rows, keys, limit, after)
+    next_cursor = encode_cursor([sort, *last]) if last is not None else None
+    return build_results_frame(products_df, page_rows), len(rows), next_cursor
+
+def search_products_batch(specs: Sequence[Dict], brands_df: pd.DataFrame,
+                          products_df: pd.DataFrame) -> List[Tuple[str, int, Optional[str]]]:
+    """
+    Answer several page requests (search_batch.parse_batch specs) in one pass over the index.
+    Keyword lookups and brand/category row sets are shared between the specs that repeat them,
+    and the result rows of every page are selected and serialized together.
+    Returns (results JSON array, total, next cursor) per spec, each identical to search_products_page.
+    """
+    prepare_catalogue(products_df, brands_df)
+    index = get_search_index(products_df)
+    keyword_rows: Dict[str, np.ndarray] = {}
+    value_rows: Dict[Tuple[str, Tuple[str, ...]], np.ndarray] = {}
+
+    def rows_for(column: str, values: List[str]) -> np.ndarray:
+        key = (column, tuple(sorted(values)))
+        if key not in value_rows:
+            value_rows[key] = index.facet(column).rows_for_any(values)
+        return value_rows[key]
+
+    pages = []
+    for position, spec in enumerate(specs):
+        try:
+            after = page_position(spec["cursor"], spec["sort"])
+        except ValueError as e:
+            raise ValueError(f"queries[{position}]: {e}")
+        with span('filter'):
+            if spec["query"] not in keyword_rows:
+                keyword_rows[spec["query"]] = index.lookup(spec["query"])
+            rows = keyword_rows[spec["query"]]
+            for column, values in (('brand', spec["brand"]), ('Category', spec["category"])):
+                if values:
+                    rows = np.intersect1d(rows, rows_for(column, values), assume_unique=True)
+            rows = filter_price_range(products_df, rows, spec["min_price"], spec["max_price"])
+        with span('rank'):
+            keys = index.sort_key(rows, spec["sort"], spec["query"], BRAND_BOOSTS)
+            page_rows, last = index.page(rows, keys, spec["limit"], after)
+        next_cursor = encode_cursor([spec["sort"], *last]) if last is not None else None
+        pages.append((page_rows, len(rows), next_cursor))
+
+    # One frame and one serialization for all pages, split back into a JSON array per page
+    all_rows = np.concatenate([page_rows for page_rows, _, _ in pages])
+    lines = []
+    if all_rows.size:
+        frame = build_results_frame(products_df, all_rows)
+        with span('serialize'):
+            lines = frame.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n").split("\n")
+    results, start = [], 0
+    for page_rows, total, next_cursor in pages:
+        results.append(("[" + ",".join(lines[start:start + page_rows.size]) + "]", total, next_cursor))
+        start += page_rows.size
     return results
 
+def product_facets(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame,
+                   brand: FilterValue = None, category: FilterValue = None,
+                   min_price: float = None, max_price: float = None) -> Dict:
+    """
+    Count brands, categories and price buckets over the products matching the keyword and filters.
+    Each facet ignores its own filter, so the sidebar still lists the alternatives to a selection.
+    """
+    prepare_catalogue(products_df, brands_df)
+    index = get_search_index(products_df)
+
+    keyword_rows = index.lookup(keyword)
+    def matching(skip: str) -> np.ndarray:
+        rows = keyword_rows
+        if skip != 'brand':
+            rows = filter_exact(products_df, rows, 'brand', brand)
+        if skip != 'Category':
+            rows = filter_exact(products_df, rows, 'Category', category)
+        if skip != 'price_bucket':
+            rows = filter_price_range(products_df, rows, min_price, max_price)
+        return rows
+
+    brand_facet = index.facet('brand')
+    category_facet = index.facet('Category')
+    with span('facets'):
+        return {
+            "total": int(matching(None).size),
+            "brands": facet_entries(brand_facet.labels, brand_facet.counts(matching('brand'))),
+            "categories": facet_entries(category_facet.labels, category_facet.counts(matching('Category'))),
+            "price_buckets": price_bucket_entries(index.facet('price_bucket').counts(matching('price_bucket'))),
+        }
+
+def suggest_completions(prefix: str, brands_df: pd.DataFrame, products_df: pd.DataFrame, limit: int) -> List[Dict]:
+    """Top completions for a partially typed query among product names, categories and brands."""
+    prepare_catalogue(products_df, brands_df)
+    with span('suggest'):
+        return get_search_index(products_df).suggestions().complete(prefix, limit)
+
+def correct_keyword(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame) -> str:
+    """Replace misspelled words of a keyword with their closest catalogue terms (for fuzzy searches)."""
+    prepare_catalogue(products_df, brands_df)
+    with span('fuzzy'):
+        return get_search_index(products_df).fuzzy_matcher().correct_query(keyword)
+
+def results_to_json(results_df: pd.DataFrame) -> str:
+    """Serialize a results DataFrame to a JSON array of objects straight from its columns."""
+    with span('serialize'):
+        return results_df.to_json(orient="records", force_ascii=False)
+
+def search_products(keyword: str, brands_df: pd.DataFrame, products_df: pd.DataFrame) -> List[Dict]:
+    """
+    Unified search engine across brands and products.
+    """
+    return search_products_frame(keyword, brands_df, products_df).to_dict(orient="records")
+
 # Example usage for your LinkKora backend:
 # brands_df = load_brands("NNRZ Database.xlsx")
-# products_df = load_products_from_multisheet("NNRZ Products.xlsx")
+# products_df = load_products_from_multisheet("NNRZ Products.xlsx", brands_df)
 # search_results = search_products("shirt", brands_df, products_df)
 # return jsonify(search_results)  # Flask or Next.js API response ready
\ No newline at end of file
@@ -0,0 +1,43 @@
+# Shared helpers for paging /search results in both LinkKora backends
+# Cursors are opaque to clients: a URL-safe base64 wrapper around the keyset of the last row sent
+
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 48
+MAX_PAGE_SIZE = 200
+
+
+def parse_limit(value, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE):
+    """Parse the `limit` query parameter, clamping it to the allowed page size."""
+    if value is None or str(value).strip() == "":
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid limit: {value!r}")
+    if limit < 1:
+        raise ValueError(f"Invalid limit: {value!r}")
+    return min(limit, maximum)
+
+
+def encode_cursor(keyset) -> str:
+    """Turn the keyset of the last row on a page into an opaque cursor string."""
+    raw = json.dumps(keyset, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for anything that is not a valid cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def page_envelope_json(results_json: str, total: int, next_cursor, limit: int) -> str:
+    """Wrap an already-serialized JSON array of results in the paged response object."""
+    return '{"total":%d,"limit":%d,"next_cursor":%s,"results":%s}' % (
+        total, limit, json.dumps(next_cursor), results_json
+    )
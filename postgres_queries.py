@@ -0,0 +1,371 @@
+# SQL for the LinkKora PostgreSQL backends, shared by flask_app_postgres.py and quart_app_postgres.py
+# Builds the search, page, facet and suggestion queries and turns their rows into API responses,
+# so the synchronous and the async app run exactly the same statements
+
+import re
+
+from facets import PRICE_BUCKET_EDGES, facet_entries, price_bucket_entries
+from pagination import encode_cursor, decode_cursor
+from ranking import (
+    BRAND_BOOSTS, CATEGORY_WEIGHT, NAME_WEIGHT, PRICED_BONUS, SUBSTRING_FACTOR, parse_sort
+)
+
+# Words of a search query, and the characters LIKE treats as wildcards
+TOKEN_PATTERN = re.compile(r"\w+")
+LIKE_SPECIAL = re.compile(r"[\\%_]")
+# Sort keys travel in cursors as numeric text, as str() writes a Decimal ('NaN' for unpriced products)
+NUMERIC_TEXT = re.compile(r"-?\d+(?:\.\d+)?(?:E[+-]?\d+)?|NaN")
+
+PRODUCT_COLUMNS = """
+    p.id,
+    p.product_name,
+    p.product_url,
+    p.category,
+    p.brand,
+    p.price,
+    p.image_url,
+    p.description,
+    b.website_link as brand_website,
+    b.description as brand_description
+"""
+
+def build_tsquery(query):
+    """Prefix-matching tsquery text for a user query ("linen shir" -> "linen:* & shir:*"), or None"""
+    tokens = TOKEN_PATTERN.findall(query.lower())
+    return " & ".join(f"{token}:*" for token in tokens) or None
+
+# Sort key of each /search order besides name; rows are ordered by (sort_key, product_name, id).
+# Numeric 'NaN' sorts after every number, so unpriced products come last in both price orders.
+SORT_KEY_SQL = {
+    'price_asc': "COALESCE(p.price, 'NaN'::numeric)",
+    'price_desc': "COALESCE(-p.price, 'NaN'::numeric)",
+}
+
+def build_relevance_sql(query):
+    """
+    Relevance of a product for a query, mirroring the pandas engine (see ranking.py): each
+    word adds the weight of the field it matches in (name = A, category = B in search_vector),
+    in full for a whole-word match and scaled by SUBSTRING_FACTOR for a prefix match.
+    Returns the SQL expression and its parameters.
+    """
+    terms = []
+    params = []
+    for token in sorted(set(TOKEN_PATTERN.findall(query.lower()))):
+        for label, weight in (('A', NAME_WEIGHT), ('B', CATEGORY_WEIGHT)):
+            terms.append("(p.search_vector @@ to_tsquery('simple', %s))::int * %s")
+            params += [f"{token}:*{label}", weight * SUBSTRING_FACTOR]
+            terms.append("(p.search_vector @@ to_tsquery('simple', %s))::int * %s")
+            params += [f"{token}:{label}", weight * (1 - SUBSTRING_FACTOR)]
+    terms.append("(p.price IS NOT NULL)::int * %s")
+    params.append(PRICED_BONUS)
+    sql = " + ".join(terms)
+    
+    if BRAND_BOOSTS:
+        cases = " ".join("WHEN %s THEN %s" for _ in BRAND_BOOSTS)
+        sql = f"({sql}) * CASE LOWER(p.brand) {cases} ELSE 1 END"
+        for brand, factor in BRAND_BOOSTS.items():
+            params += [brand, factor]
+    
+    # Rounded to a fixed-precision numeric so the value survives a round trip through a cursor
+    return f"ROUND(({sql})::numeric, 6)", params
+
+def build_search_sql(query="", brand_filter="", category_filter="", min_price=None, max_price=None,
+                     sort=None, keyset=None, limit=None):
+    """
+    Build the product search query for one of ranking.SORT_OPTIONS (relevance by default when
+    there is a text query, name otherwise). Name order is (product_name, id), which the
+    idx_products_name_id index serves directly; every other order is (sort_key, product_name, id).
+    `keyset` is the sort key of the last row already sent.
+    Returns the SQL, its parameters and the sort actually applied.
+    """
+    sort = parse_sort(sort, query)
+    where_sql, params = build_product_filters(query, brand_filter, category_filter, min_price, max_price)
+    
+    if sort == 'name':
+        sql = f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM products p
+            LEFT JOIN brands b ON p.brand = b.brand
+            {where_sql}
+        """
+        if keyset:
+            sql += " AND (p.product_name, p.id) > (%s, %s)"
+            params += list(keyset)
+        sql += " ORDER BY p.product_name, p.id"
+    else:
+        if sort == 'relevance':
+            relevance_sql, sort_params = build_relevance_sql(query)
+            sort_key_sql = f"-{relevance_sql}"
+        else:
+            sort_key_sql, sort_params = SORT_KEY_SQL[sort], []
+        sql = f"""
+            SELECT * FROM (
+                SELECT {PRODUCT_COLUMNS}, {sort_key_sql} AS sort_key
+                FROM products p
+                LEFT JOIN brands b ON p.brand = b.brand
+                {where_sql}
+            ) ranked
+        """
+        params = sort_params + params
+        if keyset:
+            sql += " WHERE (sort_key, product_name, id) > (%s::numeric, %s, %s)"
+            params += list(keyset)
+        sql += " ORDER BY sort_key, product_name, id"
+    
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params, sort
+
+def filter_values(value):
+    """Lower-cased list of filter values from a single value or a list of them"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value.lower()]
+    return [item.lower() for item in value if item]
+
+def build_product_filters(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+    """
+    Build the WHERE clause shared by the search, count and page queries.
+    brand_filter and category_filter are a value or a list of values, any of which matches.
+    Returns the SQL fragment (starting with WHERE) and its parameters.
+    """
+    sql = " WHERE 1=1"
+    params = []
+    
+    # Add search query filter: full-text (GIN on search_vector) or substring (trigram GIN indexes)
+    if query:
+        search_term = "%" + LIKE_SPECIAL.sub(r"\\\g<0>", query.lower()) + "%"
+        tsquery = build_tsquery(query)
+        if tsquery:
+            sql += (" AND (p.search_vector @@ to_tsquery('simple', %s)"
+                    " OR LOWER(p.product_name) LIKE %s OR LOWER(p.category) LIKE %s)")
+            params.extend([tsquery, search_term, search_term])
+        else:
+            sql += " AND (LOWER(p.product_name) LIKE %s OR LOWER(p.category) LIKE %s)"
+            params.extend([search_term, search_term])
+    
+    # Add brand and category filters; = ANY uses the LOWER() indexes on both columns
+    brands = filter_values(brand_filter)
+    if brands:
+        sql += " AND LOWER(p.brand) = ANY(%s)"
+        params.append(brands)
+    
+    categories = filter_values(category_filter)
+    if categories:
+        sql += " AND LOWER(p.category) = ANY(%s)"
+        params.append(categories)
+    
+    # Add price filters
+    if min_price is not None:
+        sql += " AND p.price >= %s"
+        params.append(float(min_price))
+    
+    if max_price is not None:
+        sql += " AND p.price <= %s"
+        params.append(float(max_price))
+    
+    return sql, params
+
+def row_to_product(row):
+    """Convert a database row into the product dict returned by the API"""
+    return {
+        "product_name": row['product_name'] or "",
+        "product_url": row['product_url'] or "",
+        "category": row['category'] or "",
+        "brand": row['brand'] or "",
+        "price": str(row['price']) if row['price'] else "",
+        "image_url": row['image_url'] or "",
+        "description": row['description'] or "",
+        "brand_website": row['brand_website'] or "",
+        "brand_description": row['brand_description'] or ""
+    }
+
+def decode_page_cursor(page_cursor, sort):
+    """
+    Keyset of the last row sent, from a /search page cursor, or None without a cursor.
+    Cursors are [sort, product_name, id] in name order and [sort, sort_key, product_name, id] otherwise.
+    """
+    if not page_cursor:
+        return None
+    keyset = decode_cursor(page_cursor)
+    key_columns = 2 if sort == 'name' else 3
+    if not (isinstance(keyset, list) and len(keyset) == key_columns + 1 and keyset[0] == sort):
+        raise ValueError(f"Invalid cursor: {page_cursor!r}")
+    # Checked element by element, so a forged keyset is a 400 and never a failing query
+    *sort_key, name, row_id = keyset[1:]
+    valid = (isinstance(name, str) and isinstance(row_id, int) and not isinstance(row_id, bool)
+             and all(isinstance(key, str) and NUMERIC_TEXT.fullmatch(key) for key in sort_key))
+    if not valid:
+        raise ValueError(f"Invalid cursor: {page_cursor!r}")
+    return keyset[1:]
+
+def split_page(rows, limit, sort):
+    """Cut the limit + 1 rows fetched for a page down to limit; returns (rows, next_cursor)"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == 'name':
+            next_cursor = encode_cursor([sort, last['product_name'], last['id']])
+        else:
+            next_cursor = encode_cursor([sort, str(last['sort_key']), last['product_name'], last['id']])
+    return rows, next_cursor
+
+def build_count_sql(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+    """Number of products matching a query and filters; returns the SQL and its parameters"""
+    where_sql, params = build_product_filters(query, brand_filter, category_filter, min_price, max_price)
+    return f"SELECT COUNT(*) AS total FROM products p {where_sql}", params
+
+# Output columns of PRODUCT_COLUMNS, listed by name for the batch query
+RESULT_FIELDS = ('id', 'product_name', 'product_url', 'category', 'brand', 'price', 'image_url',
+                 'description', 'brand_website', 'brand_description')
+
+def build_batch_sql(specs):
+    """
+    One statement answering several page requests (search_batch.parse_batch specs): per spec,
+    its total joined to its page of limit + 1 rows, all combined with UNION ALL. A spec whose page
+    is empty still yields one row, with the total and NULL product columns.
+    Rows come back ordered by (batch_query, batch_row). Returns the SQL and its parameters.
+    """
+    branches = []
+    params = []
+    for position, spec in enumerate(specs):
+        filters = (spec["query"], spec["brand"], spec["category"], spec["min_price"], spec["max_price"])
+        try:
+            keyset = decode_page_cursor(spec["cursor"], spec["sort"])
+        except ValueError as e:
+            raise ValueError(f"queries[{position}]: {e}")
+        count_sql, count_params = build_count_sql(*filters)
+        page_sql, page_params, sort = build_search_sql(*filters, sort=spec["sort"], keyset=keyset,
+                                                       limit=spec["limit"] + 1)
+        
+        if sort == 'name':
+            order_sql, sort_key_sql = "results.product_name, results.id", "NULL::numeric"
+        else:
+            order_sql, sort_key_sql = "results.sort_key, results.product_name, results.id", "page.sort_key"
+        columns = ", ".join(f"page.{field}" for field in RESULT_FIELDS)
+        branches.append(f"""(
+            SELECT %s AS batch_query, counted.total, page.batch_row, {columns}, {sort_key_sql} AS sort_key
+            FROM ({count_sql}) counted
+            LEFT JOIN LATERAL (
+                SELECT ROW_NUMBER() OVER (ORDER BY {order_sql}) AS batch_row, results.*
+                FROM ({page_sql}) results
+            ) page ON true
+        )""")
+        params += [position] + count_params + page_params
+    
+    return " UNION ALL ".join(branches) + " ORDER BY batch_query, batch_row", params
+
+def split_batch(rows, specs):
+    """Cut the rows of build_batch_sql back into (rows, total, next_cursor) per spec, as split_page does"""
+    grouped = [[] for _ in specs]
+    totals = [0] * len(specs)
+    for row in rows:
+        totals[row['batch_query']] = row['total']
+        if row['batch_row'] is not None:
+            grouped[row['batch_query']].append(row)
+    
+    pages = []
+    for spec, page_rows, total in zip(specs, grouped, totals):
+        page_rows, next_cursor = split_page(page_rows, spec["limit"], spec["sort"])
+        pages.append((page_rows, total, next_cursor))
+    return pages
+
+# Unfiltered facet counts, precomputed by the product_facet_counts materialized view
+FACET_SUMMARY_SQL = "SELECT facet, value, product_count FROM product_facet_counts"
+PRODUCT_TOTAL_SQL = "SELECT COUNT(*) FROM products"
+
+def has_filters(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+    """Whether a /facets request narrows the catalogue at all"""
+    return bool(query or brand_filter or category_filter or min_price is not None or max_price is not None)
+
+def build_facet_sql(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+    """
+    The independent queries of a filtered /facets request: the total, then the brand, category and
+    price-bucket counts, each ignoring its own filter. Returns a list of (sql, params).
+    """
+    filters = dict(query=query, brand_filter=brand_filter, category_filter=category_filter,
+                   min_price=min_price, max_price=max_price)
+    
+    queries = [build_count_sql(**filters)]
+    
+    where_sql, params = build_product_filters(**dict(filters, brand_filter=""))
+    queries.append((f"""
+        SELECT p.brand, COUNT(*) FROM products p {where_sql}
+        AND p.brand IS NOT NULL AND p.brand != '' GROUP BY p.brand
+    """, params))
+    
+    where_sql, params = build_product_filters(**dict(filters, category_filter=""))
+    queries.append((f"""
+        SELECT p.category, COUNT(*) FROM products p {where_sql}
+        AND p.category IS NOT NULL AND p.category != '' GROUP BY p.category
+    """, params))
+    
+    where_sql, params = build_product_filters(**dict(filters, min_price=None, max_price=None))
+    queries.append((f"""
+        SELECT width_bucket(p.price, %s::numeric[]) - 1, COUNT(*) FROM products p {where_sql}
+        AND p.price IS NOT NULL AND p.price >= 0 GROUP BY 1
+    """, [PRICE_BUCKET_EDGES] + params))
+    return queries
+
+def facets_from_summary(summary_rows, total):
+    """/facets response from the rows of FACET_SUMMARY_SQL and the product total"""
+    counts = {"brand": {}, "category": {}, "price_bucket": {}}
+    for facet, value, count in summary_rows:
+        counts[facet][value] = count
+    
+    bucket_counts = [counts["price_bucket"].get(str(bucket), 0) for bucket in range(len(PRICE_BUCKET_EDGES))]
+    return {
+        "total": total,
+        "brands": facet_entries(list(counts["brand"]), list(counts["brand"].values())),
+        "categories": facet_entries(list(counts["category"]), list(counts["category"].values())),
+        "price_buckets": price_bucket_entries(bucket_counts)
+    }
+
+def facets_from_counts(total, brand_rows, category_rows, bucket_rows):
+    """/facets response from the results of the build_facet_sql queries"""
+    bucket_map = dict(bucket_rows)
+    return {
+        "total": total,
+        "brands": facet_entries([row[0] for row in brand_rows], [row[1] for row in brand_rows]),
+        "categories": facet_entries([row[0] for row in category_rows], [row[1] for row in category_rows]),
+        "price_buckets": price_bucket_entries([bucket_map.get(bucket, 0) for bucket in range(len(PRICE_BUCKET_EDGES))])
+    }
+
+def build_suggestion_sql(query, limit):
+    """
+    Top completions for a partially typed query from the search_suggestions view: phrases
+    starting with the query first, then the most popular. Returns (sql, params), or None
+    when the query has no words.
+    """
+    tsquery = build_tsquery(query)
+    if not tsquery:
+        return None
+    prefix = LIKE_SPECIAL.sub(r"\\\g<0>", " ".join(query.lower().split())) + "%"
+    return """
+        SELECT phrase, kind, weight FROM search_suggestions
+        WHERE to_tsvector('simple', phrase) @@ to_tsquery('simple', %s)
+        ORDER BY LOWER(phrase) LIKE %s DESC, weight DESC, LOWER(phrase)
+        LIMIT %s
+    """, (tsquery, prefix, limit)
+
+# Brand and category summary rows for catalogue_summary.CatalogueSummary
+CATALOGUE_SUMMARY_SQL = """
+    SELECT kind, value, product_count, min_price, max_price, median_price FROM catalogue_summary
+"""
+
+# Catalogue version and the step timings of the migration that produced it
+CATALOGUE_STATUS_SQL = "SELECT version, migration_timings FROM catalogue_version"
+
+def catalogue_status_samples(row):
+    """request_metrics collector samples from the row of CATALOGUE_STATUS_SQL (None when missing)"""
+    if row is None:
+        return []
+    version, timings = row
+    samples = [('linkkora_catalogue_version', 'gauge', "Catalogue version bumped by every migration", (), version)]
+    for step, seconds in sorted((timings or {}).items()):
+        samples.append(('linkkora_load_seconds', 'gauge', "Duration of the last catalogue load step",
+                        (('step', f"migration_{step}"),), float(seconds)))
+    return samples
@@ -0,0 +1,586 @@
+# Async API for LinkKora: serves the routes of flask_app_postgres.py with Quart and psycopg 3
+# Requests await the database instead of holding a worker, so one process serves many concurrent
+# users from a small connection pool, and the independent queries of a request (a page and its
+# total, the four facet counts) run concurrently on separate pooled connections.
+# Serve with: hypercorn quart_app_postgres:app --bind 0.0.0.0:$PORT
+
+import asyncio
+import logging
+import os
+import time
+from functools import partial, wraps
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+from psycopg import AsyncClientCursor
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool
+from quart import Quart, Response, g, jsonify, request
+from quart.wrappers.response import IterableBody
+from quart_cors import cors
+
+from catalogue_summary import CatalogueSummary
+from facets import price_bucket_entries
+from fuzzy_match import FuzzyMatcher, is_enabled
+from json_stream import NDJSON_MIMETYPE, STREAM_CHUNK_ROWS, encode_rows, json_array_chunks_async, wants_ndjson
+from multi_sheet_loader import parse_price_bound
+from pagination import parse_limit
+from postgres_queries import (
+    CATALOGUE_STATUS_SQL, CATALOGUE_SUMMARY_SQL, FACET_SUMMARY_SQL, PRODUCT_TOTAL_SQL, build_batch_sql, build_count_sql,
+    build_facet_sql, build_search_sql, build_suggestion_sql, catalogue_status_samples, decode_page_cursor,
+    facets_from_counts, facets_from_summary, has_filters, row_to_product, split_batch, split_page
+)
+from ranking import parse_sort
+from request_metrics import (
+    PROMETHEUS_MIMETYPE, RequestTiming, cache_samples, describe_request, pool_samples, registry, span, timing_enabled
+)
+from search_batch import parse_batch
+from search_cache import CacheLookup, ResultCache, mark_uncacheable as mark_uncacheable_in, tee_stream_async
+
+# Load environment variables
+load_dotenv()
+
+app = Quart(__name__)
+app = cors(app, expose_headers=["ETag", "X-Corrected-Query"])
+
+# Completions returned by /suggest unless the client asks for more (up to the maximum)
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """
+    Bounded async pool of PostgreSQL connections, configured like DatabaseManager in
+    flask_app_postgres.py. A connection is checked out per query rather than per request,
+    so the queries of one request can run side by side.
+    """
+    
+    def __init__(self):
+        self.pool = None
+        self.min_connections = int(os.getenv('DB_POOL_MIN', '1'))
+        self.max_connections = int(os.getenv('DB_POOL_MAX', '10'))
+        self.checkout_timeout = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+        self.statement_timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))
+    
+    async def open(self):
+        """Create the connection pool"""
+        db_url = os.getenv('DATABASE_URL') or make_conninfo(
+            host=os.getenv('DB_HOST', 'localhost'),
+            dbname=os.getenv('DB_NAME', 'linkkora'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', ''),
+            port=os.getenv('DB_PORT', '5432')
+        )
+        # Client-side parameter binding, so statements reach the server exactly as psycopg2 sends them
+        self.pool = AsyncConnectionPool(
+            db_url,
+            min_size=self.min_connections,
+            max_size=self.max_connections,
+            timeout=self.checkout_timeout,
+            kwargs={
+                "autocommit": True,
+                "cursor_factory": AsyncClientCursor,
+                "options": f"-c statement_timeout={self.statement_timeout_ms}"
+            },
+            open=False
+        )
+        await self.pool.open()
+        logger.info(f"Connected to PostgreSQL database successfully! (async pool of up to {self.max_connections})")
+    
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+    
+    async def fetch(self, sql, params=None, row_factory=tuple_row):
+        """Run one statement on a connection of its own and return all its rows"""
+        with span('db_checkout'):
+            conn = await self.pool.getconn()
+        try:
+            async with conn.cursor(row_factory=row_factory) as cursor:
+                with span('db_execute'):
+                    await cursor.execute(sql, params)
+                with span('db_fetch'):
+                    return await cursor.fetchall()
+        finally:
+            await self.pool.putconn(conn)
+    
+    async def stream(self, sql, params, chunk_rows):
+        """
+        Yield the rows of a statement chunk_rows at a time through a server-side cursor. Nothing is
+        checked out until the first chunk is requested, and closing the generator early (client
+        gone) ends the cursor's transaction and returns the connection.
+        """
+        with span('db_checkout'):
+            conn = await self.pool.getconn()
+        try:
+            # Merged client-side like every other statement; server-side cursors would bind on the server
+            query = AsyncClientCursor(conn).mogrify(sql, params)
+            # Server-side cursors live inside a transaction
+            async with conn.transaction():
+                async with conn.cursor(name="search_stream", row_factory=dict_row) as cursor:
+                    with span('db_execute'):
+                        await cursor.execute(query)
+                    while True:
+                        with span('db_fetch'):
+                            rows = await cursor.fetchmany(chunk_rows)
+                        if not rows:
+                            break
+                        yield rows
+        finally:
+            await self.pool.putconn(conn)
+    
+    def pool_metrics(self):
+        """Pool usage counters for /health, with the keys of DatabaseManager.pool_metrics"""
+        stats = self.pool.get_stats() if self.pool else {}
+        return {
+            "checkouts": stats.get("requests_num", 0),
+            "waits": stats.get("requests_queued", 0),
+            "wait_seconds": round(stats.get("requests_wait_ms", 0) / 1000, 4),
+            "timeouts": stats.get("requests_errors", 0),
+            "discarded": stats.get("connections_lost", 0),
+            "in_use": stats.get("pool_size", 0) - stats.get("pool_available", 0),
+            "idle": stats.get("pool_available", 0),
+            "max_connections": self.max_connections
+        }
+
+db = AsyncDatabase()
+
+@app.before_serving
+async def open_database():
+    await db.open()
+
+@app.after_serving
+async def close_database():
+    await db.close()
+
+class CatalogueVersion:
+    """Async CatalogueVersion of flask_app_postgres.py: the migration-bumped version, re-read every DB_VERSION_CHECK_SECONDS"""
+    
+    def __init__(self):
+        self.check_interval = float(os.getenv('DB_VERSION_CHECK_SECONDS', '5'))
+        self._version = None
+        self._checked_at = 0.0
+    
+    async def current(self):
+        """Current data version, or None when it can't be read"""
+        if self._version is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._version
+        
+        try:
+            rows = await db.fetch("SELECT version FROM catalogue_version")
+        except Exception as e:
+            logger.error(f"Error reading catalogue version: {e}")
+            return None
+        
+        self._version = rows[0][0] if rows else 0
+        self._checked_at = time.monotonic()
+        return self._version
+
+catalogue_version = CatalogueVersion()
+result_cache = ResultCache()
+registry.add_collector(lambda: cache_samples(result_cache))
+registry.add_collector(lambda: pool_samples(db.pool_metrics()))
+
+class FuzzyVocabulary:
+    """Trigram index over the search_terms view for fuzzy searches, rebuilt whenever the catalogue version changes"""
+    
+    def __init__(self):
+        self._matcher = None
+        self._version = None
+    
+    async def matcher(self):
+        """FuzzyMatcher for the current catalogue, or None when the vocabulary can't be loaded"""
+        version = await catalogue_version.current()
+        if self._matcher is not None and version == self._version:
+            return self._matcher
+        
+        try:
+            rows = await db.fetch("SELECT word, ndoc FROM search_terms ORDER BY word")
+        except Exception as e:
+            logger.error(f"Error loading search terms: {e}")
+            mark_uncacheable()
+            return None
+        
+        self._matcher, self._version = FuzzyMatcher([row[0] for row in rows], [row[1] for row in rows]), version
+        return self._matcher
+
+fuzzy_vocabulary = FuzzyVocabulary()
+
+class SummaryTables:
+    """Brand and category summary from the catalogue_summary view, held in memory and reloaded when the catalogue version changes"""
+    
+    def __init__(self):
+        self._summary = None
+        self._version = None
+    
+    async def current(self):
+        """CatalogueSummary of the current catalogue, or None when it can't be loaded"""
+        version = await catalogue_version.current()
+        if self._summary is not None and version == self._version:
+            return self._summary
+        
+        try:
+            rows = await db.fetch(CATALOGUE_SUMMARY_SQL)
+        except Exception as e:
+            logger.error(f"Error loading catalogue summary: {e}")
+            mark_uncacheable()
+            return None
+        
+        self._summary, self._version = CatalogueSummary(rows), version
+        return self._summary
+
+summary_tables = SummaryTables()
+
+# Keep the current response out of result_cache (search_cache.mark_uncacheable on Quart's request globals)
+mark_uncacheable = partial(mark_uncacheable_in, g)
+
+def cached_endpoint(view):
+    """search_cache.cached_endpoint for async views: successful responses come from result_cache with an ETag"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        version = await catalogue_version.current()
+        if version is None:
+            return await view(*args, **kwargs)
+        lookup = CacheLookup(result_cache, version, request, Response)
+        cached = lookup.cached()
+        if cached is not None:
+            return cached
+        
+        response = await view(*args, **kwargs)
+        if not lookup.cacheable(response, g):
+            return response
+        if isinstance(response.response, IterableBody):
+            # Sent as it streams; cached once complete, so repeats come with an ETag
+            copy = lookup.copy_stream(response, g._get_current_object())
+            response.response = IterableBody(tee_stream_async(response.response.iter, copy))
+            return response
+        return lookup.store(response, await response.get_data())
+    return wrapper
+
+@app.before_request
+async def start_timing():
+    if timing_enabled():
+        g.request_timing = RequestTiming()
+
+@app.after_request
+async def finish_timing(response):
+    """Record the request's timing; a streamed response records it after its last chunk instead"""
+    timing = g.pop('request_timing', None)
+    if timing is not None:
+        finish = partial(timing.finish, request.endpoint or 'unknown', str(response.status_code),
+                         describe_request(request))
+        on_stream_end = g.get('on_stream_end')
+        if on_stream_end is not None:
+            on_stream_end.append(finish)
+        else:
+            finish()
+    return response
+
+async def search_keyword():
+    """
+    The request's `q` and the query as typed; with fuzzy=1, misspelled words
+    are replaced by their closest catalogue terms
+    """
+    query = request.args.get("q", "").lower()
+    if query and is_enabled(request.args.get("fuzzy")):
+        matcher = await fuzzy_vocabulary.matcher()
+        if matcher is not None:
+            with span('fuzzy'):
+                return matcher.correct_query(query), query
+    return query, query
+
+def with_correction(response, query, typed_query):
+    """Report a fuzzy correction of the query in the X-Corrected-Query header (URL-encoded)"""
+    if query != typed_query:
+        response.headers["X-Corrected-Query"] = quote(query)
+    return response
+
+def filter_args(name):
+    """All values of a repeatable filter parameter (brand=a&brand=b), lower-cased, empty ones dropped"""
+    return [value.lower() for value in request.args.getlist(name) if value.strip()]
+
+def stream_products(query="", brand_filter="", category_filter="", min_price=None, max_price=None,
+                    sort=None, ndjson=False):
+    """
+    Streamed response with every matching product, read STREAM_CHUNK_ROWS at a time. A query that
+    fails ends the stream, so the client gets the rows sent so far (none when it fails up front).
+    """
+    sql, params, _ = build_search_sql(query, brand_filter, category_filter, min_price, max_price, sort)
+    # Filled by finish_timing; the request is timed up to the last chunk
+    on_stream_end = g.on_stream_end = []
+    # The chunks are produced outside the request context, so they reach its `g` through this
+    mark_stream_uncacheable = partial(mark_uncacheable_in, g._get_current_object())
+    
+    async def chunks():
+        try:
+            async for rows in db.stream(sql, params, STREAM_CHUNK_ROWS):
+                with span('rows'):
+                    products = [row_to_product(row) for row in rows]
+                with span('serialize'):
+                    chunk = encode_rows(products, ndjson)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error streaming products: {e}")
+            # A truncated body must not be cached
+            mark_stream_uncacheable()
+        finally:
+            for callback in on_stream_end:
+                callback()
+    
+    if ndjson:
+        return Response(chunks(), mimetype=NDJSON_MIMETYPE)
+    return Response(json_array_chunks_async(chunks()), mimetype="application/json")
+
+async def search_products_page(limit, page_cursor=None, query="", brand_filter="", category_filter="",
+                               min_price=None, max_price=None, sort=None):
+    """
+    One page of search results and the total, in the order of flask_app_postgres.search_products_postgres;
+    the count and the page query run concurrently. Returns (products, total, next_cursor).
+    """
+    filters = (query, brand_filter, category_filter, min_price, max_price)
+    sort = parse_sort(sort, query)
+    keyset = decode_page_cursor(page_cursor, sort)
+    
+    # Fetch one extra row to find out whether there is a next page
+    sql, params, _ = build_search_sql(*filters, sort=sort, keyset=keyset, limit=limit + 1)
+    
+    try:
+        count_rows, rows = await asyncio.gather(
+            db.fetch(*build_count_sql(*filters)),
+            db.fetch(sql, params, row_factory=dict_row)
+        )
+    except Exception as e:
+        logger.error(f"Error searching products: {e}")
+        mark_uncacheable()
+        return [], 0, None
+    
+    rows, next_cursor = split_page(rows, limit, sort)
+    with span('rows'):
+        products = [row_to_product(row) for row in rows]
+    return products, count_rows[0][0], next_cursor
+
+async def search_products_batch(specs):
+    """Pages of several searches (search_batch.parse_batch specs) from one statement; (products, total, next_cursor) each"""
+    sql, params = build_batch_sql(specs)
+    
+    try:
+        rows = await db.fetch(sql, params, row_factory=dict_row)
+    except Exception as e:
+        logger.error(f"Error searching products in a batch: {e}")
+        return [([], 0, None) for _ in specs]
+    
+    pages = split_batch(rows, specs)
+    with span('rows'):
+        return [([row_to_product(row) for row in page_rows], total, next_cursor)
+                for page_rows, total, next_cursor in pages]
+
+async def get_facets(query="", brand_filter="", category_filter="", min_price=None, max_price=None):
+    """Brand, category and price-bucket counts for a query and filters, all counted concurrently"""
+    filters = (query, brand_filter, category_filter, min_price, max_price)
+    try:
+        if not has_filters(*filters):
+            summary_rows, total_rows = await asyncio.gather(db.fetch(FACET_SUMMARY_SQL), db.fetch(PRODUCT_TOTAL_SQL))
+            return facets_from_summary(summary_rows, total_rows[0][0])
+        
+        results = await asyncio.gather(*(db.fetch(sql, params) for sql, params in build_facet_sql(*filters)))
+        (total,), = results[0]
+        return facets_from_counts(total, *results[1:])
+    
+    except Exception as e:
+        logger.error(f"Error getting facets: {e}")
+        mark_uncacheable()
+        return {"total": 0, "brands": [], "categories": [], "price_buckets": price_bucket_entries([])}
+
+async def get_suggestions(query, limit):
+    """Top completions for a partially typed query from the search_suggestions view"""
+    suggestion_sql = build_suggestion_sql(query, limit)
+    if suggestion_sql is None:
+        return []
+    
+    try:
+        rows = await db.fetch(*suggestion_sql)
+        return [{"text": row[0], "type": row[1], "count": row[2]} for row in rows]
+    except Exception as e:
+        logger.error(f"Error getting suggestions: {e}")
+        return []
+
+async def summary_listing(kind):
+    """/brands or /categories response for the current catalogue: names, or stats with stats=1"""
+    summary = await summary_tables.current()
+    if summary is None:
+        return []
+    return summary.listing(kind, is_enabled(request.args.get("stats")))
+
+@app.route("/search", methods=["GET"])
+@cached_endpoint
+async def search():
+    """Search products endpoint; same parameters and responses as /search in flask_app_postgres.py"""
+    try:
+        query, typed_query = await search_keyword()
+        with span('parse'):
+            brand_filter = filter_args("brand")
+            category_filter = filter_args("category")
+            
+            try:
+                # Price bounds are read like the pandas app reads them: "1500", "Tk 1,500", ...
+                min_price_val = parse_price_bound(request.args.get("min_price"))
+                max_price_val = parse_price_bound(request.args.get("max_price"))
+                sort = parse_sort(request.args.get("sort"), query)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
+        if "limit" in request.args or "cursor" in request.args:
+            try:
+                limit = parse_limit(request.args.get("limit"))
+                results, total, next_cursor = await search_products_page(
+                    limit,
+                    request.args.get("cursor"),
+                    query=query,
+                    brand_filter=brand_filter,
+                    category_filter=category_filter,
+                    min_price=min_price_val,
+                    max_price=max_price_val,
+                    sort=sort
+                )
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            
+            with span('serialize'):
+                response = jsonify({
+                    "total": total,
+                    "limit": limit,
+                    "next_cursor": next_cursor,
+                    "results": results
+                })
+            return with_correction(response, query, typed_query)
+        
+        response = stream_products(
+            query=query,
+            brand_filter=brand_filter,
+            category_filter=category_filter,
+            min_price=min_price_val,
+            max_price=max_price_val,
+            sort=sort,
+            ndjson=wants_ndjson(request.args)
+        )
+        return with_correction(response, query, typed_query)
+    
+    except Exception as e:
+        logger.error(f"Error in search endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/search/batch", methods=["POST"])
+async def search_batch():
+    """Several paged searches in one request; same body and response as /search/batch in flask_app_postgres.py"""
+    try:
+        with span('parse'):
+            specs = parse_batch(await request.get_json(silent=True))
+        pages = await search_products_batch(specs)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with span('serialize'):
+            return jsonify({"results": [
+                {"total": total, "limit": spec["limit"], "next_cursor": next_cursor, "results": results}
+                for spec, (results, total, next_cursor) in zip(specs, pages)
+            ]})
+    except Exception as e:
+        logger.error(f"Error in batch search endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/facets", methods=["GET"])
+@cached_endpoint
+async def get_facets_endpoint():
+    """Facet counts endpoint, taking the same query and filters (and `fuzzy`) as /search"""
+    try:
+        query, typed_query = await search_keyword()
+        try:
+            min_price = parse_price_bound(request.args.get("min_price"))
+            max_price = parse_price_bound(request.args.get("max_price"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        facets = await get_facets(
+            query=query,
+            brand_filter=filter_args("brand"),
+            category_filter=filter_args("category"),
+            min_price=min_price,
+            max_price=max_price
+        )
+        with span('serialize'):
+            response = jsonify(facets)
+        return with_correction(response, query, typed_query)
+    except Exception as e:
+        logger.error(f"Error in facets endpoint: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route("/suggest", methods=["GET"])
+async def suggest():
+    """Completions for a partially typed query: product names, categories and brands"""
+    try:
+        limit = parse_limit(request.args.get("limit"), SUGGEST_LIMIT, MAX_SUGGEST_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    query = request.args.get("q", "")
+    suggestions = await get_suggestions(query, limit)
+    with span('serialize'):
+        return jsonify({"query": query, "suggestions": suggestions})
+
+@app.route("/brands", methods=["GET"])
+@cached_endpoint
+async def get_brands():
+    """All brand names; with stats=1, each with its product count and min/max/median price"""
+    brands = await summary_listing('brand')
+    with span('serialize'):
+        return jsonify(brands)
+
+@app.route("/categories", methods=["GET"])
+@cached_endpoint
+async def get_categories():
+    """All category names; with stats=1, each with its product count and min/max/median price"""
+    categories = await summary_listing('category')
+    with span('serialize'):
+        return jsonify(categories)
+
+@app.route("/health", methods=["GET"])
+async def health_check():
+    """Health check endpoint"""
+    try:
+        await db.fetch("SELECT 1")
+        return jsonify({
+            "status": "healthy",
+            "database": "connected",
+            "message": "LinkKora API is running",
+            "pool": db.pool_metrics(),
+            "cache": result_cache.metrics()
+        })
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        return jsonify({
+            "status": "unhealthy",
+            "database": "disconnected",
+            "error": str(e),
+            "pool": db.pool_metrics(),
+            "cache": result_cache.metrics()
+        }), 500
+
+@app.route("/metrics", methods=["GET"])
+async def metrics():
+    """Request, cache and pool metrics plus the catalogue version and migration timings, in Prometheus text format"""
+    try:
+        rows = await db.fetch(CATALOGUE_STATUS_SQL)
+        extra = catalogue_status_samples(rows[0] if rows else None)
+    except Exception as e:
+        logger.error(f"Error reading catalogue status: {e}")
+        extra = []
+    return registry.render(extra), 200, {'Content-Type': PROMETHEUS_MIMETYPE}
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5050))
+    app.run(debug=True, host="0.0.0.0", port=port)
@@ -0,0 +1,46 @@
+# Shared ranking settings for /search in both LinkKora backends
+# Keeps the accepted sort orders and the relevance weights identical whichever engine ranks the results
+
+import os
+from typing import Dict
+
+SORT_OPTIONS = ('relevance', 'price_asc', 'price_desc', 'name')
+
+# Relevance of one query term: the weight of the field it matched in, scaled down to
+# SUBSTRING_FACTOR when it only matched part of a word ("shirt" inside "t-shirts")
+NAME_WEIGHT = 3.0
+CATEGORY_WEIGHT = 1.0
+SUBSTRING_FACTOR = 0.5
+
+# Added to every product with a price, so unpriced listings sink below equally relevant priced ones
+PRICED_BONUS = 0.1
+
+
+def parse_sort(value, query: str = "") -> str:
+    """Parse the `sort` query parameter; relevance by default when there is a query, name otherwise."""
+    if value is None or str(value).strip() == "":
+        return 'relevance' if query else 'name'
+    sort = str(value).strip().lower()
+    if sort not in SORT_OPTIONS:
+        raise ValueError(f"Invalid sort: {value!r} (expected one of {', '.join(SORT_OPTIONS)})")
+    return sort
+
+
+def parse_brand_boosts(value: str) -> Dict[str, float]:
+    """
+    Parse relevance multipliers per brand ("brand:factor,brand:factor").
+    Brand names are matched case-insensitively; malformed entries are ignored.
+    """
+    boosts = {}
+    for entry in (value or '').split(','):
+        brand, _, factor = entry.rpartition(':')
+        try:
+            if brand.strip():
+                boosts[brand.strip().lower()] = float(factor)
+        except ValueError:
+            continue
+    return boosts
+
+
+# Optional relevance multipliers for promoted brands, e.g. SEARCH_BRAND_BOOSTS="aarong:1.5,yellow:1.2"
+BRAND_BOOSTS = parse_brand_boosts(os.getenv('SEARCH_BRAND_BOOSTS', ''))
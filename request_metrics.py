@@ -0,0 +1,310 @@
+# Request timing metrics for both LinkKora backends, exposed in Prometheus text format on /metrics
+# Each request is split into stage spans (parse, filter, rank, rows, serialize, db_execute, ...) whose
+# per-request totals feed per-endpoint histograms; METRICS_ENABLED=0 turns the spans into no-ops.
+# The current request's timing is a context variable, so spans work in threads and asyncio tasks alike.
+# Metrics live in the process that served the request, so each gunicorn worker reports its own.
+
+import bisect
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import partial
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no', 'off')
+
+# Requests slower than this many milliseconds are logged with their stage breakdown (0 disables)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))
+
+# Fraction of requests run under cProfile; sampled requests slower than SLOW_REQUEST_MS are dumped
+# to PROFILE_DIR, which keeps the PROFILE_KEEP slowest of them (0 disables profiling)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_NULL_SPAN = nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations, as Prometheus expects them."""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            cumulative += count
+            yield f"{name}_bucket", labels + (('le', _format_value(bound)),), cumulative
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of histograms and gauges keyed by metric name and label tuple, plus
+    collectors: callables returning (name, type, help, labels, value) samples at scrape time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._collectors = []
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self, extra=()):
+        """All metrics in the Prometheus text exposition format, plus extra collector samples (e.g. queried async)."""
+        families = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                families.setdefault(name, []).extend(histogram.samples(name, labels))
+            for (name, labels), value in self._gauges.items():
+                families.setdefault(name, []).append((name, labels, value))
+        samples = list(extra)
+        for collector in self._collectors:
+            try:
+                samples.extend(collector())
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {e}")
+        for name, kind, help_text, labels, value in samples:
+            self._help.setdefault(name, (kind, help_text))
+            families.setdefault(name, []).append((name, tuple(labels), value))
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text = self._help.get(name, ('untyped', name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in families[name]:
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+
+registry = MetricsRegistry()
+registry.describe('linkkora_request_seconds', 'histogram', "Time to serve a request, by endpoint and status")
+registry.describe('linkkora_stage_seconds', 'histogram', "Time a request spent in each stage, by endpoint")
+registry.describe('linkkora_load_seconds', 'gauge', "Duration of the last catalogue load step")
+registry.describe('linkkora_load_timestamp_seconds', 'gauge', "Unix time the catalogue load step last finished")
+
+
+class _Span:
+    __slots__ = ('stages', 'stage', 'started')
+
+    def __init__(self, stages, stage):
+        self.stages = stages
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stages[self.stage] = self.stages.get(self.stage, 0.0) + time.perf_counter() - self.started
+
+
+def span(stage):
+    """
+    Context manager timing one stage of the current request. Repeated spans of a stage (e.g. one
+    per streamed chunk, or concurrent queries) add up, and each request contributes its per-stage
+    totals to the histograms. Outside a request, or with metrics disabled, it does nothing.
+    """
+    timing = _current_timing.get()
+    if timing is None or not METRICS_ENABLED:
+        return _NULL_SPAN
+    return _Span(timing.stages, stage)
+
+
+def record_load(step, seconds):
+    """Record how long a catalogue load step (sheet parsing, image build, migration, ...) took."""
+    labels = (('step', step),)
+    registry.set_gauge('linkkora_load_seconds', labels, seconds)
+    registry.set_gauge('linkkora_load_timestamp_seconds', labels, time.time())
+
+
+def cache_samples(cache):
+    """Collector samples for a search_cache.ResultCache."""
+    stats = cache.metrics()
+    return [
+        ('linkkora_cache_hits_total', 'counter', "Responses served from the response cache", (), stats['hits']),
+        ('linkkora_cache_misses_total', 'counter', "Response cache lookups that missed", (), stats['misses']),
+        ('linkkora_cache_evictions_total', 'counter', "Responses evicted from the response cache", (), stats['evictions']),
+        ('linkkora_cache_entries', 'gauge', "Responses held in the response cache", (), stats['entries']),
+        ('linkkora_cache_bytes', 'gauge', "Bytes of response bodies held in the response cache", (), stats['bytes']),
+    ]
+
+
+class RequestTiming:
+    """
+    Stage totals of one request, which become its current timing (see span). finish() records them
+    once the response is complete. A sampled request also runs under cProfile until then; with
+    asyncio that profile covers everything the event loop ran meanwhile.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.profiler = None
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE and not getattr(_profiling, 'active', False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+                _profiling.active = True
+            except ValueError:
+                # Only one profiler can be active at a time (Python 3.12+); skip this sample
+                pass
+        _current_timing.set(self)
+
+    def finish(self, endpoint, status, description):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+            _profiling.active = False
+        if METRICS_ENABLED:
+            registry.observe('linkkora_request_seconds', (('endpoint', endpoint), ('status', status)), elapsed)
+            for stage, seconds in self.stages.items():
+                registry.observe('linkkora_stage_seconds', (('endpoint', endpoint), ('stage', stage)), seconds)
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            breakdown = ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.stages.items()) or "no stages"
+            if SLOW_REQUEST_MS > 0:
+                logger.warning(f"Slow request {description} ({status}) took {elapsed * 1000:.1f}ms: {breakdown}")
+            if self.profiler is not None:
+                _dump_profile(self.profiler, description, endpoint, elapsed, breakdown)
+
+
+_current_timing = ContextVar('request_timing', default=None)
+_profiling = threading.local()
+
+
+def timing_enabled():
+    """Whether requests need a RequestTiming at all."""
+    return METRICS_ENABLED or SLOW_REQUEST_MS > 0 or PROFILE_SAMPLE_RATE > 0
+
+
+def describe_request(request):
+    """Method and path with query string of a Flask or Quart request, for logs and profiles."""
+    return f"{request.method} {request.full_path.rstrip('?')}"
+
+
+def pool_samples(metrics):
+    """Collector samples for the pool_metrics() of a PostgreSQL connection pool."""
+    return [
+        ('linkkora_db_pool_connections', 'gauge', "Pooled database connections by state", (('state', 'in_use'),), metrics["in_use"]),
+        ('linkkora_db_pool_connections', 'gauge', "Pooled database connections by state", (('state', 'idle'),), metrics["idle"]),
+        ('linkkora_db_pool_max_connections', 'gauge', "Size limit of the connection pool", (), metrics["max_connections"]),
+        ('linkkora_db_pool_checkouts_total', 'counter', "Connections checked out of the pool", (), metrics["checkouts"]),
+        ('linkkora_db_pool_waits_total', 'counter', "Checkouts that had to wait for a free connection", (), metrics["waits"]),
+        ('linkkora_db_pool_wait_seconds_total', 'counter', "Time spent waiting for a free connection", (), metrics["wait_seconds"]),
+        ('linkkora_db_pool_timeouts_total', 'counter', "Checkouts that gave up waiting", (), metrics["timeouts"]),
+        ('linkkora_db_pool_discarded_total', 'counter', "Broken connections closed instead of reused", (), metrics["discarded"]),
+    ]
+
+
+def _start_request():
+    g.request_timing = RequestTiming()
+
+
+def _finish_request(response):
+    timing = g.pop('request_timing', None)
+    if timing is not None:
+        # Runs once the body has been sent, so streamed responses are timed to their last chunk
+        response.call_on_close(partial(timing.finish, request.endpoint or 'unknown', str(response.status_code),
+                                       describe_request(request)))
+    return response
+
+
+_profile_lock = threading.Lock()
+
+
+def _dump_profile(profiler, description, endpoint, elapsed, breakdown):
+    """Write a sampled request's profile to PROFILE_DIR and keep only the PROFILE_KEEP slowest."""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        # Zero-padded milliseconds first, so the names sort by duration
+        name = f"{elapsed * 1000:010.1f}ms-{endpoint}-{os.getpid()}-{time.time_ns()}"
+        report = io.StringIO()
+        report.write(f"{description}\n{elapsed * 1000:.1f}ms: {breakdown}\n\n")
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+        with _profile_lock:
+            profiler.dump_stats(os.path.join(PROFILE_DIR, name + '.prof'))
+            with open(os.path.join(PROFILE_DIR, name + '.txt'), 'w') as file:
+                file.write(report.getvalue())
+            dumps = sorted(entry[:-5] for entry in os.listdir(PROFILE_DIR) if entry.endswith('.prof'))
+            for stale in dumps[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else dumps:
+                for suffix in ('.prof', '.txt'):
+                    try:
+                        os.remove(os.path.join(PROFILE_DIR, stale + suffix))
+                    except FileNotFoundError:
+                        pass
+    except OSError as e:
+        logger.error(f"Error writing request profile to {PROFILE_DIR}: {e}")
+
+
+def metrics_response():
+    """The registry as a (body, status, headers) view result, which both Flask and Quart accept."""
+    return registry.render(), 200, {'Content-Type': PROMETHEUS_MIMETYPE}
+
+
+def instrument(app):
+    """Time every request of a Flask app and serve the registry on GET /metrics."""
+    if timing_enabled():
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_response, methods=['GET'])
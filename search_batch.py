@@ -0,0 +1,86 @@
+# Request parsing for POST /search/batch, shared by both LinkKora backends
+# A batch is a list of /search page requests answered together: one index pass (pandas) or one
+# SQL statement (PostgreSQL) instead of a round trip per carousel
+
+from typing import Callable, Dict, List, Optional
+
+from pagination import parse_limit
+from ranking import parse_sort
+
+# Most queries a single batch may hold
+MAX_BATCH_QUERIES = 20
+
+
+def parse_price(value) -> Optional[float]:
+    """Parse a price bound given as a JSON number or numeric string; None if empty."""
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid price: {value!r}")
+
+
+def _filter_list(value, name: str) -> List[str]:
+    """A brand/category filter given as one string or a list of them, lower-cased, empty ones dropped."""
+    if value is None:
+        return []
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not all(isinstance(item, str) for item in values):
+        raise ValueError(f"Invalid {name}: {value!r}")
+    return [item.lower() for item in values if item.strip()]
+
+
+def _scalar(spec: Dict, name: str):
+    """A parameter that /search takes as a single value: a JSON string or number (or absent)."""
+    value = spec.get(name)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+        raise ValueError(f"Invalid {name}: {value!r}")
+    return value
+
+
+def parse_query_spec(spec, parse_price: Callable = parse_price) -> Dict:
+    """
+    Normalize one batch entry. It takes the parameters of a paged /search request as JSON:
+    q, brand and category (a string or a list of strings), min_price, max_price, sort, limit
+    and cursor. Raises ValueError for anything /search would reject.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError(f"Expected an object, got {spec!r}")
+    query = spec.get("q") or ""
+    if not isinstance(query, str):
+        raise ValueError(f"Invalid q: {query!r}")
+    query = query.lower()
+    cursor = spec.get("cursor")
+    if cursor is not None and not isinstance(cursor, str):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return {
+        "query": query,
+        "brand": _filter_list(spec.get("brand"), "brand"),
+        "category": _filter_list(spec.get("category"), "category"),
+        "min_price": parse_price(_scalar(spec, "min_price")),
+        "max_price": parse_price(_scalar(spec, "max_price")),
+        "sort": parse_sort(spec.get("sort"), query),
+        "limit": parse_limit(_scalar(spec, "limit")),
+        "cursor": cursor or None,
+    }
+
+
+def parse_batch(payload, parse_price: Callable = parse_price) -> List[Dict]:
+    """
+    Parse a /search/batch body, {"queries": [spec, ...]}, into normalized specs (see parse_query_spec).
+    Errors name the offending entry, e.g. "queries[2]: Invalid sort: 'cheap' ...".
+    """
+    queries = payload.get("queries") if isinstance(payload, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValueError('Expected a JSON body {"queries": [...]} with at least one query')
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"Too many queries: {len(queries)} (at most {MAX_BATCH_QUERIES})")
+
+    specs = []
+    for position, spec in enumerate(queries):
+        try:
+            specs.append(parse_query_spec(spec, parse_price))
+        except ValueError as e:
+            raise ValueError(f"queries[{position}]: {e}")
+    return specs
@@ -0,0 +1,246 @@
+# Response cache for the LinkKora read endpoints (/search, /facets, ...), shared by both backends
+# Entries are keyed on the normalized request and tied to a catalogue data version, so a reload
+# or migration invalidates them without any explicit flush
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, request
+
+# Request parameters compared case-insensitively and with collapsed whitespace
+NORMALIZED_PARAMS = {'q', 'brand', 'category'}
+
+# Largest streamed body copied while it is sent, to be cached once complete; bigger ones are only streamed
+STREAM_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_STREAM_MAX_BYTES', str(2 * 1024 * 1024)))
+
+
+def cache_key(path, args):
+    """
+    Normalize a request into a hashable cache key; parameter order, the order of repeated
+    q/brand/category values and their casing don't matter.
+    """
+    items = []
+    for name in sorted(args.keys()):
+        values = args.getlist(name)
+        if name in NORMALIZED_PARAMS:
+            values = sorted(" ".join(value.lower().split()) for value in values)
+        items.extend((name, value) for value in values)
+    return (path, tuple(items))
+
+
+def mark_uncacheable(request_globals=None):
+    """
+    Keep the current response out of the cache, e.g. when it was built after a swallowed error.
+    request_globals is the framework's `g`, Flask's by default.
+    """
+    (g if request_globals is None else request_globals).skip_result_cache = True
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a TTL, bounded both by entry count and by total body size.
+    Each entry remembers the data version it was computed for and is ignored once that changes.
+    """
+
+    def __init__(self, max_entries=None, ttl_seconds=None, max_bytes=None):
+        self.max_entries = max_entries or int(os.getenv('SEARCH_CACHE_SIZE', '512'))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('SEARCH_CACHE_TTL', '300'))
+        self.max_bytes = max_bytes or int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, version):
+        """Return the cached (body, mimetype, etag, headers) for key, or None if missing, stale or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["version"] != version or entry["expires"] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry["body"], entry["mimetype"], entry["etag"], entry["headers"]
+
+    def put(self, key, version, body, mimetype, etag, headers=()):
+        """Store a response body, evicting least recently used entries to stay within bounds."""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "version": version,
+                "expires": time.monotonic() + self.ttl_seconds,
+                "body": body,
+                "mimetype": mimetype,
+                "etag": etag,
+                "headers": tuple(headers),
+            }
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry["body"])
+
+
+def body_etag(version, body):
+    """Strong ETag for a response body; the data version keeps equal bodies from different catalogues apart."""
+    return '"%s"' % hashlib.md5(f"{version}:".encode('utf-8') + body).hexdigest()
+
+
+class CacheLookup:
+    """
+    The cache side of one request, shared by cached_endpoint and its async twin in quart_app_postgres.py:
+    the cached answer to the request, and storing a freshly rendered one. Flask and Quart requests,
+    responses and `g` look alike here; only reading a response body (sync or awaited) differs.
+    """
+
+    def __init__(self, cache, version, request, response_class):
+        self.cache = cache
+        self.version = version
+        self.key = cache_key(request.path, request.args)
+        self._if_none_match = request.if_none_match
+        self._response_class = response_class
+
+    def cached(self):
+        """The cached response (a 304 when the client already has it), or None on a miss."""
+        cached = self.cache.get(self.key, self.version)
+        return None if cached is None else self._conditional_response(*cached)
+
+    def cacheable(self, response, request_globals) -> bool:
+        """Whether a view's response may be cached: a 200 that isn't marked uncacheable."""
+        if isinstance(response, tuple) or not isinstance(response, self._response_class) or response.status_code != 200:
+            return False
+        return not request_globals.get('skip_result_cache')
+
+    def store(self, response, body):
+        """Cache a view's response, given its body, and answer with it under its ETag."""
+        etag, headers = self._put(response, body)
+        return self._conditional_response(body, response.mimetype, etag, headers)
+
+    def copy_stream(self, response, request_globals) -> 'StreamCopy':
+        """A StreamCopy that caches a streamed response once it has been sent in full."""
+        return StreamCopy(self, response, request_globals)
+
+    def _put(self, response, body):
+        etag = body_etag(self.version, body)
+        # Custom X- headers describe the result (e.g. a corrected query) and are replayed with it
+        headers = [(name, value) for name, value in response.headers.items() if name.startswith('X-')]
+        self.cache.put(self.key, self.version, body, response.mimetype, etag, headers)
+        return etag, headers
+
+    def _conditional_response(self, body, mimetype, etag, headers=()):
+        """Answer with 304 when the client already has this ETag, otherwise with the body."""
+        if self._if_none_match.contains(etag.strip('"')):
+            response = self._response_class(b"", status=304)
+        else:
+            response = self._response_class(body, mimetype=mimetype)
+        response.headers['ETag'] = etag
+        response.headers.extend(headers)
+        # Clients may keep the body but must revalidate it, which costs a 304 at most
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+class StreamCopy:
+    """
+    Copy of a streamed response body, taken chunk by chunk as the body is sent (see tee_stream).
+    The copy is dropped once it outgrows STREAM_CACHE_MAX_BYTES, and it is only cached when the
+    stream ran to its end without being marked uncacheable (e.g. after a query failed midway),
+    so repeats of a search are answered from the cache, with an ETag, like unstreamed ones.
+    """
+
+    def __init__(self, lookup, response, request_globals):
+        self._lookup = lookup
+        self._response = response
+        self._request_globals = request_globals
+        self._chunks = []
+        self._size = 0
+
+    def add(self, chunk) -> bytes:
+        """Take a copy of one chunk on its way out; returns it encoded."""
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if self._chunks is not None:
+            self._size += len(chunk)
+            if self._size > STREAM_CACHE_MAX_BYTES:
+                self._chunks = None
+            else:
+                self._chunks.append(chunk)
+        return chunk
+
+    def complete(self):
+        """Cache the body after its last chunk was sent."""
+        if self._chunks is not None and not self._request_globals.get('skip_result_cache'):
+            self._lookup._put(self._response, b"".join(self._chunks))
+
+
+def tee_stream(chunks, copy):
+    """Pass the chunks of a streamed body on, copying them into a StreamCopy."""
+    try:
+        for chunk in chunks:
+            yield copy.add(chunk)
+        copy.complete()
+    finally:
+        # Pass an early close (client gone) on, so the producer can release its cursor right away
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+async def tee_stream_async(chunks, copy):
+    """tee_stream for an async iterable of chunks (the Quart app)."""
+    try:
+        async for chunk in chunks:
+            yield copy.add(chunk)
+        copy.complete()
+    finally:
+        if hasattr(chunks, "aclose"):
+            await chunks.aclose()
+
+
+def cached_endpoint(cache, data_version):
+    """
+    Decorate a GET view so successful responses are served from `cache` and carry an ETag.
+    `data_version` is called per request and returns the current catalogue version, or None
+    when it is unknown, in which case the cache is bypassed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = data_version()
+            if version is None:
+                return view(*args, **kwargs)
+            lookup = CacheLookup(cache, version, request, Response)
+            cached = lookup.cached()
+            if cached is not None:
+                return cached
+
+            response = view(*args, **kwargs)
+            if not lookup.cacheable(response, g):
+                return response
+            if response.is_streamed:
+                # Sent as it streams; cached once complete, so repeats come with an ETag
+                response.response = tee_stream(response.response, lookup.copy_stream(response, g._get_current_object()))
+                return response
+            return lookup.store(response, response.get_data())
+        return wrapper
+    return decorator
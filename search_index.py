@@ -0,0 +1,507 @@
+# Inverted token index for the in-memory LinkKora search engine
+# Built once per catalogue so a query costs roughly the size of its result set, not the catalogue
+
+import bisect
+import re
+import weakref
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from facets import PRICE_BUCKET_EDGES
+from fuzzy_match import FuzzyMatcher
+from ranking import CATEGORY_WEIGHT, NAME_WEIGHT, PRICED_BONUS, SUBSTRING_FACTOR
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Hyphenated compounds like "t-shirt", which are also indexed written solid ("tshirt")
+COMPOUND_PATTERN = re.compile(r"\w+(?:-\w+)+")
+
+# Columns of the product catalogue that a keyword search looks at
+SEARCH_FIELDS = ('Product Name', 'Category')
+
+# Relevance weight of a term matched in each searchable column
+FIELD_WEIGHTS = {'Product Name': NAME_WEIGHT, 'Category': CATEGORY_WEIGHT}
+
+# Catalogue columns offered as /suggest completions, with the type reported for each
+SUGGEST_FIELDS = (('Product Name', 'product'), ('Category', 'category'), ('brand', 'brand'))
+
+
+# Plain-data form of an index (see SearchIndex.state): NumPy arrays plus small JSON-able values
+IndexState = Dict[str, Union[np.ndarray, list, int]]
+
+
+def pack_lists(lists: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate row-id arrays into one array plus offsets; list i is values[offsets[i]:offsets[i + 1]]."""
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(rows) for rows in lists], out=offsets[1:])
+    values = np.concatenate(lists).astype(np.int32) if lists else np.empty(0, dtype=np.int32)
+    return values, offsets
+
+
+def unpack_lists(values: np.ndarray, offsets: np.ndarray) -> List[np.ndarray]:
+    """Split packed arrays (see pack_lists) back into lists; each one is a view, nothing is copied."""
+    bounds = offsets.tolist()
+    return [values[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _prefixed(prefix: str, state: IndexState) -> IndexState:
+    return {prefix + key: value for key, value in state.items()}
+
+
+def _unprefixed(prefix: str, state: IndexState) -> IndexState:
+    return {key[len(prefix):]: value for key, value in state.items() if key.startswith(prefix)}
+
+
+def tokenize(text) -> List[str]:
+    """Split a piece of text into normalized (lower-case, word-character) tokens."""
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def index_tokens(text) -> List[str]:
+    """
+    Tokens a piece of text is indexed under: its tokens plus every hyphenated compound written
+    solid, so "T-Shirt" is found by "tshirt" (and its typos) as well as by "t-shirt".
+    """
+    tokens = tokenize(text)
+    if tokens and "-" in text:
+        tokens += [compound.replace("-", "") for compound in COMPOUND_PATTERN.findall(text.lower())]
+    return tokens
+
+
+class Facet:
+    """
+    Row-id sets for one categorical column of the catalogue.
+    codes[row] is the value id of each row (-1 when it has none) and value_rows[value id]
+    is the sorted array of rows holding that value.
+    """
+
+    def __init__(self, codes: np.ndarray, labels: List, value_rows: List[np.ndarray] = None):
+        self.codes = codes.astype(np.int32, copy=False)
+        self.labels = list(labels)
+        self.keys = [str(label).lower() for label in self.labels]
+        self._positions = {key: value_id for value_id, key in reversed(list(enumerate(self.keys)))}
+
+        if value_rows is None:
+            # One stable sort groups the rows by value; each group is already in row order
+            order = np.argsort(self.codes, kind='stable').astype(np.int32)
+            bounds = np.searchsorted(self.codes[order], np.arange(len(self.labels) + 1))
+            value_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.labels))]
+        self.value_rows: List[np.ndarray] = value_rows
+
+    @classmethod
+    def from_values(cls, values: pd.Series) -> 'Facet':
+        """Build a facet from a text column, grouping values case-insensitively."""
+        values = values.astype(object)
+        values = values.where(values.map(lambda value: isinstance(value, str) and value.strip() != ""))
+        codes, keys = pd.factorize(values.str.lower())
+        # Label every value with the spelling of its first occurrence
+        first_rows = pd.Series(np.arange(len(codes))).groupby(codes).first()
+        labels = [values.iloc[first_rows[value_id]] for value_id in range(len(keys))]
+        return cls(codes, labels)
+
+    def state(self) -> IndexState:
+        rows, offsets = pack_lists(self.value_rows)
+        return {"codes": self.codes, "labels": self.labels, "rows": rows, "row_offsets": offsets}
+
+    @classmethod
+    def from_state(cls, state: IndexState) -> 'Facet':
+        return cls(state["codes"], state["labels"], unpack_lists(state["rows"], state["row_offsets"]))
+
+    def rows_for(self, value: str) -> np.ndarray:
+        """Return the rows holding the given value (case-insensitive)."""
+        value_id = self._positions.get(str(value).lower())
+        if value_id is None:
+            return np.empty(0, dtype=np.int32)
+        return self.value_rows[value_id]
+
+    def rows_for_any(self, values: Sequence[str]) -> np.ndarray:
+        """Return the sorted rows holding any of the given values: the union of their row-id sets."""
+        value_ids = {self._positions[key] for key in (str(value).lower() for value in values) if key in self._positions}
+        if not value_ids:
+            return np.empty(0, dtype=np.int32)
+        if len(value_ids) == 1:
+            return self.value_rows[value_ids.pop()]
+        # Each row holds a single value, so the sets are disjoint and a sort is all the union needs
+        return np.sort(np.concatenate([self.value_rows[value_id] for value_id in value_ids]))
+
+    def counts(self, rows: np.ndarray) -> np.ndarray:
+        """Count how many of the given rows hold each value."""
+        codes = self.codes[rows]
+        return np.bincount(codes[codes >= 0], minlength=len(self.labels))
+
+
+class SuggestIndex:
+    """
+    Sorted prefix array over the phrases (product names, categories, brands) offered as completions.
+    Each phrase is entered once per word, keyed by its text from that word on, so "sh" completes
+    both "Shirt" and "Cotton Shirt" and a lookup is two binary searches over the keys.
+    """
+
+    def __init__(self, phrases: Sequence[Tuple[str, str, int]]):
+        self.texts = [text for text, _, _ in phrases]
+        self.kinds = [kind for _, kind, _ in phrases]
+        self.weights = np.array([weight for _, _, weight in phrases], dtype=np.int64)
+
+        entries = []
+        for phrase_id, text in enumerate(self.texts):
+            normalized = " ".join(text.lower().split())
+            for match in TOKEN_PATTERN.finditer(normalized):
+                entries.append((normalized[match.start():], phrase_id, match.start() == 0))
+        entries.sort()
+        self.keys: List[str] = [key for key, _, _ in entries]
+        self.phrase_ids = np.array([phrase_id for _, phrase_id, _ in entries], dtype=np.int32)
+        # Matches at the first word rank above matches further into a phrase
+        self.at_start = np.array([at_start for _, _, at_start in entries], dtype=bool)
+
+    def state(self) -> IndexState:
+        return {"texts": list(self.texts), "kinds": list(self.kinds), "weights": self.weights,
+                "keys": list(self.keys), "phrase_ids": self.phrase_ids, "at_start": self.at_start}
+
+    @classmethod
+    def from_state(cls, state: IndexState) -> 'SuggestIndex':
+        index = cls.__new__(cls)
+        for name in ("texts", "kinds", "weights", "keys", "phrase_ids", "at_start"):
+            setattr(index, name, state[name])
+        return index
+
+    @classmethod
+    def from_facets(cls, facets: Sequence[Tuple[str, 'Facet']]) -> 'SuggestIndex':
+        """Build from (type, facet) pairs; each distinct value is weighted by its number of products."""
+        phrases = []
+        for kind, facet in facets:
+            for label, rows in zip(facet.labels, facet.value_rows):
+                phrases.append((str(label).strip(), kind, len(rows)))
+        return cls(phrases)
+
+    def complete(self, prefix: str, limit: int) -> List[Dict]:
+        """Return up to `limit` phrases with a word starting with prefix, most popular first."""
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        low = bisect.bisect_left(self.keys, prefix)
+        high = bisect.bisect_left(self.keys, prefix + "\U0010ffff", low)
+        if low == high:
+            return []
+
+        phrase_ids = self.phrase_ids[low:high]
+        scores = self.weights[phrase_ids] + self.at_start[low:high] * (int(self.weights.max()) + 1)
+        # Only the best few entries need ordering; take a few spare for phrases matched at several words
+        candidates = np.arange(phrase_ids.size)
+        if phrase_ids.size > limit * 4:
+            candidates = np.argpartition(-scores, limit * 4)[:limit * 4]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        suggestions, seen = [], set()
+        for candidate in candidates.tolist():
+            phrase_id = int(phrase_ids[candidate])
+            if phrase_id in seen:
+                continue
+            seen.add(phrase_id)
+            suggestions.append({
+                "text": self.texts[phrase_id],
+                "type": self.kinds[phrase_id],
+                "count": int(self.weights[phrase_id]),
+            })
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+class SearchIndex:
+    """
+    Maps every normalized token of the searchable columns to a sorted array of row positions.
+    A query term matches every token that contains it, so "shirt" still finds "T-Shirts".
+    """
+
+    def __init__(self, products_df: pd.DataFrame):
+        self.num_rows = len(products_df)
+        # Weak, so that an index held in a registry never keeps its catalogue alive
+        self._products_ref = weakref.ref(products_df)
+        self._facets: Dict[str, 'Facet'] = {}
+        self._suggestions: Optional[SuggestIndex] = None
+        self._fuzzy: Optional[FuzzyMatcher] = None
+
+        field_token_rows: Dict[str, Dict[str, List[int]]] = {}
+        searchable = np.zeros(self.num_rows, dtype=bool)
+        for field in SEARCH_FIELDS:
+            if field not in products_df.columns:
+                continue
+            token_rows = field_token_rows.setdefault(field, {})
+            for row_id, text in enumerate(products_df[field].tolist()):
+                if not isinstance(text, str):
+                    continue
+                searchable[row_id] = True
+                for token in set(index_tokens(text)):
+                    token_rows.setdefault(token, []).append(row_id)
+
+        self.vocabulary: List[str] = sorted(set().union(*field_token_rows.values()))
+        # Per-field posting lists (for relevance scoring) are already sorted; a row can be listed
+        # once per field, so the combined lists are de-duplicated
+        empty = np.empty(0, dtype=np.int32)
+        self.field_postings: Dict[str, List[np.ndarray]] = {
+            field: [np.asarray(token_rows[token], dtype=np.int32) if token in token_rows else empty
+                    for token in self.vocabulary]
+            for field, token_rows in field_token_rows.items()
+        }
+        self.postings: List[np.ndarray] = [
+            np.unique(np.concatenate([postings[token_id] for postings in self.field_postings.values()]))
+            for token_id in range(len(self.vocabulary))
+        ]
+        self.searchable_rows = np.flatnonzero(searchable).astype(np.int32)
+
+        # Presorted positions by product name: name_order[rank] is a row position and name_rank[row]
+        # is that row's rank, the unique tie-breaker that makes every sort order a total order
+        names = products_df['Product Name'] if 'Product Name' in products_df.columns else pd.Series([""] * self.num_rows)
+        names_lower = np.array([name.lower() if isinstance(name, str) else "" for name in names.tolist()], dtype=object)
+        self.name_order = np.argsort(names_lower, kind='stable').astype(np.int32)
+        self.name_rank = np.empty(self.num_rows, dtype=np.int32)
+        self.name_rank[self.name_order] = np.arange(self.num_rows, dtype=np.int32)
+        self._index_vocabulary()
+
+    def _index_vocabulary(self) -> None:
+        # All tokens joined into one newline-separated blob, so finding the tokens that contain
+        # a query term is a handful of C-level str.find calls instead of a Python loop
+        self._vocabulary_blob = "\n".join(self.vocabulary)
+        starts = np.zeros(len(self.vocabulary), dtype=np.int64)
+        if len(self.vocabulary):
+            starts[1:] = np.cumsum([len(token) + 1 for token in self.vocabulary[:-1]])
+        self._token_starts = starts
+
+    def state(self) -> IndexState:
+        """
+        The index as plain arrays and JSON-able values, including every facet, completion and
+        fuzzy index built so far, so that from_state can restore it without rebuilding anything.
+        """
+        state = {
+            "num_rows": self.num_rows,
+            "vocabulary": list(self.vocabulary),
+            "fields": list(self.field_postings),
+            "facets": list(self._facets),
+            "searchable_rows": self.searchable_rows,
+            "name_order": self.name_order,
+            "name_rank": self.name_rank,
+        }
+        state["postings"], state["posting_offsets"] = pack_lists(self.postings)
+        for position, postings in enumerate(self.field_postings.values()):
+            state[f"field{position}.postings"], state[f"field{position}.posting_offsets"] = pack_lists(postings)
+        for position, facet in enumerate(self._facets.values()):
+            state.update(_prefixed(f"facet{position}.", facet.state()))
+        if self._suggestions is not None:
+            state.update(_prefixed("suggest.", self._suggestions.state()))
+        if self._fuzzy is not None:
+            state["fuzzy.grams"] = list(self._fuzzy.grams)
+            state["fuzzy.gram_tokens"], state["fuzzy.gram_token_offsets"] = pack_lists(list(self._fuzzy.grams.values()))
+        return state
+
+    @classmethod
+    def from_state(cls, products_df: pd.DataFrame, state: IndexState) -> 'SearchIndex':
+        """
+        Restore an index saved with state() for the same catalogue. The arrays are used as they are,
+        so an index restored from memory-mapped files shares their pages instead of copying them;
+        lists of strings may be given as any sequence of them, such as a mapped Arrow string array.
+        """
+        index = cls.__new__(cls)
+        index.num_rows = state["num_rows"]
+        index._products_ref = weakref.ref(products_df)
+        index.vocabulary = state["vocabulary"]
+        index.postings = unpack_lists(state["postings"], state["posting_offsets"])
+        index.field_postings = {
+            field: unpack_lists(state[f"field{position}.postings"], state[f"field{position}.posting_offsets"])
+            for position, field in enumerate(state["fields"])
+        }
+        index._facets = {
+            column: Facet.from_state(_unprefixed(f"facet{position}.", state))
+            for position, column in enumerate(state["facets"])
+        }
+        index.searchable_rows = state["searchable_rows"]
+        index.name_order = state["name_order"]
+        index.name_rank = state["name_rank"]
+        index._suggestions = SuggestIndex.from_state(_unprefixed("suggest.", state)) if "suggest.keys" in state else None
+        index._fuzzy = None
+        if "fuzzy.grams" in state:
+            gram_tokens = unpack_lists(state["fuzzy.gram_tokens"], state["fuzzy.gram_token_offsets"])
+            index._fuzzy = FuzzyMatcher(index.vocabulary, np.diff(state["posting_offsets"]),
+                                        grams=dict(zip(state["fuzzy.grams"], gram_tokens)))
+        index._index_vocabulary()
+        return index
+
+    def matching_tokens(self, term: str) -> List[int]:
+        """Return the vocabulary ids of all tokens containing the given term."""
+        token_ids = []
+        blob = self._vocabulary_blob
+        position = blob.find(term)
+        while position != -1:
+            token_id = int(np.searchsorted(self._token_starts, position, side='right')) - 1
+            token_ids.append(token_id)
+            if token_id + 1 >= len(self._token_starts):
+                break
+            position = blob.find(term, int(self._token_starts[token_id + 1]))
+        return token_ids
+
+    def token_id(self, token: str) -> int:
+        """Return the vocabulary id of an exact token, or -1 if it never occurs."""
+        position = bisect.bisect_left(self.vocabulary, token)
+        if position < len(self.vocabulary) and self.vocabulary[position] == token:
+            return position
+        return -1
+
+    def term_rows(self, term: str, whole_token: bool = False) -> np.ndarray:
+        """Union of the posting lists of every token containing the term (or equal to it)."""
+        if whole_token:
+            token_id = self.token_id(term)
+            token_ids = [token_id] if token_id >= 0 else []
+        else:
+            token_ids = self.matching_tokens(term)
+        lists = [self.postings[token_id] for token_id in token_ids]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        if len(lists) == 1:
+            return lists[0]
+        return np.unique(np.concatenate(lists))
+
+    def lookup(self, query: str) -> np.ndarray:
+        """
+        Return the sorted row positions whose name or category matches every term of the query.
+        An empty query matches every searchable row.
+        """
+        terms = tokenize(query)
+        if not terms:
+            if query.strip():
+                # Punctuation-only queries have no tokens to look up; fall back to a plain scan
+                return self._scan(query.lower())
+            return self.searchable_rows
+
+        result: Optional[np.ndarray] = None
+        # Longer terms match fewer tokens, so start the intersection with them
+        for term in sorted(set(terms), key=len, reverse=True):
+            # Single letters inside a longer query ("t-shirt") would be contained in almost every
+            # token, so they only match whole tokens
+            rows = self.term_rows(term, whole_token=len(term) == 1 and len(terms) > 1)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if result.size == 0:
+                break
+        return result
+
+    def relevance(self, rows: np.ndarray, query: str, brand_boosts: Dict[str, float] = None) -> np.ndarray:
+        """
+        Score the given (sorted) rows against a query, all rows at once.
+        Each term adds the weight of every field it matches in, in full for a whole-word match and
+        scaled by SUBSTRING_FACTOR for a partial one; priced products get PRICED_BONUS and
+        brand_boosts (lower-case brand -> factor) multiply the scores of their brands.
+        """
+        scores = np.zeros(rows.size, dtype=np.float64)
+        terms = set(tokenize(query))
+        for field, postings in self.field_postings.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for term in terms:
+                partial = np.zeros(rows.size, dtype=bool)
+                for token_id in self.matching_tokens(term):
+                    partial[self._positions_in(rows, postings[token_id])] = True
+                exact = np.zeros(rows.size, dtype=bool)
+                token_id = self.token_id(term)
+                if token_id >= 0:
+                    exact[self._positions_in(rows, postings[token_id])] = True
+                scores += weight * (SUBSTRING_FACTOR * partial + (1 - SUBSTRING_FACTOR) * exact)
+
+        products_df = self._products_ref()
+        if 'price_valid' in products_df.columns:
+            scores += PRICED_BONUS * products_df['price_valid'].to_numpy()[rows]
+        if brand_boosts and 'brand' in products_df.columns:
+            brand_facet = self.facet('brand')
+            factors = np.ones(len(brand_facet.labels) + 1)
+            for value_id, key in enumerate(brand_facet.keys):
+                factors[value_id] = brand_boosts.get(key, 1.0)
+            # Rows without a brand have code -1, which picks the trailing factor of 1
+            scores *= factors[brand_facet.codes[rows]]
+        return scores
+
+    def sort_key(self, rows: np.ndarray, sort: str, query: str = "", brand_boosts: Dict[str, float] = None) -> np.ndarray:
+        """
+        Primary sort key of each row for one of ranking.SORT_OPTIONS, ascending; ties are
+        broken by product name. Products without a price sort last in both price orders.
+        """
+        if sort == 'relevance':
+            return -self.relevance(rows, query, brand_boosts)
+        if sort in ('price_asc', 'price_desc'):
+            prices = self._products_ref()['price_value'].to_numpy(dtype=float)[rows]
+            keys = prices if sort == 'price_asc' else -prices
+            return np.where(np.isnan(keys), np.inf, keys)
+        return np.zeros(rows.size, dtype=np.float64)
+
+    def order(self, rows: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """Sort rows by (key, product name)."""
+        return rows[np.lexsort((self.name_rank[rows], keys))]
+
+    def page(self, rows: np.ndarray, keys: np.ndarray, limit: int, after: Tuple[float, int] = None):
+        """
+        Pick the next `limit` rows in (key, product name) order, skipping everything up to and
+        including the position `after` = (key, name rank) of the last row already sent.
+        Returns the page's row positions and the position to resume from (None on the last page).
+        """
+        ranks = self.name_rank[rows]
+        if after is not None:
+            after_key, after_rank = after
+            later = (keys > after_key) | ((keys == after_key) & (ranks > after_rank))
+            rows, keys, ranks = rows[later], keys[later], ranks[later]
+        if rows.size > limit:
+            # Only rows up to the limit-th smallest key need to be ordered, not the whole result set
+            kth_key = np.partition(keys, limit - 1)[limit - 1]
+            candidates = np.flatnonzero(keys <= kth_key)
+            chosen = candidates[np.lexsort((ranks[candidates], keys[candidates]))][:limit]
+            last = chosen[-1]
+            return rows[chosen], (float(keys[last]), int(ranks[last]))
+        return rows[np.lexsort((ranks, keys))], None
+
+    @staticmethod
+    def _positions_in(rows: np.ndarray, posting: np.ndarray) -> np.ndarray:
+        """Positions within the sorted rows of the rows that also appear in a sorted posting list."""
+        positions = np.searchsorted(rows, posting)
+        inside = positions < rows.size
+        positions = positions[inside]
+        return positions[rows[positions] == posting[inside]]
+
+    def facet(self, column: str) -> Facet:
+        """
+        Return the row-id sets for a catalogue column, built on first use.
+        'price_bucket' groups rows by the price buckets in facets.PRICE_BUCKET_EDGES.
+        """
+        facet = self._facets.get(column)
+        if facet is None:
+            products_df = self._products_ref()
+            if column == 'price_bucket':
+                prices = products_df['price_value'].to_numpy(dtype=float)
+                codes = np.searchsorted(PRICE_BUCKET_EDGES, prices, side='right') - 1
+                codes[np.isnan(prices)] = -1
+                facet = Facet(codes, list(range(len(PRICE_BUCKET_EDGES))))
+            else:
+                facet = Facet.from_values(products_df[column].reset_index(drop=True))
+            self._facets[column] = facet
+        return facet
+
+    def suggestions(self) -> SuggestIndex:
+        """Return the completion index over names, categories and brands, built on first use."""
+        if self._suggestions is None:
+            products_df = self._products_ref()
+            self._suggestions = SuggestIndex.from_facets([
+                (kind, self.facet(column)) for column, kind in SUGGEST_FIELDS if column in products_df.columns
+            ])
+        return self._suggestions
+
+    def fuzzy_matcher(self) -> FuzzyMatcher:
+        """Return the trigram index over the vocabulary used to correct misspelled terms, built on first use."""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyMatcher(self.vocabulary, [len(rows) for rows in self.postings])
+        return self._fuzzy
+
+    def _scan(self, keyword: str) -> np.ndarray:
+        """Substring match over the raw columns, used only when the index cannot answer."""
+        products_df = self._products_ref()
+        mask = np.zeros(self.num_rows, dtype=bool)
+        for field in SEARCH_FIELDS:
+            if products_df is not None and field in products_df.columns:
+                mask |= products_df[field].str.lower().str.contains(keyword, na=False, regex=False).to_numpy(dtype=bool)
+        return np.flatnonzero(mask).astype(np.int32)
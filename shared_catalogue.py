@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Read-only catalogue image shared by every gunicorn worker of the pandas backend.
+
+The compacted catalogue, the brands table, the search indexes (postings, facets, completions,
+fuzzy trigrams) and the brand and category summary are written once to a directory of .npy files. Workers memory-map those files
+instead of loading them, so all of them read the same pages of the OS page cache: adding a worker
+costs neither another parse of the workbooks nor another copy of the catalogue. Text columns are
+mapped as Arrow strings when pyarrow is installed and decoded into Python strings otherwise.
+
+Each image is stamped with a version derived from the workbook hashes and lives in its own
+directory; the CURRENT file names the image to serve and is replaced atomically, so workers
+pick up a new image (see SharedCatalogue) without ever seeing a half-written one.
+
+Build the image for the current workbooks with:
+    python shared_catalogue.py
+or let the first process that needs it build it (gunicorn --preload does so once, in the master).
+Running workers also watch the workbooks and rebuild the image themselves when they change.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:  # optional: without pyarrow text columns are decoded into each worker's memory
+    pyarrow = None
+
+from catalogue_snapshot import file_sha256
+from catalogue_summary import CatalogueSummary
+from multi_sheet_loader import (
+    get_catalogue_summary, get_search_index, load_brands, load_products_from_multisheet,
+    register_catalogue_summary, register_search_index
+)
+from request_metrics import record_load
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMAT = 5
+DEFAULT_IMAGE_DIR = os.getenv('LINKKORA_IMAGE_DIR', 'catalogue_image')
+
+# Name of the file holding the version stamp of the image to serve
+CURRENT_FILE = 'CURRENT'
+
+# Facets built into the image up front, so no worker builds them on its first /facets request
+IMAGE_FACETS = ('brand', 'Category', 'price_bucket')
+
+
+def image_stamp(products_path: str, brands_path: str) -> str:
+    """Version stamp of the image built from the given workbooks."""
+    digest = hashlib.sha256(f"{IMAGE_FORMAT}:{file_sha256(products_path)}:{file_sha256(brands_path)}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def read_current_stamp(image_dir: str = DEFAULT_IMAGE_DIR) -> Optional[str]:
+    """Version stamp of the image currently being served, or None when none was published."""
+    try:
+        with open(os.path.join(image_dir, CURRENT_FILE)) as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _publish(image_dir: str, stamp: str) -> None:
+    """Point CURRENT at an image; readers see either the old or the new stamp, never a partial file."""
+    fd, staging = tempfile.mkstemp(prefix='.current-', dir=image_dir)
+    with os.fdopen(fd, 'w') as file:
+        file.write(stamp)
+    os.replace(staging, os.path.join(image_dir, CURRENT_FILE))
+
+
+def _save_array(directory: str, name: str, values: np.ndarray) -> str:
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(values))
+    return name
+
+
+def _load_array(directory: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+
+
+def _write_text(directory: str, name: str, values: pd.Series) -> Dict:
+    """Store a text column in Arrow's large_string layout: UTF-8 bytes, int64 byte offsets and a validity bitmap."""
+    valid = values.notna().to_numpy(dtype=bool)
+    encoded = [str(value).encode('utf-8') if present else b"" for value, present in zip(values.tolist(), valid)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    _save_array(directory, f"{name}.data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    _save_array(directory, f"{name}.offsets", offsets)
+    _save_array(directory, f"{name}.valid", np.packbits(valid, bitorder='little'))
+    return {"kind": 'text', "file": name, "rows": len(encoded)}
+
+
+def _read_text(directory: str, entry: Dict):
+    """Map a text column back; zero-copy as an Arrow string array, or decoded when pyarrow is missing."""
+    data = _load_array(directory, f"{entry['file']}.data")
+    offsets = _load_array(directory, f"{entry['file']}.offsets")
+    valid = _load_array(directory, f"{entry['file']}.valid")
+    if pyarrow is not None:
+        array = pyarrow.LargeStringArray.from_buffers(
+            entry["rows"], pyarrow.py_buffer(offsets), pyarrow.py_buffer(data), pyarrow.py_buffer(valid))
+        return pd.arrays.ArrowStringArray(pyarrow.chunked_array([array]))
+
+    raw = data.tobytes()
+    present = np.unpackbits(valid, count=entry["rows"], bitorder='little').astype(bool).tolist()
+    bounds = offsets.tolist()
+    values = np.empty(entry["rows"], dtype=object)
+    values[:] = [sys.intern(raw[start:end].decode('utf-8')) if keep else None
+                 for start, end, keep in zip(bounds, bounds[1:], present)]
+    return values
+
+
+def _write_frame(df: pd.DataFrame, directory: str, prefix: str) -> List[Dict]:
+    """Write every column of a DataFrame; categoricals as codes plus their categories."""
+    columns = []
+    for position, column in enumerate(df.columns):
+        name = f"{prefix}{position:03d}"
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            entry = {"kind": 'category', "file": _save_array(directory, name, values.cat.codes.to_numpy()),
+                     "categories": values.cat.categories.tolist()}
+        elif values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            entry = _write_text(directory, name, values)
+        else:
+            entry = {"kind": 'array', "file": _save_array(directory, name, values.to_numpy())}
+        columns.append(dict(entry, name=str(column)))
+    return columns
+
+
+def _read_frame(directory: str, columns: List[Dict]) -> pd.DataFrame:
+    """Rebuild a DataFrame written by _write_frame on top of the mapped arrays, without copying them."""
+    data = {}
+    for entry in columns:
+        if entry["kind"] == 'category':
+            data[entry["name"]] = pd.Categorical.from_codes(
+                _load_array(directory, entry["file"]), dtype=pd.CategoricalDtype(entry["categories"]), validate=False)
+        elif entry["kind"] == 'text':
+            data[entry["name"]] = _read_text(directory, entry)
+        else:
+            data[entry["name"]] = _load_array(directory, entry["file"])
+    # copy=False keeps each column on its own mapped array instead of consolidating them into new blocks
+    return pd.DataFrame(data, columns=[entry["name"] for entry in columns], copy=False)
+
+
+def _write_index_state(state: Dict, directory: str) -> Dict:
+    """
+    Write a SearchIndex.state(): arrays as mapped files, lists of strings (vocabulary, facet labels,
+    completion keys, trigrams) as mapped text arrays like the text columns, anything else inline as JSON.
+    """
+    arrays, texts, values = {}, {}, {}
+    for position, (key, value) in enumerate(state.items()):
+        name = f"index_{position:03d}"
+        if isinstance(value, np.ndarray):
+            arrays[key] = _save_array(directory, name, value)
+        elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+            texts[key] = _write_text(directory, name, pd.Series(value, dtype=object))
+        else:
+            values[key] = value
+    return {"arrays": arrays, "texts": texts, "values": values}
+
+
+def _read_index_state(directory: str, manifest: Dict) -> Dict:
+    state = dict(manifest["values"])
+    state.update({key: _load_array(directory, name) for key, name in manifest["arrays"].items()})
+    state.update({key: _read_text(directory, entry) for key, entry in manifest["texts"].items()})
+    return state
+
+
+class _BuildLock:
+    """Exclusive lock on the image directory, so concurrently starting workers build an image only once."""
+
+    def __init__(self, image_dir: str):
+        self.path = os.path.join(image_dir, '.lock')
+
+    def __enter__(self):
+        self.file = open(self.path, 'w')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def build_image(products_path: str, brands_path: str, image_dir: str = DEFAULT_IMAGE_DIR) -> str:
+    """
+    Build the image of the given workbooks unless it already exists, publish it as CURRENT
+    and return its stamp. Images of other versions are removed; workers still mapping one keep
+    reading it, since its pages stay valid until they unmap it.
+    """
+    os.makedirs(image_dir, exist_ok=True)
+    stamp = image_stamp(products_path, brands_path)
+    target = os.path.join(image_dir, stamp)
+    with _BuildLock(image_dir):
+        if not os.path.exists(os.path.join(target, 'manifest.json')):
+            started = time.perf_counter()
+            brands_df = load_brands(brands_path)
+            products_df = load_products_from_multisheet(products_path, brands_df)
+            index = get_search_index(products_df)
+            for column in IMAGE_FACETS:
+                if column == 'price_bucket' or column in products_df.columns:
+                    index.facet(column)
+
+            staging = tempfile.mkdtemp(prefix='.staging-', dir=image_dir)
+            manifest = {
+                "format": IMAGE_FORMAT,
+                "stamp": stamp,
+                "sources": [os.path.basename(products_path), os.path.basename(brands_path)],
+                "brands": _write_frame(brands_df, staging, 'brands_'),
+                "products": _write_frame(products_df, staging, 'products_'),
+                "index": _write_index_state(index.state(), staging),
+                "summary": get_catalogue_summary(brands_df, products_df).rows,
+            }
+            with open(os.path.join(staging, 'manifest.json'), 'w') as file:
+                json.dump(manifest, file)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.rename(staging, target)
+            elapsed = time.perf_counter() - started
+            record_load('image_build', elapsed)
+            logger.info("Built catalogue image %s in %.3fs", stamp, elapsed)
+
+        if read_current_stamp(image_dir) != stamp:
+            _publish(image_dir, stamp)
+        for entry in os.listdir(image_dir):
+            if entry != stamp and os.path.isdir(os.path.join(image_dir, entry)):
+                shutil.rmtree(os.path.join(image_dir, entry), ignore_errors=True)
+    return stamp
+
+
+def open_image(stamp: str, image_dir: str = DEFAULT_IMAGE_DIR) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Map the image with the given stamp and return (brands_df, products_df), its index and summary already registered."""
+    directory = os.path.join(image_dir, stamp)
+    with open(os.path.join(directory, 'manifest.json')) as file:
+        manifest = json.load(file)
+    if manifest.get("format") != IMAGE_FORMAT:
+        raise ValueError(f"Catalogue image {stamp} has format {manifest.get('format')}, expected {IMAGE_FORMAT}")
+
+    brands_df = _read_frame(directory, manifest["brands"])
+    products_df = _read_frame(directory, manifest["products"])
+    register_search_index(products_df, SearchIndex.from_state(products_df, _read_index_state(directory, manifest["index"])))
+    register_catalogue_summary(products_df, CatalogueSummary(manifest["summary"]))
+    return brands_df, products_df
+
+
+class SharedCatalogue:
+    """
+    The catalogue a worker serves, mapped from the shared image. current() re-reads the CURRENT
+    stamp at most every IMAGE_CHECK_SECONDS and switches to a newly published image as a whole;
+    the generation number counts those switches and serves as the catalogue's data version.
+    Each worker also runs a CatalogueWatcher that rebuilds the image when the workbooks change.
+    """
+
+    def __init__(self, products_path: str, brands_path: str, image_dir: str = DEFAULT_IMAGE_DIR):
+        self.products_path = products_path
+        self.brands_path = brands_path
+        self.image_dir = image_dir
+        self.check_interval = float(os.getenv('IMAGE_CHECK_SECONDS', '5'))
+        self.reload_interval = float(os.getenv('CATALOGUE_RELOAD_SECONDS', '10'))
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._watcher_pid = None
+
+        started = time.perf_counter()
+        try:
+            self.stamp = build_image(products_path, brands_path, image_dir)
+            self._catalogue = open_image(self.stamp, image_dir) + (1,)
+            elapsed = time.perf_counter() - started
+            record_load('image_map', elapsed)
+            logger.info("Mapped catalogue image %s in %.3fs", self.stamp, elapsed)
+        except OSError as e:
+            # e.g. a read-only deployment directory: serve a private in-memory copy instead, parsed
+            # straight from the workbooks since the snapshot directory is likely unwritable too
+            logger.error("Error building catalogue image in %s, loading in memory: %s", image_dir, e)
+            self.stamp = None
+            brands_df = load_brands(brands_path, snapshot_dir=None)
+            self._catalogue = (brands_df, load_products_from_multisheet(products_path, brands_df, snapshot_dir=None), 1)
+
+    def current(self) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+        """(brands_df, products_df, generation) of the image to serve; callers keep the tuple for a whole request."""
+        self._ensure_watcher()
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self._catalogue
+            self._checked_at = time.monotonic()
+        stamp = read_current_stamp(self.image_dir)
+        if stamp is not None and self.stamp is not None and stamp != self.stamp:
+            self.switch_to(stamp)
+        return self._catalogue
+
+    def switch_to(self, stamp: str) -> bool:
+        """
+        Map the image with the given stamp and serve it from the next request on. Requests already
+        running keep the tuple they started with, so they finish on the previous generation.
+        """
+        try:
+            brands_df, products_df = open_image(stamp, self.image_dir)
+        except (OSError, ValueError) as e:
+            # e.g. replaced again while being opened; keep serving the current image and retry later
+            logger.error("Error opening catalogue image %s: %s", stamp, e)
+            return False
+        with self._lock:
+            if stamp != self.stamp:
+                self.stamp = stamp
+                self._catalogue = (brands_df, products_df, self._catalogue[2] + 1)
+                logger.info("Switched to catalogue image %s (generation %d)", stamp, self._catalogue[2])
+        return True
+
+    def _ensure_watcher(self) -> None:
+        # Threads don't survive fork, so with --preload each worker starts its own watcher on its first request
+        if self.reload_interval <= 0 or self.stamp is None or self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid != os.getpid():
+                self._watcher_pid = os.getpid()
+                CatalogueWatcher(self).start()
+
+
+class CatalogueWatcher(threading.Thread):
+    """
+    Background thread polling the workbooks' mtime and size every CATALOGUE_RELOAD_SECONDS.
+    When they changed and so did their content hash, it builds the image of the new workbooks
+    off the request path (parsing only the sheets that changed) and switches the catalogue to it.
+    """
+
+    def __init__(self, catalogue: SharedCatalogue):
+        super().__init__(name='catalogue-watcher', daemon=True)
+        self.catalogue = catalogue
+        # None, so the first check compares content hashes in case the workbooks changed before it started
+        self._last_stats = None
+
+    def _stats(self):
+        try:
+            return tuple((stat.st_mtime_ns, stat.st_size) for stat in
+                         (os.stat(self.catalogue.products_path), os.stat(self.catalogue.brands_path)))
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """Rebuild and switch to the image of the current workbooks if they changed; True when it switched."""
+        stats = self._stats()
+        if stats is None or stats == self._last_stats:
+            return False
+        # Recorded before building, so a workbook that fails to load is retried only once it changes again
+        self._last_stats = stats
+        catalogue = self.catalogue
+        if image_stamp(catalogue.products_path, catalogue.brands_path) == catalogue.stamp:
+            return False
+
+        started = time.perf_counter()
+        stamp = build_image(catalogue.products_path, catalogue.brands_path, catalogue.image_dir)
+        switched = catalogue.switch_to(stamp)
+        elapsed = time.perf_counter() - started
+        record_load('reload', elapsed)
+        logger.info("Reloaded catalogue image %s in %.3fs", stamp, elapsed)
+        return switched
+
+    def run(self):
+        while True:
+            time.sleep(self.catalogue.reload_interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error("Error reloading the catalogue: %s", e)
+
+
+def main():
+    products_path = "NNRZ Products.xlsx"
+    brands_path = "NNRZ Database.xlsx"
+
+    print(f"📦 Building catalogue image of {products_path} and {brands_path}...")
+    stamp = build_image(products_path, brands_path)
+    brands_df, products_df = open_image(stamp)
+    print(f"✅ Published image {stamp} in {DEFAULT_IMAGE_DIR}/ ({len(products_df)} products, {len(brands_df)} brands)")
+
+
+if __name__ == "__main__":
+    main()
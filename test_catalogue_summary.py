@@ -0,0 +1,29 @@
+from catalogue_summary import CatalogueSummary, price_stat
+
+
+def test_price_stat_rounds_and_treats_nan_as_missing():
+    assert price_stat(1234.567) == 1234.57
+    assert price_stat(None) is None
+    assert price_stat(float("nan")) is None
+
+
+def test_summary_listings_in_code_point_order():
+    summary = CatalogueSummary([
+        ("brand", "bliss", 4, 690, 1590, 1120.0),
+        ("brand", "Wrclo", 4, 1500, 2100, 1899),
+        ("brand", "Aarong", 0, None, None, None),
+        ("category", "Shirts", 5, 990, 2100, float("nan")),
+    ])
+    assert summary.listing("brand") == ["Aarong", "Wrclo", "bliss"]
+    assert summary.listing("category", stats=True) == [
+        {"value": "Shirts", "count": 5, "min_price": 990.0, "max_price": 2100.0, "median_price": None}
+    ]
+    assert summary.entries("brand")[0] == {"value": "Aarong", "count": 0, "min_price": None, "max_price": None,
+                                           "median_price": None}
+    assert summary.names("category") == ["Shirts"]
+
+
+def test_summary_rows_round_trip():
+    summary = CatalogueSummary([("category", "Pants", 2, 1590, 1899, 1744.5), ("brand", "Bliss", 4, 690, 1590, 1120)])
+    assert CatalogueSummary(summary.rows).rows == summary.rows
+    assert CatalogueSummary([]).listing("brand") == []
@@ -0,0 +1,14 @@
+from facets import PRICE_BUCKET_EDGES, facet_entries, price_bucket_entries
+
+
+def test_facet_entries_most_common_first_without_empty_values():
+    entries = facet_entries(["Wrclo", "bliss", "Aarong", "Yellow"], [4, 4, 0, 7])
+    assert entries == [{"value": "Yellow", "count": 7}, {"value": "bliss", "count": 4}, {"value": "Wrclo", "count": 4}]
+
+
+def test_price_bucket_entries_cover_every_bucket():
+    entries = price_bucket_entries([3, 5])
+    assert len(entries) == len(PRICE_BUCKET_EDGES)
+    assert entries[0] == {"min": 0, "max": 1000, "count": 3}
+    assert entries[1] == {"min": 1000, "max": 2000, "count": 5}
+    assert entries[-1] == {"min": 10000, "max": None, "count": 0}
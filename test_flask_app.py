@@ -0,0 +1,140 @@
+import json
+from urllib.parse import unquote
+import os
+
+import pytest
+
+from conftest import CATALOGUE, collect_pages, write_workbooks
+from ranking import SORT_OPTIONS
+from shared_catalogue import CatalogueWatcher
+
+
+def get_json(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data()
+    return json.loads(response.get_data())
+
+
+@pytest.mark.parametrize('sort', SORT_OPTIONS)
+@pytest.mark.parametrize('query', ['', 'shirt'])
+def test_cursor_pages_add_up_to_one_page(pandas_client, sort, query):
+    path = f"/search?q={query}&sort={sort}"
+    everything = get_json(pandas_client, f"{path}&limit=200")
+    pages = collect_pages(lambda url: get_json(pandas_client, url), path, 2)
+    assert pages == everything["results"]
+    assert len(pages) == everything["total"] > 2
+
+
+def test_batch_matches_separate_searches(pandas_client):
+    queries = [{"q": "shirt", "limit": 2}, {"brand": ["wrclo"], "sort": "price_asc"}, {"category": "pants", "max_price": 1600}]
+    paths = ["/search?q=shirt&limit=2", "/search?brand=wrclo&sort=price_asc&limit=48",
+             "/search?category=pants&max_price=1600&limit=48"]
+    batch = pandas_client.post("/search/batch", json={"queries": queries})
+    assert batch.status_code == 200
+    assert json.loads(batch.get_data())["results"] == [get_json(pandas_client, path) for path in paths]
+
+
+def test_facets_count_each_facet_without_its_own_filter(pandas_client):
+    facets = get_json(pandas_client, "/facets?brand=bliss")
+    assert facets["total"] == 4
+    # The brand facet ignores the brand filter, so the other brands stay selectable
+    assert facets["brands"] == [{"value": "Bliss", "count": 4}, {"value": "Wrclo", "count": 4}]
+    assert facets["categories"] == [{"value": "Shirts", "count": 2}, {"value": "Pants", "count": 1},
+                                    {"value": "T-shirts", "count": 1}]
+    assert [bucket["count"] for bucket in facets["price_buckets"]] == [2, 2, 0, 0, 0, 0]
+
+
+def test_streamed_search_is_cached_once_sent(pandas_client):
+    first = pandas_client.get("/search?q=shrit&fuzzy=1")
+    body = first.get_data()
+    assert "ETag" not in first.headers
+    second = pandas_client.get("/search?q=shrit&fuzzy=1")
+    assert (second.get_data(), second.headers["X-Corrected-Query"]) == (body, "shirt")
+    revalidated = pandas_client.get("/search?q=shrit&fuzzy=1", headers={"If-None-Match": second.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_etag_revalidation_until_the_catalogue_changes(pandas_client, workbooks):
+    import flask_app
+
+    response = pandas_client.get("/brands")
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'no-cache'
+    revalidated = pandas_client.get("/brands", headers={"If-None-Match": etag})
+    assert (revalidated.status_code, revalidated.headers['ETag'], revalidated.get_data()) == (304, etag, b"")
+
+    # New workbooks are picked up as a new image generation, which invalidates the cached responses
+    catalogue = dict(CATALOGUE, Yellow=[('Panjabi', 'Panjabi', 'https://yellow.example/panjabi', 'Tk 3,200')])
+    write_workbooks(os.path.dirname(workbooks[0]), catalogue)
+    assert CatalogueWatcher(flask_app.catalogue).check()
+    response = pandas_client.get("/brands", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert json.loads(response.get_data()) == ["Bliss", "Wrclo", "Yellow"]
+
+
+def test_suggest_completes_categories_brands_and_product_names(pandas_client):
+    suggestions = get_json(pandas_client, "/suggest?q=SH&limit=20")["suggestions"]
+    assert suggestions[0] == {"text": "Shirts", "type": "category", "count": 4}
+    assert {suggestion["text"] for suggestion in suggestions} == {
+        "Shirts", "T-shirts", "Linen Shirt", "Cotton Shirt", "Printed T-Shirt", "Denim Shirt", "Black Shirt"}
+    assert len(get_json(pandas_client, "/suggest?q=sh&limit=2")["suggestions"]) == 2
+    assert get_json(pandas_client, "/suggest?q=wr")["suggestions"] == [{"text": "Wrclo", "type": "brand", "count": 4}]
+    assert get_json(pandas_client, "/suggest?q=linen%20sh")["suggestions"] == [
+        {"text": "Linen Shirt", "type": "product", "count": 1}]
+    assert get_json(pandas_client, "/suggest?q=")["suggestions"] == []
+    assert pandas_client.get("/suggest?q=sh&limit=0").status_code == 400
+
+
+def test_fuzzy_search_corrects_misspelled_terms(pandas_client):
+    response = pandas_client.get("/search?q=linen%20shrit&fuzzy=1&limit=10")
+    assert unquote(response.headers["X-Corrected-Query"]) == "linen shirt"
+    assert [product["product_name"] for product in response.get_json()["results"]][0] == "Linen Shirt"
+    assert get_json(pandas_client, "/search?q=linen%20shrit&limit=10")["total"] == 0
+
+
+def test_hyphenated_words_match_written_solid(pandas_client):
+    assert names(get_json(pandas_client, "/search?q=tshirt&limit=10")) == ["Printed T-Shirt"]
+    response = pandas_client.get("/search?q=tshrit&fuzzy=1&limit=10")
+    assert unquote(response.headers["X-Corrected-Query"]) == "tshirt"
+    assert names(response.get_json()) == ["Printed T-Shirt"]
+    assert names(get_json(pandas_client, "/search?q=t-shirt&limit=10")) == ["Printed T-Shirt"]
+
+
+def names(page):
+    return [product["product_name"] for product in page["results"]]
+
+
+def test_sorts_by_price_with_unpriced_products_last(pandas_client):
+    assert names(get_json(pandas_client, "/search?sort=price_asc&limit=10")) == [
+        "Printed T-Shirt", "Cotton Shirt", "Linen Shirt", "Black Shirt", "Slim Fit Pants", "Cargo Pants", "Denim Shirt",
+        "Oversized Hoodie"]
+    assert names(get_json(pandas_client, "/search?sort=price_desc&limit=10"))[:2] == ["Denim Shirt", "Cargo Pants"]
+    assert names(get_json(pandas_client, "/search?sort=price_desc&limit=10"))[-1] == "Oversized Hoodie"
+    assert names(get_json(pandas_client, "/search?sort=name&limit=3")) == ["Black Shirt", "Cargo Pants", "Cotton Shirt"]
+
+
+def test_relevance_applies_brand_boosts(pandas_client, monkeypatch):
+    import multi_sheet_loader
+
+    monkeypatch.setattr(multi_sheet_loader, 'BRAND_BOOSTS', {'wrclo': 10.0})
+    assert names(get_json(pandas_client, "/search?q=shirt&limit=2")) == ["Black Shirt", "Denim Shirt"]
+    assert pandas_client.get("/search?q=shirt&sort=cheap&limit=2").status_code == 400
+
+
+def test_repeated_filters_match_any_of_their_values(pandas_client):
+    page = get_json(pandas_client, "/search?brand=Bliss&brand=wrclo&category=pants&category=HOODIES&sort=name&limit=10")
+    assert names(page) == ["Cargo Pants", "Oversized Hoodie", "Slim Fit Pants"]
+    assert get_json(pandas_client, "/search?brand=wrclo&brand=&category=shirts&limit=10")["total"] == 2
+    facets = get_json(pandas_client, "/facets?brand=bliss&brand=wrclo&category=pants&category=hoodies")
+    assert facets["total"] == 3
+    assert facets["categories"][:2] == [{"value": "Shirts", "count": 4}, {"value": "Pants", "count": 2}]
+
+
+def test_brand_and_category_listings_from_the_summary(pandas_client):
+    assert get_json(pandas_client, "/brands") == ["Bliss", "Wrclo"]
+    assert get_json(pandas_client, "/categories") == ["Hoodies", "Pants", "Shirts", "T-shirts"]
+    assert get_json(pandas_client, "/brands?stats=1")[1] == {
+        "value": "Wrclo", "count": 4, "min_price": 1500.0, "max_price": 2100.0, "median_price": 1899.0}
+    assert get_json(pandas_client, "/categories?stats=1")[0] == {
+        "value": "Hoodies", "count": 1, "min_price": None, "max_price": None, "median_price": None}
@@ -0,0 +1,164 @@
+import json
+from urllib.parse import unquote
+
+import pytest
+
+from conftest import CATALOGUE, collect_pages, write_workbooks
+from pagination import encode_cursor
+from ranking import SORT_OPTIONS
+
+
+def get_json(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_data()
+    return json.loads(response.get_data())
+
+
+@pytest.mark.parametrize('sort', SORT_OPTIONS)
+@pytest.mark.parametrize('query', ['', 'shirt'])
+def test_cursor_pages_add_up_to_one_page(postgres_client, sort, query):
+    path = f"/search?q={query}&sort={sort}"
+    everything = get_json(postgres_client, f"{path}&limit=200")
+    pages = collect_pages(lambda url: get_json(postgres_client, url), path, 2)
+    assert pages == everything["results"]
+    assert len(pages) == everything["total"] > 2
+
+
+def test_forged_cursors_are_rejected(postgres_client):
+    for keyset in (["price_asc", "cheap", "Linen Shirt", 1], ["price_asc", "1250.00", 7, 1], ["name", "Linen Shirt", "1"]):
+        sort = keyset[0]
+        response = postgres_client.get(f"/search?sort={sort}&limit=2&cursor={encode_cursor(keyset)}")
+        assert response.status_code == 400
+        assert "Invalid cursor" in json.loads(response.get_data())["error"]
+
+
+def test_batch_matches_separate_searches(postgres_client):
+    queries = [{"q": "shirt", "limit": 2}, {"brand": ["wrclo"], "sort": "price_asc"}, {"category": "pants", "max_price": 1600}]
+    paths = ["/search?q=shirt&limit=2", "/search?brand=wrclo&sort=price_asc&limit=48",
+             "/search?category=pants&max_price=1600&limit=48"]
+    batch = postgres_client.post("/search/batch", json={"queries": queries})
+    assert batch.status_code == 200
+    assert json.loads(batch.get_data())["results"] == [get_json(postgres_client, path) for path in paths]
+
+
+def test_facets_count_each_facet_without_its_own_filter(postgres_client):
+    facets = get_json(postgres_client, "/facets?brand=bliss")
+    assert facets["total"] == 4
+    # The brand facet ignores the brand filter, so the other brands stay selectable
+    assert facets["brands"] == [{"value": "Bliss", "count": 4}, {"value": "Wrclo", "count": 4}]
+    assert facets["categories"] == [{"value": "Shirts", "count": 2}, {"value": "Pants", "count": 1},
+                                    {"value": "T-shirts", "count": 1}]
+    assert [bucket["count"] for bucket in facets["price_buckets"]] == [2, 2, 0, 0, 0, 0]
+
+
+def test_streamed_search_is_cached_once_sent(postgres_client):
+    first = postgres_client.get("/search?q=shrit&fuzzy=1")
+    body = first.get_data()
+    assert "ETag" not in first.headers
+    second = postgres_client.get("/search?q=shrit&fuzzy=1")
+    assert (second.get_data(), second.headers["X-Corrected-Query"]) == (body, "shirt")
+    revalidated = postgres_client.get("/search?q=shrit&fuzzy=1", headers={"If-None-Match": second.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_etag_revalidation_until_a_migration_bumps_the_version(postgres_client, migrate, tmp_path):
+    response = postgres_client.get("/categories?stats=1")
+    etag = response.headers['ETag']
+    revalidated = postgres_client.get("/categories?stats=1", headers={"If-None-Match": etag})
+    assert (revalidated.status_code, revalidated.headers['ETag'], revalidated.get_data()) == (304, etag, b"")
+
+    catalogue = dict(CATALOGUE, Wrclo=CATALOGUE['Wrclo'] + [('Zip Hoodie', 'Hoodies', 'https://wrclo.example/zip-hoodie', 'Tk 2,400')])
+    assert migrate(*write_workbooks(str(tmp_path / 'changed'), catalogue), sync=True) == 1
+    response = postgres_client.get("/categories?stats=1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    hoodies = json.loads(response.get_data())[0]
+    assert (hoodies["value"], hoodies["count"], hoodies["min_price"]) == ("Hoodies", 2, 2400.0)
+
+
+def test_suggest_completes_categories_brands_and_product_names(postgres_client):
+    suggestions = get_json(postgres_client, "/suggest?q=SH&limit=20")["suggestions"]
+    assert suggestions[0] == {"text": "Shirts", "type": "category", "count": 4}
+    assert {suggestion["text"] for suggestion in suggestions} == {
+        "Shirts", "T-shirts", "Linen Shirt", "Cotton Shirt", "Printed T-Shirt", "Denim Shirt", "Black Shirt"}
+    assert len(get_json(postgres_client, "/suggest?q=sh&limit=2")["suggestions"]) == 2
+    assert get_json(postgres_client, "/suggest?q=wr")["suggestions"] == [{"text": "Wrclo", "type": "brand", "count": 4}]
+    assert get_json(postgres_client, "/suggest?q=linen%20sh")["suggestions"] == [
+        {"text": "Linen Shirt", "type": "product", "count": 1}]
+    assert get_json(postgres_client, "/suggest?q=")["suggestions"] == []
+    assert postgres_client.get("/suggest?q=sh&limit=0").status_code == 400
+
+
+def test_fuzzy_search_corrects_misspelled_terms(postgres_client):
+    response = postgres_client.get("/search?q=linen%20shrit&fuzzy=1&limit=10")
+    assert unquote(response.headers["X-Corrected-Query"]) == "linen shirt"
+    assert [product["product_name"] for product in response.get_json()["results"]][0] == "Linen Shirt"
+    assert get_json(postgres_client, "/search?q=linen%20shrit&limit=10")["total"] == 0
+
+
+def test_hyphenated_words_match_written_solid(postgres_client):
+    assert names(get_json(postgres_client, "/search?q=tshirt&limit=10")) == ["Printed T-Shirt"]
+    response = postgres_client.get("/search?q=tshrit&fuzzy=1&limit=10")
+    assert unquote(response.headers["X-Corrected-Query"]) == "tshirt"
+    assert names(response.get_json()) == ["Printed T-Shirt"]
+    assert names(get_json(postgres_client, "/search?q=t-shirt&limit=10")) == ["Printed T-Shirt"]
+
+
+def names(page):
+    return [product["product_name"] for product in page["results"]]
+
+
+def test_sorts_by_price_with_unpriced_products_last(postgres_client):
+    assert names(get_json(postgres_client, "/search?sort=price_asc&limit=10")) == [
+        "Printed T-Shirt", "Cotton Shirt", "Linen Shirt", "Black Shirt", "Slim Fit Pants", "Cargo Pants", "Denim Shirt",
+        "Oversized Hoodie"]
+    assert names(get_json(postgres_client, "/search?sort=price_desc&limit=10"))[:2] == ["Denim Shirt", "Cargo Pants"]
+    assert names(get_json(postgres_client, "/search?sort=price_desc&limit=10"))[-1] == "Oversized Hoodie"
+    assert names(get_json(postgres_client, "/search?sort=name&limit=3")) == ["Black Shirt", "Cargo Pants", "Cotton Shirt"]
+
+
+def test_price_bounds_parse_like_the_catalogue_prices(postgres_client):
+    assert names(get_json(postgres_client, "/search?min_price=Tk%201,500&max_price=1600&sort=name&limit=10")) == [
+        "Black Shirt", "Slim Fit Pants"]
+    assert get_json(postgres_client, "/facets?max_price=1000")["total"] == 2
+    for path in ("/search?min_price=cheap", "/search?max_price=$75&limit=5", "/facets?min_price=lots"):
+        response = postgres_client.get(path)
+        assert response.status_code == 400
+        assert "Invalid price" in json.loads(response.get_data())["error"]
+
+
+def test_relevance_applies_brand_boosts(postgres_client, monkeypatch):
+    import postgres_queries
+
+    monkeypatch.setattr(postgres_queries, 'BRAND_BOOSTS', {'wrclo': 10.0})
+    assert names(get_json(postgres_client, "/search?q=shirt&limit=2")) == ["Black Shirt", "Denim Shirt"]
+    assert postgres_client.get("/search?q=shirt&sort=cheap&limit=2").status_code == 400
+
+
+def test_repeated_filters_match_any_of_their_values(postgres_client):
+    page = get_json(postgres_client, "/search?brand=Bliss&brand=wrclo&category=pants&category=HOODIES&sort=name&limit=10")
+    assert names(page) == ["Cargo Pants", "Oversized Hoodie", "Slim Fit Pants"]
+    assert get_json(postgres_client, "/search?brand=wrclo&brand=&category=shirts&limit=10")["total"] == 2
+    facets = get_json(postgres_client, "/facets?brand=bliss&brand=wrclo&category=pants&category=hoodies")
+    assert facets["total"] == 3
+    assert facets["categories"][:2] == [{"value": "Shirts", "count": 4}, {"value": "Pants", "count": 2}]
+
+
+def test_brand_and_category_listings_from_the_summary(postgres_client):
+    assert get_json(postgres_client, "/brands") == ["Bliss", "Wrclo"]
+    assert get_json(postgres_client, "/categories") == ["Hoodies", "Pants", "Shirts", "T-shirts"]
+    assert get_json(postgres_client, "/brands?stats=1")[1] == {
+        "value": "Wrclo", "count": 4, "min_price": 1500.0, "max_price": 2100.0, "median_price": 1899.0}
+    assert get_json(postgres_client, "/categories?stats=1")[0] == {
+        "value": "Hoodies", "count": 1, "min_price": None, "max_price": None, "median_price": None}
+
+
+def test_pool_keeps_returned_connections_open(postgres_client):
+    import flask_app_postgres
+
+    manager = flask_app_postgres.db_manager
+    connections = [manager.checkout() for _ in range(3)]
+    for conn in connections:
+        manager.release(conn)
+    assert not any(conn.closed for conn in connections)
+    assert manager.pool_metrics()["idle"] == manager.max_connections
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from fuzzy_match import FuzzyMatcher, edit_distance, is_enabled, max_edits, trigrams
+
+
+@pytest.mark.parametrize('value, enabled', [("1", True), ("true", True), (" Yes ", True), ("on", True),
+                                            ("0", False), ("", False), (None, False), ("off", False)])
+def test_is_enabled(value, enabled):
+    assert is_enabled(value) is enabled
+
+
+def test_max_edits_grows_with_the_term():
+    assert [max_edits(term) for term in ("tee", "shrt", "panjabii", "sweatshirts")] == [0, 1, 2, 2]
+
+
+def test_trigrams_are_padded_like_pg_trgm():
+    assert trigrams("tee") == ["  t", " te", "ee ", "tee"]
+
+
+def test_edit_distance_counts_transpositions_once_and_gives_up_past_the_limit():
+    assert edit_distance("shirt", "shirt", 2) == 0
+    assert edit_distance("shrit", "shirt", 2) == 1
+    assert edit_distance("shrt", "shirt", 2) == 1
+    assert edit_distance("hoodie", "shirt", 2) == 3
+    assert edit_distance("a", "abcdef", 2) == 3
+
+
+def test_correct_query_replaces_only_unmatched_terms():
+    matcher = FuzzyMatcher(["shirt", "shirts", "short", "linen", "pants"], [5, 2, 1, 3, 4])
+    assert matcher.correct_query("linen shrit") == "linen shirt"
+    assert matcher.correct_query("Linen Shirt") == "Linen Shirt"
+    # Too short to correct, and nothing close enough
+    assert matcher.correct_query("tee xylophone") == "tee xylophone"
+
+
+def test_correct_prefers_the_most_frequent_of_equally_close_tokens():
+    matcher = FuzzyMatcher(["shirt", "short"], [1, 9])
+    assert matcher.correct("shart", time.perf_counter() + 1) == "short"
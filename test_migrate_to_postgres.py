@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from conftest import CATALOGUE, write_workbooks
+
+
+def test_blank_product_name_is_migrated_as_empty_string(migrate, scratch_query, tmp_path):
+    catalogue = dict(CATALOGUE, Bliss=CATALOGUE['Bliss'] + [(None, 'Shirts', 'https://bliss.example/unnamed', 'Tk 800')])
+    migrate(*write_workbooks(str(tmp_path / 'blank'), catalogue))
+
+    rows = scratch_query("SELECT product_name FROM products WHERE product_url = 'https://bliss.example/unnamed'")
+    assert rows == [('',)]
+    assert scratch_query("SELECT COUNT(*) FROM products") == [(9,)]
+
+
+def test_sync_with_blank_product_name(migrate, scratch_query, workbooks, tmp_path):
+    migrate(*workbooks)
+    catalogue = dict(CATALOGUE, Wrclo=CATALOGUE['Wrclo'] + [(None, 'Pants', 'https://wrclo.example/unnamed', 'Tk 900')])
+    assert migrate(*write_workbooks(str(tmp_path / 'blank'), catalogue), sync=True) == 1
+    assert scratch_query("SELECT product_name FROM products WHERE product_url = 'https://wrclo.example/unnamed'") == [('',)]
+
+
+def test_summary_refresh_does_not_wait_for_readers(migrate, scratch_query, scratch_database_url, workbooks, tmp_path, monkeypatch):
+    import psycopg2
+    import migrate_to_postgres
+
+    migrate(*workbooks)
+    [(version,)] = scratch_query("SELECT version FROM catalogue_version")
+    # A reader midway through a transaction over every summary view; a plain REFRESH would queue
+    # behind it (and give up after lock_timeout), a concurrent one doesn't
+    reader = psycopg2.connect(scratch_database_url)
+    try:
+        with reader.cursor() as cursor:
+            for view in migrate_to_postgres.SUMMARY_VIEWS:
+                cursor.execute(f"SELECT COUNT(*) FROM {view}")
+        monkeypatch.setenv('PGOPTIONS', '-c lock_timeout=2000')
+        catalogue = dict(CATALOGUE, Wrclo=CATALOGUE['Wrclo'][:-1])
+        assert migrate(*write_workbooks(str(tmp_path / 'changed'), catalogue), sync=True) == 1
+    finally:
+        reader.close()
+
+    assert scratch_query("SELECT product_count FROM catalogue_summary WHERE kind = 'brand' AND value = 'Wrclo'") == [(3,)]
+    assert scratch_query("SELECT version FROM catalogue_version") == [(version + 1,)]
+
+
+def test_sync_of_an_unchanged_catalogue_changes_nothing(migrate, scratch_query, workbooks):
+    migrate(*workbooks)
+    before = scratch_query("SELECT version, updated_at FROM catalogue_version")
+    assert migrate(*workbooks, sync=True) == 0
+    assert scratch_query("SELECT version, updated_at FROM catalogue_version") == before
+
+
+def test_sync_writes_only_the_changed_rows(migrate, scratch_query, workbooks, tmp_path):
+    migrate(*workbooks)
+    [(version,)] = scratch_query("SELECT version FROM catalogue_version")
+    bliss = [('Linen Shirt', 'Shirts', 'https://bliss.example/linen-shirt', 'Tk 1,150.00')] + CATALOGUE['Bliss'][1:]
+    wrclo = CATALOGUE['Wrclo'][1:] + [('Zip Hoodie', 'Hoodies', 'https://wrclo.example/zip-hoodie', 'Tk 2,400')]
+    # One price changed, one product removed and one added
+    assert migrate(*write_workbooks(str(tmp_path / 'changed'), {'Bliss': bliss, 'Wrclo': wrclo}), sync=True) == 3
+
+    assert scratch_query("SELECT price FROM products WHERE product_url = 'https://bliss.example/linen-shirt'") == [(Decimal('1150.00'),)]
+    assert scratch_query("SELECT COUNT(*) FROM products WHERE product_url = 'https://wrclo.example/denim-shirt'") == [(0,)]
+    assert scratch_query("SELECT product_name FROM products WHERE product_url = 'https://wrclo.example/zip-hoodie'") == [('Zip Hoodie',)]
+    assert scratch_query("SELECT COUNT(*) FROM products") == [(8,)]
+    assert scratch_query("SELECT version FROM catalogue_version") == [(version + 1,)]
+
+
+def test_sync_replaces_brands_migrated_without_keys(migrate, scratch_query, scratch_database_url, workbooks):
+    import psycopg2
+
+    migrate(*workbooks)
+    # The brands table as the first migration script left it: no unique key and brand_clean = '' throughout
+    with psycopg2.connect(scratch_database_url) as conn, conn.cursor() as cursor:
+        cursor.execute("DROP INDEX idx_brands_brand_clean")
+        cursor.execute("UPDATE brands SET brand_clean = '', content_hash = NULL")
+        cursor.execute("INSERT INTO brands (brand, brand_clean) SELECT brand, brand_clean FROM brands")
+
+    assert migrate(*workbooks, sync=True) == 6
+    assert scratch_query("SELECT brand, brand_clean FROM brands ORDER BY brand") == [('Bliss', 'bliss'), ('Wrclo', 'wrclo')]
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from multi_sheet_loader import load_brands, load_products_from_multisheet, parse_price_bound, parse_prices
+
+
+def test_parse_prices_reads_bdt_spellings():
+    prices = pd.Series(['Tk 1,599.00 BDT', 'BDT35,100.00', '৳1,349', '1,200 - 1,500', 500, None], dtype=object)
+    assert parse_prices(prices).tolist()[:5] == [1599.0, 35100.0, 1349.0, 1200.0, 500.0]
+    assert np.isnan(parse_prices(prices).iloc[5])
+
+
+@pytest.mark.parametrize('price', ['$65', 'USD 40', 'usd5', '€30', '£12', '₹900'])
+def test_parse_prices_skips_other_currencies(price):
+    assert np.isnan(parse_prices(pd.Series([price], dtype=object)).iloc[0])
+
+
+def test_parse_price_bound_rejects_other_currencies():
+    assert parse_price_bound('Tk 1,500') == 1500.0
+    assert parse_price_bound('') is None
+    with pytest.raises(ValueError):
+        parse_price_bound('$75')
+
+
+def test_load_with_unwritable_snapshot_dir(workbooks, tmp_path, caplog):
+    # A directory can't be created under a regular file, whoever runs the tests
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+    products_path, brands_path = workbooks
+    brands_df = load_brands(brands_path, snapshot_dir=str(blocker / 'snapshot'))
+    products_df = load_products_from_multisheet(products_path, brands_df, snapshot_dir=str(blocker / 'snapshot'))
+
+    assert len(products_df) == 8
+    assert "Could not cache sheet" in caplog.text
+    assert "Could not prune the sheet cache" in caplog.text
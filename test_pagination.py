@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, page_envelope_json, parse_limit
+from postgres_queries import decode_page_cursor
+
+
+def test_parse_limit_defaults_and_clamps():
+    assert parse_limit(None) == parse_limit(" ") == DEFAULT_PAGE_SIZE
+    assert parse_limit("12") == 12
+    assert parse_limit(str(MAX_PAGE_SIZE + 1)) == MAX_PAGE_SIZE
+    assert parse_limit("30", default=8, maximum=20) == 20
+
+
+@pytest.mark.parametrize('value', ["0", "-3", "ten", "2.5"])
+def test_parse_limit_rejects_non_positive_and_non_integers(value):
+    with pytest.raises(ValueError, match="Invalid limit"):
+        parse_limit(value)
+
+
+@pytest.mark.parametrize('keyset', [["relevance", "-3.600000", "Cotton Shirt", 10], ["price_asc", 990.0, 2], ["name", "Ünïcode / ৳", 0]])
+def test_cursor_round_trips(keyset):
+    cursor = encode_cursor(keyset)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == keyset
+
+
+@pytest.mark.parametrize('cursor', ["garbage", "!!!", "bm90IGpzb24"])
+def test_decode_cursor_rejects_anything_else(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_page_envelope_json():
+    body = page_envelope_json('[{"product_name":"Linen Shirt"}]', 9, encode_cursor(["name", "Linen Shirt", 1]), 1)
+    assert json.loads(body) == {"total": 9, "limit": 1, "next_cursor": encode_cursor(["name", "Linen Shirt", 1]),
+                                "results": [{"product_name": "Linen Shirt"}]}
+    assert json.loads(page_envelope_json("[]", 0, None, 48))["next_cursor"] is None
+
+
+@pytest.mark.parametrize('sort, keyset', [
+    ('name', ['Linen Shirt', 3]),
+    ('price_asc', ['1250.00', 'Linen Shirt', 3]),
+    ('price_desc', ['NaN', 'Oversized Hoodie', 7]),
+    ('relevance', ['-1.300000', 'Linen Shirt', 3]),
+])
+def test_decode_page_cursor_returns_the_keyset(sort, keyset):
+    assert decode_page_cursor(encode_cursor([sort] + keyset), sort) == keyset
+
+
+@pytest.mark.parametrize('sort, keyset', [
+    ('name', ['price_asc', 'Linen Shirt', 3]),
+    ('name', ['name', 5, 3]),
+    ('name', ['name', 'Linen Shirt', '3']),
+    ('name', ['name', 'Linen Shirt', True]),
+    ('price_asc', ['price_asc', 'cheap', 'Linen Shirt', 3]),
+    ('price_asc', ['price_asc', 1250, 'Linen Shirt', 3]),
+    ('price_asc', ['price_asc', '1250.00', None, 3]),
+    ('relevance', ['relevance', '1_000', 'Linen Shirt', 3]),
+])
+def test_decode_page_cursor_checks_every_keyset_element(sort, keyset):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_page_cursor(encode_cursor(keyset), sort)
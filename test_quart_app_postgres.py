@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+# Requests both PostgreSQL backends must answer identically, byte for byte
+PATHS = [
+    "/search?q=shirt&limit=2",
+    "/search?q=shirt&limit=2&sort=price_asc",
+    "/search?brand=bliss&brand=wrclo&category=shirts&limit=10&sort=name",
+    "/search?q=shrt&fuzzy=1&limit=5",
+    "/search?min_price=1000&max_price=2000&limit=5&sort=price_desc",
+    "/search?q=pants",
+    "/search?q=pants&format=ndjson",
+    "/search?q=pants",
+    "/search?sort=cheap&limit=5",
+    "/search?limit=5&cursor=garbage",
+    "/search?min_price=Tk%201,500&limit=5",
+    "/search?max_price=cheap&limit=5",
+    "/facets?min_price=$75",
+    "/facets",
+    "/facets?q=shirt&brand=bliss",
+    "/suggest?q=sh",
+    "/suggest?q=cargo&limit=3",
+    "/brands",
+    "/brands?stats=1",
+    "/categories",
+    "/categories?stats=1",
+]
+
+BATCHES = [
+    {"queries": [{"q": "shirt", "limit": 2}, {"brand": "wrclo", "sort": "price_asc", "limit": 3}, {"category": ["pants"]}]},
+    {"queries": [{"q": "shirt", "limit": [2]}]},
+    {"queries": []},
+]
+
+
+def _summary(response, body):
+    headers = response.headers
+    return (response.status_code, headers.get('Content-Type'), headers.get('ETag'),
+            headers.get('X-Corrected-Query'), body)
+
+
+def _flask_responses(client, paths):
+    responses = [_summary(response, response.get_data()) for response in map(client.get, paths)]
+    for batch in BATCHES:
+        response = client.post("/search/batch", json=batch)
+        responses.append(_summary(response, response.get_data()))
+    return responses
+
+
+async def _quart_responses(app, paths):
+    async with app.test_app() as test_app:
+        client = test_app.test_client()
+        responses = []
+        for path in paths:
+            response = await client.get(path)
+            responses.append(_summary(response, await response.get_data()))
+        for batch in BATCHES:
+            response = await client.post("/search/batch", json=batch)
+            responses.append(_summary(response, await response.get_data()))
+        return responses
+
+
+def test_quart_serves_the_same_responses_as_flask(postgres_client, quart_app):
+    # Follow a cursor too: both backends must accept the other's cursors
+    first_page = json.loads(postgres_client.get("/search?q=shirt&limit=2").get_data())
+    paths = PATHS + [f"/search?q=shirt&limit=2&cursor={first_page['next_cursor']}"]
+
+    flask_responses = _flask_responses(postgres_client, paths)
+    assert [status for status, *_ in flask_responses].count(400) == 6
+    assert asyncio.run(_quart_responses(quart_app, paths)) == flask_responses
+
+
+def test_quart_answers_304_for_a_known_etag(quart_app):
+    async def revalidate():
+        async with quart_app.test_app() as test_app:
+            client = test_app.test_client()
+            etag = (await client.get("/brands")).headers['ETag']
+            response = await client.get("/brands", headers={"If-None-Match": etag})
+            return response.status_code, response.headers['ETag'], await response.get_data()
+
+    status, etag, body = asyncio.run(revalidate())
+    assert status == 304 and etag and body == b""
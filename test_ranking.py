@@ -0,0 +1,19 @@
+import pytest
+
+from ranking import parse_brand_boosts, parse_sort
+
+
+def test_parse_sort_defaults_to_relevance_only_with_a_query():
+    assert parse_sort(None, "shirt") == "relevance"
+    assert parse_sort("", "") == "name"
+    assert parse_sort(" Price_Desc ") == "price_desc"
+
+
+def test_parse_sort_rejects_unknown_orders():
+    with pytest.raises(ValueError, match="expected one of relevance, price_asc, price_desc, name"):
+        parse_sort("cheap")
+
+
+def test_parse_brand_boosts_skips_malformed_entries():
+    assert parse_brand_boosts("Aarong:1.5, yellow:1.2,broken,:2,bad:x") == {"aarong": 1.5, "yellow": 1.2}
+    assert parse_brand_boosts("") == {}
@@ -1,15 +1,22 @@
-import pandas as pd
-from pprint import pprint
-from linkkora_backend import load_nnrz_data, search_products
+import pytest
 
-# Load your CSVs
-brands_df, products_df = load_nnrz_data(
-    "NNRZ Database.xlsx",
-    "NNRZ Products.xlsx"
-)
+from multi_sheet_loader import load_brands, load_products_from_multisheet, search_products
 
-# Search test: change "shirt" to "pant", "top", etc. to test different queries
-results = search_products("shirt", brands_df, products_df)
 
-# Pretty-print first 5 results
-pprint(results[:5])
+@pytest.fixture
+def catalogue(workbooks):
+    """(brands_df, products_df) loaded straight from the synthetic workbooks."""
+    products_path, brands_path = workbooks
+    brands_df = load_brands(brands_path, snapshot_dir=None)
+    return brands_df, load_products_from_multisheet(products_path, brands_df, snapshot_dir=None)
+
+
+def test_search_products_finds_matching_names_and_categories(catalogue):
+    results = search_products("shirt", *catalogue)
+    assert sorted(result["product_name"] for result in results) == [
+        "Black Shirt", "Cotton Shirt", "Denim Shirt", "Linen Shirt", "Printed T-Shirt"]
+    assert {result["brand"] for result in results} == {"Bliss", "Wrclo"}
+
+
+def test_search_products_without_matches(catalogue):
+    assert search_products("saree", *catalogue) == []
@@ -0,0 +1,39 @@
+import pytest
+
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from search_batch import MAX_BATCH_QUERIES, parse_batch, parse_query_spec
+
+
+def test_parse_query_spec_normalizes_like_search():
+    spec = parse_query_spec({"q": "Shirt", "brand": "Bliss", "category": ["Shirts", " "], "min_price": "1000",
+                             "limit": "5"})
+    assert spec == {"query": "shirt", "brand": ["bliss"], "category": ["shirts"], "min_price": 1000.0,
+                    "max_price": None, "sort": "relevance", "limit": 5, "cursor": None}
+    assert parse_query_spec({})["limit"] == DEFAULT_PAGE_SIZE
+    assert parse_query_spec({"limit": 10 ** 6})["limit"] == MAX_PAGE_SIZE
+
+
+@pytest.mark.parametrize('spec', [
+    {"limit": [5]}, {"limit": {"n": 5}}, {"limit": True}, {"limit": 0}, {"limit": "five"},
+    {"min_price": [100]}, {"max_price": {"bdt": 100}}, {"sort": "cheap"}, {"brand": {"name": "bliss"}},
+    {"q": 5}, {"cursor": 5},
+])
+def test_parse_query_spec_rejects_what_search_would(spec):
+    with pytest.raises(ValueError):
+        parse_query_spec(spec)
+
+
+def test_parse_batch_names_the_offending_query():
+    with pytest.raises(ValueError, match=r"queries\[1\]: Invalid limit"):
+        parse_batch({"queries": [{}, {"limit": [5]}]})
+    with pytest.raises(ValueError, match="at least one query"):
+        parse_batch({"queries": []})
+    with pytest.raises(ValueError, match="Too many queries"):
+        parse_batch({"queries": [{}] * (MAX_BATCH_QUERIES + 1)})
+
+
+@pytest.mark.parametrize('limit', [[5], {"n": 5}])
+def test_search_batch_rejects_a_non_scalar_limit(pandas_client, limit):
+    response = pandas_client.post("/search/batch", json={"queries": [{"q": "shirt", "limit": limit}]})
+    assert response.status_code == 400
+    assert "Invalid limit" in response.get_json()["error"]
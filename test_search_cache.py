@@ -0,0 +1,176 @@
+import time
+
+import pytest
+from flask import Flask, Response, jsonify, request, stream_with_context
+from werkzeug.datastructures import MultiDict
+
+import search_cache
+from search_cache import ResultCache, body_etag, cache_key, cached_endpoint, mark_uncacheable
+
+
+def test_cache_key_ignores_parameter_order_and_casing():
+    key = cache_key("/search", MultiDict([("q", "Linen  Shirt"), ("brand", "Wrclo"), ("brand", "bliss"), ("limit", "5")]))
+    same = cache_key("/search", MultiDict([("limit", "5"), ("brand", "BLISS"), ("q", "linen shirt"), ("brand", "wrclo")]))
+    assert key == same
+    assert key != cache_key("/facets", MultiDict([("q", "linen shirt"), ("brand", "bliss"), ("brand", "wrclo"), ("limit", "5")]))
+    assert key != cache_key("/search", MultiDict([("q", "linen shirt"), ("brand", "bliss"), ("limit", "6")]))
+
+
+def test_result_cache_drops_entries_of_another_version():
+    cache = ResultCache(max_entries=4)
+    cache.put("key", 1, b"body", "application/json", '"etag"', [("X-Corrected-Query", "shirt")])
+    assert cache.get("key", 1) == (b"body", "application/json", '"etag"', (("X-Corrected-Query", "shirt"),))
+    assert cache.get("key", 2) is None
+    assert cache.get("key", 1) is None
+    assert cache.metrics() == {"hits": 1, "misses": 2, "evictions": 0, "entries": 0, "bytes": 0}
+
+
+def test_result_cache_expires_entries(monkeypatch):
+    cache = ResultCache(ttl_seconds=60)
+    cache.put("key", 1, b"body", "application/json", '"etag"')
+    later = time.monotonic() + 61
+    monkeypatch.setattr(time, 'monotonic', lambda: later)
+    assert cache.get("key", 1) is None
+
+
+def test_result_cache_evicts_least_recently_used_entries():
+    cache = ResultCache(max_entries=2, max_bytes=10)
+    cache.put("a", 1, b"1234", "text/plain", '"a"')
+    cache.put("b", 1, b"1234", "text/plain", '"b"')
+    cache.get("a", 1)
+    cache.put("c", 1, b"1234", "text/plain", '"c"')
+    assert (cache.get("a", 1) is None, cache.get("b", 1) is None, cache.get("c", 1) is None) == (False, True, False)
+    # Over max_bytes on its own: never stored
+    cache.put("d", 1, b"x" * 11, "text/plain", '"d"')
+    assert cache.get("d", 1) is None
+    cache.put("e", 1, b"1234567", "text/plain", '"e"')
+    assert cache.metrics()["bytes"] <= 10
+
+
+def test_body_etag_depends_on_the_version():
+    assert body_etag(1, b"[]") == body_etag(1, b"[]") != body_etag(2, b"[]")
+
+
+@pytest.fixture
+def app():
+    """A small app whose views count how often they really run."""
+    app = Flask(__name__)
+    app.version = 1
+    app.calls = 0
+    cache = ResultCache()
+    cached = cached_endpoint(cache, lambda: app.version)
+
+    @app.route("/items")
+    @cached
+    def items():
+        app.calls += 1
+        response = jsonify({"items": request.args.getlist("q"), "version": app.version})
+        response.headers["X-Corrected-Query"] = "shirt"
+        return response
+
+    @app.route("/invalid")
+    @cached
+    def invalid():
+        app.calls += 1
+        return jsonify({"error": "Invalid"}), 400
+
+    @app.route("/degraded")
+    @cached
+    def degraded():
+        app.calls += 1
+        mark_uncacheable()
+        return jsonify([])
+
+    @app.route("/stream")
+    @cached
+    def stream():
+        app.calls += 1
+
+        def chunks():
+            yield "["
+            yield ",".join(["1"] * int(request.args.get("n", 3)))
+            if request.args.get("fail"):
+                # Like a query failing midway: the body stops short
+                mark_uncacheable()
+                return
+            yield "]"
+        return Response(stream_with_context(chunks()), mimetype="application/json")
+
+    return app
+
+
+def test_cached_endpoint_serves_repeats_from_the_cache(app):
+    client = app.test_client()
+    first = client.get("/items?q=Shirt")
+    second = client.get("/items?q=shirt")
+    assert app.calls == 1
+    assert second.get_data() == first.get_data()
+    assert second.headers["ETag"] == first.headers["ETag"] == body_etag(1, first.get_data())
+    assert second.headers["X-Corrected-Query"] == "shirt"
+    assert second.headers["Cache-Control"] == "no-cache"
+
+
+def test_cached_endpoint_answers_304_for_the_current_etag(app):
+    client = app.test_client()
+    etag = client.get("/items").headers["ETag"]
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert (response.status_code, response.get_data(), response.headers["ETag"]) == (304, b"", etag)
+    assert client.get("/items", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_cached_endpoint_renders_again_when_the_version_changes(app):
+    client = app.test_client()
+    etag = client.get("/items").headers["ETag"]
+    app.version = 2
+    response = client.get("/items", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 2
+    assert response.headers["ETag"] != etag
+    assert app.calls == 2
+
+
+@pytest.mark.parametrize('path', ["/invalid", "/degraded", "/stream?fail=1"])
+def test_cached_endpoint_skips_errors_and_uncacheable_responses(app, path):
+    client = app.test_client()
+    # Bodies are read in full, so streams run to their end
+    client.get(path).get_data()
+    response = client.get(path)
+    response.get_data()
+    assert app.calls == 2
+    assert "ETag" not in response.headers
+
+
+def test_cached_endpoint_caches_streamed_responses_once_sent(app):
+    client = app.test_client()
+    first = client.get("/stream")
+    assert first.get_data() == b"[1,1,1]"
+    assert "ETag" not in first.headers
+    second = client.get("/stream")
+    assert app.calls == 1
+    assert second.get_data() == first.get_data()
+    assert second.headers["ETag"] == body_etag(1, first.get_data())
+
+
+def test_cached_endpoint_skips_streams_too_large_to_copy(app, monkeypatch):
+    monkeypatch.setattr(search_cache, 'STREAM_CACHE_MAX_BYTES', 16)
+    client = app.test_client()
+    assert client.get("/stream?n=8").get_data() == b"[" + b",".join([b"1"] * 8) + b"]"
+    client.get("/stream?n=8").get_data()
+    assert app.calls == 2
+
+
+def test_cached_endpoint_skips_abandoned_streams(app):
+    client = app.test_client()
+    response = client.get("/stream", buffered=False)
+    next(response.response)
+    response.close()
+    client.get("/stream").get_data()
+    assert app.calls == 2
+
+
+def test_cached_endpoint_is_bypassed_without_a_version(app):
+    app.version = None
+    client = app.test_client()
+    client.get("/items")
+    assert "ETag" not in client.get("/items").headers
+    assert app.calls == 2
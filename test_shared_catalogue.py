@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from multi_sheet_loader import (
+    correct_keyword, load_brands, load_products_from_multisheet, product_facets, search_products, suggest_completions
+)
+from shared_catalogue import SharedCatalogue, build_image, open_image, read_current_stamp
+
+
+def test_catalogue_is_served_from_the_shared_image(workbooks, tmp_path, monkeypatch):
+    monkeypatch.setenv('CATALOGUE_RELOAD_SECONDS', '0')
+    catalogue = SharedCatalogue(*workbooks, image_dir=str(tmp_path / 'image'))
+
+    assert catalogue.stamp == read_current_stamp(str(tmp_path / 'image'))
+    brands_df, products_df, generation = catalogue.current()
+    assert (len(brands_df), len(products_df), generation) == (2, 8, 1)
+
+
+def test_unwritable_image_dir_falls_back_to_parsing_the_workbooks(workbooks, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+    catalogue = SharedCatalogue(*workbooks, image_dir=str(blocker / 'image'))
+
+    assert catalogue.stamp is None
+    brands_df, products_df, generation = catalogue.current()
+    assert (len(brands_df), len(products_df), generation) == (2, 8, 1)
+    # The in-memory copy neither reads nor writes the (default) snapshot directory
+    assert not (tmp_path / 'catalogue_snapshot').exists()
+
+
+@pytest.mark.parametrize('arrow', [True, False])
+def test_image_index_answers_like_a_fresh_one(workbooks, tmp_path, monkeypatch, arrow):
+    import shared_catalogue
+
+    if not arrow:
+        monkeypatch.setattr(shared_catalogue, 'pyarrow', None)
+    image_dir = str(tmp_path / 'image')
+    stamp = build_image(*workbooks, image_dir=image_dir)
+    with open(os.path.join(image_dir, stamp, 'manifest.json')) as file:
+        index_manifest = json.load(file)["index"]
+    # Vocabulary, labels, completion keys and trigrams are mapped string arrays, not inline JSON
+    assert {"vocabulary", "fuzzy.grams", "suggest.keys", "facet0.labels"} <= set(index_manifest["texts"])
+    assert not any(isinstance(value, list) and value and isinstance(value[0], str)
+                   for value in index_manifest["values"].values())
+
+    image = open_image(stamp, image_dir)
+    fresh_brands = load_brands(workbooks[1], snapshot_dir=None)
+    fresh = (fresh_brands, load_products_from_multisheet(workbooks[0], fresh_brands, snapshot_dir=None))
+    for query in ("shirt", "tshirt", "pants"):
+        assert search_products(query, *image) == search_products(query, *fresh)
+    assert suggest_completions("sh", *image, 5) == suggest_completions("sh", *fresh, 5)
+    assert correct_keyword("cotton shrit", *image) == correct_keyword("cotton shrit", *fresh) == "cotton shirt"
+    assert product_facets("", *image) == product_facets("", *fresh)